@@ -1,19 +1,32 @@
+from django import forms
 from django.contrib import admin
 from django.contrib.auth import get_user_model
 from django.contrib.auth.admin import UserAdmin
 
-from permissify import models
-from permissify.utils import model_field_exists
+from permissify import hierarchy, models
+from permissify.utils import get_object_permission_model, model_field_exists
 
 
 UserModel = get_user_model()
+ObjectPermission = get_object_permission_model()
+
+
+class RoleAdminForm(forms.ModelForm):
+    def clean_parents(self):
+        parents = self.cleaned_data["parents"]
+
+        if self.instance.pk is not None:
+            hierarchy.check_parents(self.instance.pk, {parent.pk for parent in parents}, self.instance._state.db)
+
+        return parents
 
 
 @admin.register(models.Role)
 class RoleAdmin(admin.ModelAdmin):
+    form = RoleAdminForm
     search_fields = ("name",)
     ordering = ("name",)
-    filter_horizontal = ("permissions",)
+    filter_horizontal = ("permissions", "parents")
 
     def formfield_for_manytomany(self, db_field, request=None, **kwargs):
         if db_field.name == "permissions":
@@ -35,4 +48,4 @@ if model_field_exists(UserModel, 'roles'):
 
     admin.site.register(UserModel, UserAdmin)
 
-admin.site.register(models.ObjectPermission)
+admin.site.register(ObjectPermission)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class PermissifyConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'permissify'
+
+    def ready(self):
+        from permissify import signals  # noqa: F401
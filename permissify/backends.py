@@ -1,13 +1,60 @@
+from functools import partial, reduce
+from itertools import islice
+from operator import or_
+
+from asgiref.sync import sync_to_async
 from django.contrib.auth import backends, models, get_user_model
 from django.contrib.auth.backends import BaseBackend
-from django.contrib.auth.models import Permission
-from django.db.models import OuterRef, Q, Exists
-
-from permissify.utils import model_field_exists
-from permissify.models import User, ObjectPermission
+from django.contrib.auth.models import Group, Permission
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import OuterRef, Q, Exists, QuerySet
+
+from permissify import cache, hierarchy, snapshot
+from permissify.registry import get_registry
+from permissify.instrumentation import aobserve, observe
+from permissify.snapshot import PermissionSnapshot
+from permissify.grants import (
+    filter_grants,
+    get_ancestors,
+    get_direct_model,
+    get_generic_grants_q,
+    get_grantee_models,
+    get_grantee_pks,
+    get_outer_targets,
+    get_targets,
+    get_unexpired_q,
+)
+from permissify.utils import cast_to_field, get_object_permission_model, model_field_exists, pks_for_field
+from permissify.models import EffectivePermission, User, Role
 
 
 UserModel = get_user_model()
+ObjectPermission = get_object_permission_model()
+
+
+def _perm_names(perms) -> set:
+    return {
+        "%s.%s" % (app_label, codename)
+        for app_label, codename in perms.values_list("content_type__app_label", "codename").order_by()
+    }
+
+
+async def _aperm_names(perms) -> set:
+    return {
+        "%s.%s" % (app_label, codename)
+        async for app_label, codename in perms.values_list("content_type__app_label", "codename").order_by()
+    }
+
+
+async def _aget_content_type(model) -> ContentType:
+    """
+    Return the content type of `model` from the content type cache, only
+    leaving the event loop when it's not cached yet.
+    """
+    try:
+        return ContentType.objects._get_from_cache(model._meta.concrete_model._meta)
+    except KeyError:
+        return await sync_to_async(ContentType.objects.get_for_model)(model)
 
 
 class PermissionModelBackend(backends.ModelBackend):
@@ -20,41 +67,151 @@ class PermissionModelBackend(backends.ModelBackend):
         if not self._user_model_has_field_roles:
             return models.Permission.objects.none()
 
-        user_roles_field = UserModel._meta.get_field("roles")
-        user_roles_query = "role__%s" % user_roles_field.related_query_name()
-
-        return models.Permission.objects.filter(**{user_roles_query: user_obj})
+        # The role closure covers the permissions inherited from parent
+        # roles, whatever the depth of the hierarchy, in a single query.
+        return models.Permission.objects.filter(role__in=hierarchy.get_user_roles(user_obj))
 
     def get_role_permissions(self, user_obj, obj=None) -> set:
         return self._get_permissions(user_obj, obj, from_name="role")
 
+    def _get_permissions(self, user_obj, obj, from_name):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+
+        perm_cache_name = "_%s_perm_cache" % from_name
+        if not hasattr(user_obj, perm_cache_name):
+            setattr(
+                user_obj,
+                perm_cache_name,
+                cache.get_or_set_perms(
+                    user_obj,
+                    from_name,
+                    partial(self._compute_snapshot, user_obj, from_name)
+                    if snapshot.is_enabled()
+                    else partial(super()._get_permissions, user_obj, obj, from_name),
+                ),
+            )
+        return getattr(user_obj, perm_cache_name)
+
+    def _get_source_permissions(self, user_obj, from_name):
+        if user_obj.is_superuser:
+            return Permission.objects.all()
+
+        return getattr(self, "_get_%s_permissions" % from_name)(user_obj)
+
+    def _compute_snapshot(self, user_obj, from_name) -> PermissionSnapshot:
+        perms = self._get_source_permissions(user_obj, from_name)
+        return PermissionSnapshot.from_pks(perms.values_list("pk", flat=True).order_by())
+
     def _get_all_permissions(self, user_obj, obj=None, perm_cache_key="_perm_cache") -> set:
         if not user_obj.is_active or user_obj.is_anonymous:
             return set()
 
         if not hasattr(user_obj, perm_cache_key):
-            setattr(
-                user_obj,
-                perm_cache_key,
-                {
+            if snapshot.is_enabled() and obj is None:
+                perms = (
+                    self.get_user_permissions(user_obj)
+                    | self.get_group_permissions(user_obj)
+                    | self.get_role_permissions(user_obj)
+                )
+            else:
+                perms = {
                     *BaseBackend.get_all_permissions(self, user_obj=user_obj, obj=obj),
                     *self.get_role_permissions(user_obj, obj=obj)
                 }
-            )
+
+            setattr(user_obj, perm_cache_key, perms)
 
         return getattr(user_obj, perm_cache_key)
 
+    async def _aget_permissions(self, user_obj, from_name):
+        if not user_obj.is_active or user_obj.is_anonymous:
+            return set()
+
+        perm_cache_name = "_%s_perm_cache" % from_name
+        if not hasattr(user_obj, perm_cache_name):
+            setattr(
+                user_obj,
+                perm_cache_name,
+                await cache.aget_or_set_perms(
+                    user_obj, from_name, partial(self._acompute_permissions, user_obj, from_name)
+                ),
+            )
+        return getattr(user_obj, perm_cache_name)
+
+    async def _acompute_permissions(self, user_obj, from_name):
+        perms = self._get_source_permissions(user_obj, from_name)
+
+        if snapshot.is_enabled():
+            return PermissionSnapshot.from_pks([pk async for pk in perms.values_list("pk", flat=True).order_by()])
+
+        return await _aperm_names(perms)
+
+    def _get_perm_pk(self, name):
+        """
+        Return the primary key of the permission named "app_label.codename",
+        or None if there is no such permission.
+        """
+        try:
+            return get_registry().get(name).pk
+        except Permission.DoesNotExist:
+            return None
+
+    async def _aget_perm_pk(self, name):
+        try:
+            return (await get_registry().aget(name)).pk
+        except Permission.DoesNotExist:
+            return None
+
+    def _resolve_perm_pk(self, perm):
+        if isinstance(perm, Permission):
+            return perm.pk
+
+        if isinstance(perm, ObjectPermission):
+            return perm.permission_id
+
+        return self._get_perm_pk(perm)
+
+    async def _aresolve_perm_pk(self, perm):
+        if isinstance(perm, str):
+            return await self._aget_perm_pk(perm)
+
+        return self._resolve_perm_pk(perm)
+
+    def has_perm(self, user_obj, perm, obj=None):
+        return observe(self, user_obj, perm, obj, self._has_perm)
+
+    def _has_perm(self, user_obj, perm, obj=None):
+        return super().has_perm(user_obj, perm, obj)
+
+    async def ahas_perm(self, user_obj, perm, obj=None):
+        return await aobserve(self, user_obj, perm, obj, self._ahas_perm)
+
+    async def _ahas_perm(self, user_obj, perm, obj=None):
+        perms = await self.aget_all_permissions(user_obj, obj)
+
+        if isinstance(perms, PermissionSnapshot):
+            return user_obj.is_active and await perms.ahas(perm)
+
+        return user_obj.is_active and perm in perms
+
     def get_all_permissions(self, user_obj, obj=None) -> set:
         if obj is not None:
             return set()
 
         return self._get_all_permissions(user_obj, obj)
 
-    def with_perm(self, perm, is_active=True, include_superusers=True, obj=None):
-        """
-        Return users that have permission "perm". By default, filter out
-        inactive users and include superusers.
-        """
+    async def aget_all_permissions(self, user_obj, obj=None) -> set:
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+
+        if not hasattr(user_obj, "_perm_cache"):
+            sources = [await self._aget_permissions(user_obj, from_name) for from_name in ("user", "group", "role")]
+            user_obj._perm_cache = reduce(or_, sources) if snapshot.is_enabled() else set().union(*sources)
+
+        return user_obj._perm_cache
+
+    def _check_perm_arg(self, perm, obj=None):
         if isinstance(perm, str):
             try:
                 app_label, codename = perm.split(".")
@@ -68,22 +225,46 @@ class PermissionModelBackend(backends.ModelBackend):
                 "The `perm` argument must be a string or a permission instance."
             )
 
+    def with_perm(self, perm, is_active=True, include_superusers=True, obj=None):
+        """
+        Return users that have permission "perm". By default, filter out
+        inactive users and include superusers.
+        """
+        self._check_perm_arg(perm, obj)
+        return self._with_perm(self._resolve_perm_pk(perm), is_active, include_superusers, obj)
+
+    async def awith_perm(self, perm, is_active=True, include_superusers=True, obj=None):
+        """
+        Async version of `with_perm`. The permission is resolved without
+        blocking, and the returned queryset is meant to be iterated with
+        `async for`.
+        """
+        self._check_perm_arg(perm, obj)
+        return self._with_perm(await self._aresolve_perm_pk(perm), is_active, include_superusers, obj)
+
+    def _with_perm(self, perm_pk, is_active, include_superusers, obj):
         if obj is not None:
             return UserModel._default_manager.none()
 
+        return self._filter_users(self._get_model_perm_holders_q(perm_pk), is_active, include_superusers)
+
+    def _get_model_perm_holders_q(self, perm_pk):
+        """
+        Return a condition matching, on the user model, the users holding the
+        model-level permission `perm_pk` directly, through a group or through
+        a role.
+        """
         permission_q = Q(group__user=OuterRef("pk")) | Q(user=OuterRef("pk"))
 
         if self._user_model_has_field_roles:
-            permission_q |= Q(role__user=OuterRef("pk"))
+            permission_q |= hierarchy.get_members_q(OuterRef("pk"), prefix="role__")
 
-        if isinstance(perm, Permission):
-            permission_q &= Q(pk=perm.pk)
-        else:
-            permission_q &= Q(codename=codename, content_type__app_label=app_label)
+        return Exists(Permission.objects.filter(permission_q, pk=perm_pk))
 
-        user_q = Exists(Permission.objects.filter(permission_q))
+    def _filter_users(self, user_q, is_active, include_superusers):
         if include_superusers:
             user_q |= Q(is_superuser=True)
+
         if is_active is not None:
             user_q &= Q(is_active=is_active)
 
@@ -96,7 +277,116 @@ class ObjectPermissionModelBackend(PermissionModelBackend):
         if obj is None:
             return super().get_all_permissions(user_obj, obj)
 
-        return self._get_all_permissions(user_obj, obj, perm_cache_key=f"_obj_perm_cache_{obj.pk}")
+        if not user_obj.is_active or user_obj.is_anonymous:
+            return set()
+
+        ctype = ContentType.objects.get_for_model(obj)
+        perm_cache_name = f"_obj_perm_cache_{ctype.pk}_{obj.pk}"
+        if not hasattr(user_obj, perm_cache_name):
+            setattr(
+                user_obj,
+                perm_cache_name,
+                cache.get_or_set_perms(
+                    user_obj,
+                    f"obj:{ctype.pk}:{obj.pk}",
+                    partial(self._compute_all_obj_permissions, user_obj, obj),
+                ),
+            )
+        return getattr(user_obj, perm_cache_name)
+
+    async def aget_all_permissions(self, user_obj, obj=None) -> set:
+        if obj is None:
+            return await super().aget_all_permissions(user_obj, obj)
+
+        if not user_obj.is_active or user_obj.is_anonymous:
+            return set()
+
+        ctype = await _aget_content_type(obj)
+        perm_cache_name = f"_obj_perm_cache_{ctype.pk}_{obj.pk}"
+        if not hasattr(user_obj, perm_cache_name):
+            setattr(
+                user_obj,
+                perm_cache_name,
+                await cache.aget_or_set_perms(
+                    user_obj,
+                    f"obj:{ctype.pk}:{obj.pk}",
+                    partial(self._acompute_all_obj_permissions, user_obj, obj),
+                ),
+            )
+        return getattr(user_obj, perm_cache_name)
+
+    async def _awarm_content_types(self, model):
+        """
+        Load the content types the object permission queries on `model` refer
+        to, so that building them doesn't query the database.
+        """
+        ancestor_models = [ancestor_model for ancestor_model, path in get_ancestors(model)]
+
+        for content_type_model in (model, *ancestor_models, *get_grantee_models().values()):
+            await _aget_content_type(content_type_model)
+
+    def _get_model_perms_conditions(self, user_obj) -> list:
+        """
+        Return the conditions matching, on Permission, the model-level
+        permissions of `user_obj`: one per source (the user itself, their
+        groups and their roles), read from the many-to-many tables directly.
+        """
+        user_field = UserModel._meta.get_field("user_permissions")
+        conditions = [
+            Exists(
+                user_field.remote_field.through._default_manager.filter(
+                    **{user_field.m2m_field_name(): user_obj, user_field.m2m_reverse_field_name(): OuterRef("pk")}
+                )
+            )
+        ]
+
+        sources = [(Group, "groups")]
+        if self._user_model_has_field_roles:
+            sources.append((Role, "roles"))
+
+        for model, user_field_name in sources:
+            perms_field = model._meta.get_field("permissions")
+
+            if model is Role:
+                grantees_q = Q(**{f"{perms_field.m2m_field_name()}__in": hierarchy.get_user_roles(user_obj)})
+            else:
+                members_query = UserModel._meta.get_field(user_field_name).related_query_name()
+                grantees_q = Q(**{f"{perms_field.m2m_field_name()}__{members_query}": user_obj})
+
+            conditions.append(
+                Exists(
+                    perms_field.remote_field.through._default_manager.filter(
+                        grantees_q, **{perms_field.m2m_reverse_field_name(): OuterRef("pk")}
+                    )
+                )
+            )
+
+        return conditions
+
+    def _get_all_obj_permissions(self, user_obj, obj):
+        """
+        Return the model-level and object-level permissions of `user_obj` on
+        `obj`, from the user, their groups and their roles, in a single query.
+        """
+        if user_obj.is_superuser:
+            return Permission.objects.all()
+
+        return Permission.objects.filter(
+            reduce(
+                or_,
+                [
+                    *self._get_model_perms_conditions(user_obj),
+                    self._get_grants_condition(user_obj, get_targets(obj), permission_id=OuterRef("pk")),
+                ],
+            )
+        )
+
+    def _compute_all_obj_permissions(self, user_obj, obj) -> set:
+        return _perm_names(self._get_all_obj_permissions(user_obj, obj))
+
+    async def _acompute_all_obj_permissions(self, user_obj, obj) -> set:
+        await self._awarm_content_types(type(obj))
+        return await _aperm_names(self._get_all_obj_permissions(user_obj, obj))
 
     def get_user_permissions(self, user_obj, obj=None):
         return self._get_permissions(user_obj, obj, "user_obj" if obj is not None else "user")
@@ -113,15 +403,7 @@ class ObjectPermissionModelBackend(PermissionModelBackend):
         if obj is None:
             return user_perms
 
-        return user_perms | Permission.objects.filter(
-            Exists(
-                ObjectPermission.objects.filter(
-                    permission=OuterRef("pk"),
-                    object_id=obj.pk,
-                    grantee_id=user_obj.pk,
-                )
-            )
-        )
+        return user_perms | Permission.objects.filter(self._get_source_grants_condition("user", user_obj, obj))
 
     def _get_group_obj_permissions(self, user_obj, obj=None):
         group_perms = self._get_group_permissions(user_obj)
@@ -130,13 +412,7 @@ class ObjectPermissionModelBackend(PermissionModelBackend):
             return group_perms
 
         return group_perms | Permission.objects.filter(
-            Exists(
-                ObjectPermission.objects.filter(
-                    permission=OuterRef("pk"),
-                    object_id=obj.pk,
-                    grantee_id__in=user_obj.groups.all().values_list("id", flat=True),
-                )
-            )
+            self._get_source_grants_condition("group", user_obj.groups.all(), obj)
         )
 
     def _get_role_obj_permissions(self, user_obj, obj=None):
@@ -149,13 +425,25 @@ class ObjectPermissionModelBackend(PermissionModelBackend):
             return role_perms
 
         return role_perms | Permission.objects.filter(
-            Exists(
-                ObjectPermission.objects.filter(
-                    permission=OuterRef("pk"),
-                    object_id=obj.pk,
-                    grantee_id__in=user_obj.roles.all().values_list("id", flat=True),
+            self._get_source_grants_condition("role", hierarchy.get_user_roles(user_obj), obj)
+        )
+
+    def _get_source_grants_condition(self, from_name, grantees, obj):
+        """
+        Return a condition matching, on Permission, the permissions granted
+        to `grantees` of kind `from_name` on `obj` or one of its ancestors.
+        """
+        return reduce(
+            or_,
+            [
+                Exists(
+                    filter_grants(model, from_name, grantees, objects).filter(
+                        get_unexpired_q(),
+                        permission=OuterRef("pk"),
+                    )
                 )
-            )
+                for model, objects in get_targets(obj)
+            ],
         )
 
     def _get_permissions(self, user_obj, obj, from_name):
@@ -178,33 +466,174 @@ class ObjectPermissionModelBackend(PermissionModelBackend):
         if obj is None:
             return super()._get_permissions(user_obj, obj, from_name)
 
-        perm_cache_name = f"_{from_name}_perm_cache_{obj.pk}"
+        # Objects of different models can share a primary key: the caches are
+        # keyed by content type too.
+        ctype = ContentType.objects.get_for_model(obj)
+        perm_cache_name = f"_{from_name}_perm_cache_{ctype.pk}_{obj.pk}"
         if not hasattr(user_obj, perm_cache_name):
-            if user_obj.is_superuser:
-                perms = Permission.objects.all()
-            else:
-                perms = getattr(self, "_get_%s_permissions" % from_name)(user_obj, obj)
-            perms = perms.values_list("content_type__app_label", "codename").order_by()
             setattr(
-                user_obj, perm_cache_name, {"%s.%s" % (ct, name) for ct, name in perms}
+                user_obj,
+                perm_cache_name,
+                cache.get_or_set_perms(
+                    user_obj,
+                    f"{from_name}:{ctype.pk}:{obj.pk}",
+                    partial(self._compute_obj_permissions, user_obj, obj, from_name),
+                ),
             )
         return getattr(user_obj, perm_cache_name)
 
-    def has_perm(self, user_obj, perm, obj=None):
+    def _compute_obj_permissions(self, user_obj, obj, from_name):
+        if user_obj.is_superuser:
+            perms = Permission.objects.all()
+        else:
+            perms = getattr(self, "_get_%s_permissions" % from_name)(user_obj, obj)
+        registry = get_registry()
+        return {registry.get_name(pk) for pk in perms.values_list("pk", flat=True).order_by()}
+
+    def prefetch_object_permissions(self, user_obj, objs):
+        """
+        Load the object permissions granted to `user_obj`, their groups and
+        their roles on every object of `objs` in a single query (plus one per
+        direct foreign key table involved), and prime the per-object caches so
+        that following `has_perm(user_obj, perm, obj)` calls are answered from
+        memory.
+        """
+        if not user_obj.is_active or user_obj.is_anonymous or user_obj.is_superuser:
+            return
+
+        objs = [
+            obj
+            for obj in objs
+            if not hasattr(user_obj, f"_obj_perm_cache_{ContentType.objects.get_for_model(obj).pk}_{obj.pk}")
+        ]
+        if not objs:
+            return
+
+        objs_by_model = {}
+        for obj in objs:
+            objs_by_model.setdefault(obj._meta.concrete_model, []).append(obj)
+
+        targets = self._get_prefetch_targets(objs_by_model)
+        pks_by_model = {}
+        for obj_targets in targets.values():
+            for model, pk in obj_targets:
+                pks_by_model.setdefault(model, set()).add(pk)
+
+        registry = get_registry()
+        grantees = self._get_grantees(user_obj)
+        granted = {}
+        generic_q = Q()
+
+        for model, pks in pks_by_model.items():
+            pks = list(pks)
+
+            for from_name, model_grantees in grantees.items():
+                if get_direct_model(model, from_name) is None:
+                    generic_q |= get_generic_grants_q(model, from_name, model_grantees, pks)
+                    continue
+
+                rows = filter_grants(model, from_name, model_grantees, pks).filter(get_unexpired_q()).values_list(
+                    "content_object_id",
+                    "permission_id",
+                )
+                for object_pk, perm_id in rows:
+                    granted.setdefault((model, object_pk, from_name), set()).add(registry.get_name(perm_id))
+
+        if generic_q:
+            models_by_ctype = {ContentType.objects.get_for_model(model).pk: model for model in pks_by_model}
+            from_names = {
+                ContentType.objects.get_for_model(model).pk: from_name
+                for from_name, model in get_grantee_models().items()
+            }
+
+            rows = ObjectPermission.objects.filter(generic_q, get_unexpired_q()).values_list(
+                "object_content_type_id",
+                "object_id",
+                "grantee_content_type_id",
+                "permission_id",
+            )
+            for ctype_id, object_id, grantee_ctype_id, perm_id in rows:
+                model = models_by_ctype[ctype_id]
+                granted.setdefault(
+                    (model, model._meta.pk.to_python(object_id), from_names[grantee_ctype_id]), set()
+                ).add(registry.get_name(perm_id))
+
+        shared_perms = {}
+        for obj in objs:
+            ctype = ContentType.objects.get_for_model(obj)
+            all_perms = set()
+
+            for from_name in ("user", "group", "role"):
+                perms = set(self._get_permissions(user_obj, None, from_name))
+                for model, pk in targets[obj]:
+                    perms.update(granted.get((model, pk, from_name), ()))
+                setattr(user_obj, f"_{from_name}_obj_perm_cache_{ctype.pk}_{obj.pk}", perms)
+                shared_perms[f"{from_name}_obj:{ctype.pk}:{obj.pk}"] = perms
+                all_perms |= perms
+
+            setattr(user_obj, f"_obj_perm_cache_{ctype.pk}_{obj.pk}", all_perms)
+            shared_perms[f"obj:{ctype.pk}:{obj.pk}"] = all_perms
+
+        cache.set_many_perms(user_obj, shared_perms)
+
+    def _get_prefetch_targets(self, objs_by_model) -> dict:
+        """
+        Return, for each object, the (model, primary key) pairs whose grants
+        apply to it: the object itself and its ancestors. The keys of the
+        ancestors above the parents are read in one query per model.
+        """
+        targets = {}
+
+        for model, model_objs in objs_by_model.items():
+            ancestors = get_ancestors(model)
+
+            if len(ancestors) > 1:
+                rows = model._default_manager.filter(pk__in=[obj.pk for obj in model_objs]).values_list(
+                    "pk", *(path for ancestor_model, path in ancestors)
+                )
+                ancestor_pks = {pk: ancestor_pks for pk, *ancestor_pks in rows}
+            else:
+                ancestor_pks = {
+                    obj.pk: [getattr(obj, model._meta.get_field(path).attname) for ancestor_model, path in ancestors]
+                    for obj in model_objs
+                }
+
+            for obj in model_objs:
+                targets[obj] = [(model, obj.pk)] + [
+                    (ancestor_model, pk)
+                    for (ancestor_model, path), pk in zip(ancestors, ancestor_pks.get(obj.pk, ()))
+                    if pk is not None
+                ]
+
+        return targets
+
+    def _has_perm(self, user_obj, perm, obj=None):
         if user_obj.is_superuser:
             return True
 
-        return super().has_perm(user_obj, perm, obj)
+        return super()._has_perm(user_obj, perm, obj)
 
-    def with_perm(self, perm, is_active=True, include_superusers=True, obj=None):
+    async def _ahas_perm(self, user_obj, perm, obj=None):
+        if user_obj.is_superuser:
+            return True
+
+        return await super()._ahas_perm(user_obj, perm, obj)
+
+    def _split_perm(self, perm, model=None) -> tuple[str, str]:
         """
-        Return users that have permission "perm". By default, filter out
-        inactive users and include superusers.
+        Return the (app_label, codename) of "perm", which can be either a
+        permission instance, an "app_label.codename" string or, when `model`
+        is given, a bare codename or action ("add", "change", "delete", "view").
         """
-        if obj is None:
-            return super().with_perm(perm, is_active, include_superusers, obj)
-        
-        if isinstance(perm, str):
+        if isinstance(perm, Permission):
+            return tuple(get_registry().get_name(perm.pk).split("."))
+
+        if not isinstance(perm, str):
+            raise TypeError(
+                "The `perm` argument must be a string or a permission instance."
+            )
+
+        if "." in perm:
             try:
                 app_label, codename = perm.split(".")
             except ValueError:
@@ -212,31 +641,374 @@ class ObjectPermissionModelBackend(PermissionModelBackend):
                     "Permission name should be in the form "
                     "app_label.permission_codename."
                 )
-        elif not isinstance(perm, (ObjectPermission, Permission)):
-            raise TypeError(
-                "The `perm` argument must be a string or an object permission instance."
+            return app_label, codename
+
+        if model is None:
+            raise ValueError(
+                "Permission name should be in the form "
+                "app_label.permission_codename."
             )
 
-        permission_q = Q(permission__group__user=OuterRef("pk")) | Q(permission__user=OuterRef("pk"))
+        if perm in ("add", "change", "delete", "view"):
+            perm = f"{perm}_{model._meta.model_name}"
+
+        return model._meta.app_label, perm
+
+    def _get_grantees(self, user_obj) -> dict:
+        """
+        Return, by kind, whom object permissions reach `user_obj` through: the
+        user itself, their groups and their roles.
+        """
+        grantees = {"user": user_obj, "group": user_obj.groups.all()}
 
         if self._user_model_has_field_roles:
-            permission_q |= Q(permission__role__user=OuterRef("pk"))
+            grantees["role"] = hierarchy.get_user_roles(user_obj)
 
-        if isinstance(perm, ObjectPermission):
-            permission_q &= Q(pk=perm.permission.pk, )
+        return grantees
 
-        elif isinstance(perm, Permission):
-            permission_q &= Q(pk=perm.pk)
+    def _get_grants_condition(self, user_obj, targets, **filters):
+        """
+        Return a condition matching the object permissions granted to
+        `user_obj`, their groups or their roles on any of `targets`, (model,
+        objects) pairs such as the ones of `get_targets`. The grants stored
+        in ObjectPermission are matched in a single subquery, plus one for
+        each direct foreign key table involved.
+        """
+        generic_q = Q()
+        conditions = []
 
-        else:
-            permission_q &= Q(permission__codename=codename, permission__content_type__app_label=app_label)
+        for from_name, grantees in self._get_grantees(user_obj).items():
+            for model, objects in targets:
+                if get_direct_model(model, from_name) is None:
+                    generic_q |= get_generic_grants_q(model, from_name, grantees, objects)
+                else:
+                    conditions.append(
+                        Exists(filter_grants(model, from_name, grantees, objects).filter(get_unexpired_q(), **filters))
+                    )
 
-        user_q = Exists(ObjectPermission.objects.filter(permission_q, object_id=obj.pk))
+        if generic_q:
+            conditions.append(Exists(ObjectPermission.objects.filter(generic_q, get_unexpired_q(), **filters)))
 
-        if include_superusers:
-            user_q |= Q(is_superuser=True)
+        return reduce(or_, conditions)
 
-        if is_active is not None:
-            user_q &= Q(is_active=is_active)
+    def get_objects_for_user(self, user_obj, perm, queryset):
+        """
+        Return the objects of `queryset` on which `user_obj` has permission
+        "perm". A model-level permission grants access to every object,
+        otherwise the object permissions granted to the user, their groups
+        and their roles are resolved in the same query.
+        """
+        if not user_obj.is_active or user_obj.is_anonymous:
+            return queryset.none()
 
-        return UserModel._default_manager.filter(user_q)
+        name = "%s.%s" % self._split_perm(perm, queryset.model)
+
+        if self.has_perm(user_obj, name):
+            return queryset
+
+        return self._filter_objects_for_user(user_obj, queryset, self._get_perm_pk(name))
+
+    async def aget_objects_for_user(self, user_obj, perm, queryset):
+        """
+        Async version of `get_objects_for_user`. The permissions are resolved
+        without blocking, and the returned queryset is meant to be iterated
+        with `async for`.
+        """
+        if not user_obj.is_active or user_obj.is_anonymous:
+            return queryset.none()
+
+        name = "%s.%s" % self._split_perm(perm, queryset.model)
+
+        if await self.ahas_perm(user_obj, name):
+            return queryset
+
+        perm_pk = await self._aget_perm_pk(name)
+        await self._awarm_content_types(queryset.model)
+
+        return self._filter_objects_for_user(user_obj, queryset, perm_pk)
+
+    def _filter_objects_for_user(self, user_obj, queryset, perm_pk):
+        return queryset.filter(
+            self._get_grants_condition(user_obj, get_outer_targets(queryset.model), permission_id=perm_pk)
+        )
+
+    def _check_perm_arg(self, perm, obj=None):
+        if obj is None or not isinstance(perm, ObjectPermission):
+            return super()._check_perm_arg(perm, obj)
+
+    def _with_perm(self, perm_pk, is_active, include_superusers, obj):
+        if obj is None:
+            return super()._with_perm(perm_pk, is_active, include_superusers, obj)
+
+        return self._filter_users(
+            self._get_model_perm_holders_q(perm_pk) | self._get_obj_perm_holders_q(perm_pk, obj),
+            is_active,
+            include_superusers,
+        )
+
+    def _get_obj_perm_holders_q(self, perm_pk, obj):
+        """
+        Return a condition matching, on the user model, the users holding the
+        permission `perm_pk` on `obj` or one of its ancestors. The grantees
+        holding the grant are collected once, in uncorrelated subqueries, and
+        matched against the primary keys of the users and the membership
+        tables, so that every lookup uses an index.
+        """
+        targets = get_targets(obj)
+        get_holders = partial(get_grantee_pks, targets=targets, permission_id=perm_pk)
+
+        conditions = [Q(pk__in=subquery) for subquery in get_holders("user")]
+
+        sources = [("group", "groups")]
+        if self._user_model_has_field_roles:
+            sources.append(("role", "roles"))
+
+        for from_name, user_field_name in sources:
+            user_field = UserModel._meta.get_field(user_field_name)
+            members = user_field.remote_field.through._default_manager
+            grantee_field_name = user_field.m2m_reverse_field_name()
+
+            for subquery in get_holders(from_name):
+                # The members of the roles inheriting from a holder hold it too.
+                if from_name == "role":
+                    grantees_q = hierarchy.get_inheriting_q(subquery, lookup=grantee_field_name)
+                else:
+                    grantees_q = Q(**{f"{grantee_field_name}__in": subquery})
+
+                conditions.append(
+                    Exists(members.filter(grantees_q, **{user_field.m2m_field_name(): OuterRef("pk")}))
+                )
+
+        return reduce(or_, conditions)
+
+    def users_with_perm_for_objects(self, perm, queryset, is_active=True, include_superusers=True, batch_size=1000):
+        """
+        Return a mapping of the primary key of each object of `queryset` to
+        the primary keys of the users that have permission "perm" on it, as
+        `with_perm(perm, obj=...)` would return them. The objects are read
+        `batch_size` at a time, with a fixed number of queries per batch
+        however many objects and grants there are.
+        """
+        model = queryset.model
+        perm_pk = self._get_perm_pk("%s.%s" % self._split_perm(perm, model))
+        ancestors = get_ancestors(model)
+        users = self._filter_users(Q(), is_active, include_superusers=False)
+
+        # Superusers hold even the permissions that don't exist.
+        holders_q = Q(pk__in=[]) if perm_pk is None else self._get_model_perm_holders_q(perm_pk)
+        model_holders = set(
+            self._filter_users(holders_q, is_active, include_superusers).values_list("pk", flat=True)
+        )
+
+        rows = queryset.values_list("pk", *(path for ancestor_model, path in ancestors)).iterator(batch_size)
+        users_by_object = {}
+
+        while batch := list(islice(rows, batch_size)):
+            objects_by_target = {}
+
+            for pk, *ancestor_pks in batch:
+                users_by_object[pk] = set(model_holders)
+
+                for target_model, target_pk in zip((model, *(m for m, path in ancestors)), (pk, *ancestor_pks)):
+                    if target_pk is None:
+                        break
+                    objects_by_target.setdefault((target_model, ObjectPermission.to_object_id(target_pk)), []).append(pk)
+
+            if perm_pk is None:
+                continue
+
+            for user_pk, target in self._get_obj_perm_holders(perm_pk, objects_by_target, users):
+                for pk in objects_by_target[target]:
+                    users_by_object[pk].add(user_pk)
+
+        return users_by_object
+
+    def _get_obj_perm_holders(self, perm_pk, targets, users):
+        """
+        Yield a (user primary key, target) pair for each user of `users`
+        holding the permission `perm_pk` on one of `targets`, (model,
+        object id) pairs, directly, through a group or through a role.
+        """
+        object_ids_by_model = {}
+        for target_model, object_id in targets:
+            object_ids_by_model.setdefault(target_model, []).append(object_id)
+
+        grantee_models = get_grantee_models()
+        grants = {from_name: {} for from_name in grantee_models}
+        generic_q = Q()
+
+        for target_model, object_ids in object_ids_by_model.items():
+            for from_name in grantee_models:
+                if get_direct_model(target_model, from_name) is None:
+                    generic_q |= get_generic_grants_q(target_model, from_name, None, object_ids)
+                    continue
+
+                rows = filter_grants(target_model, from_name, None, object_ids).filter(
+                    get_unexpired_q(), permission_id=perm_pk
+                ).values_list("content_object_id", f"{from_name}_id")
+                for object_pk, grantee_pk in rows:
+                    grants[from_name].setdefault(grantee_pk, set()).add(
+                        (target_model, ObjectPermission.to_object_id(object_pk))
+                    )
+
+        if generic_q:
+            models_by_ctype = {ContentType.objects.get_for_model(model).pk: model for model in object_ids_by_model}
+            from_names = {
+                ContentType.objects.get_for_model(model).pk: from_name for from_name, model in grantee_models.items()
+            }
+
+            rows = ObjectPermission.objects.filter(generic_q, get_unexpired_q(), permission_id=perm_pk).values_list(
+                "object_content_type_id", "object_id", "grantee_content_type_id", "grantee_id"
+            )
+            for object_ctype_pk, object_id, grantee_ctype_pk, grantee_id in rows:
+                from_name = from_names[grantee_ctype_pk]
+                grantee_pk = grantee_models[from_name]._meta.pk.to_python(grantee_id)
+                grants[from_name].setdefault(grantee_pk, set()).add((models_by_ctype[object_ctype_pk], object_id))
+
+        if grants["user"]:
+            for user_pk in users.filter(pk__in=list(grants["user"])).values_list("pk", flat=True):
+                for target in grants["user"][user_pk]:
+                    yield user_pk, target
+
+        # The members of a role hold its grants, and so do the members of
+        # the roles inheriting from it.
+        sources = [("group", "groups", "")]
+        if self._user_model_has_field_roles:
+            sources += [("role", "roles", ""), ("role", "roles", "__ancestor_links__ancestor")]
+
+        for from_name, user_field_name, grantee_lookup in sources:
+            if not grants[from_name]:
+                continue
+
+            user_field = UserModel._meta.get_field(user_field_name)
+            grantee_path = f"{user_field.m2m_reverse_field_name()}{grantee_lookup}"
+            rows = user_field.remote_field.through._default_manager.filter(
+                **{f"{grantee_path}__in": list(grants[from_name]), f"{user_field.m2m_field_name()}__in": users}
+            ).values_list(grantee_path, f"{user_field.m2m_field_name()}_id")
+
+            for grantee_pk, user_pk in rows:
+                for target in grants[from_name][grantee_pk]:
+                    yield user_pk, target
+
+
+class EffectivePermissionModelBackend(ObjectPermissionModelBackend):
+    """
+    Answer `has_perm`, `get_all_permissions`, `with_perm` and
+    `get_objects_for_user` from the EffectivePermission table alone, instead
+    of joining the user, group, role and object permission tables. The table
+    must be maintained, with `PERMISSIFY_EFFECTIVE_PERMISSIONS = True`, and
+    filled once with the `rebuild_effective_permissions` command.
+    """
+
+    def _get_targets_q(self, targets) -> Q:
+        """
+        Return a filter on EffectivePermission matching the rows of any of
+        `targets`, (model, objects) pairs such as the ones of `get_targets`.
+        """
+        object_field = EffectivePermission._meta.get_field("object_id")
+        targets_q = Q()
+
+        for model, objects in targets:
+            if isinstance(objects, QuerySet):
+                object_q = Q(object_id__in=pks_for_field(objects, object_field))
+            elif hasattr(objects, "resolve_expression"):
+                object_q = Q(object_id=cast_to_field(objects, object_field))
+            else:
+                object_q = Q(object_id=str(objects))
+
+            targets_q |= Q(object_q, object_content_type=ContentType.objects.get_for_model(model))
+
+        return targets_q
+
+    def _get_effective_q(self, obj=None) -> Q:
+        if obj is None:
+            return Q(object_content_type=None)
+
+        return Q(object_content_type=None) | self._get_targets_q(get_targets(obj))
+
+    def _get_effective_permissions(self, user_obj, obj=None):
+        if user_obj.is_superuser:
+            return Permission.objects.all()
+
+        return Permission.objects.filter(
+            Exists(
+                EffectivePermission.objects.filter(
+                    self._get_effective_q(obj),
+                    get_unexpired_q(),
+                    user=user_obj,
+                    permission=OuterRef("pk"),
+                )
+            )
+        )
+
+    def _compute_effective_permissions(self, user_obj):
+        perms = self._get_effective_permissions(user_obj)
+
+        if snapshot.is_enabled():
+            return PermissionSnapshot.from_pks(perms.values_list("pk", flat=True).order_by())
+
+        return _perm_names(perms)
+
+    async def _acompute_effective_permissions(self, user_obj):
+        perms = self._get_effective_permissions(user_obj)
+
+        if snapshot.is_enabled():
+            return PermissionSnapshot.from_pks([pk async for pk in perms.values_list("pk", flat=True).order_by()])
+
+        return await _aperm_names(perms)
+
+    def _get_all_permissions(self, user_obj, obj=None, perm_cache_key="_perm_cache") -> set:
+        if not user_obj.is_active or user_obj.is_anonymous:
+            return set()
+
+        if not hasattr(user_obj, perm_cache_key):
+            setattr(
+                user_obj,
+                perm_cache_key,
+                cache.get_or_set_perms(
+                    user_obj, "effective", partial(self._compute_effective_permissions, user_obj)
+                ),
+            )
+
+        return getattr(user_obj, perm_cache_key)
+
+    async def aget_all_permissions(self, user_obj, obj=None) -> set:
+        if obj is not None:
+            return await super().aget_all_permissions(user_obj, obj)
+
+        if not user_obj.is_active or user_obj.is_anonymous:
+            return set()
+
+        if not hasattr(user_obj, "_perm_cache"):
+            user_obj._perm_cache = await cache.aget_or_set_perms(
+                user_obj, "effective", partial(self._acompute_effective_permissions, user_obj)
+            )
+
+        return user_obj._perm_cache
+
+    def _get_all_obj_permissions(self, user_obj, obj):
+        return self._get_effective_permissions(user_obj, obj)
+
+    def _filter_objects_for_user(self, user_obj, queryset, perm_pk):
+        return queryset.filter(
+            Exists(
+                EffectivePermission.objects.filter(
+                    self._get_targets_q(get_outer_targets(queryset.model)),
+                    get_unexpired_q(),
+                    user=user_obj,
+                    permission_id=perm_pk,
+                )
+            )
+        )
+
+    def _with_perm(self, perm_pk, is_active, include_superusers, obj):
+        user_q = Exists(
+            EffectivePermission.objects.filter(
+                self._get_effective_q(obj),
+                get_unexpired_q(),
+                user=OuterRef("pk"),
+                permission_id=perm_pk,
+            )
+        )
+
+        return self._filter_users(user_q, is_active, include_superusers)
@@ -0,0 +1,96 @@
+"""
+Deletion of grants in small batches, for the maintenance commands that
+clean up large tables without locking them for long.
+"""
+from collections import defaultdict
+from typing import Callable
+
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Model, QuerySet
+
+from permissify import cache, effective
+from permissify.grants import get_grantee_models, iter_direct_models
+from permissify.models import EffectivePermission
+from permissify.utils import raw_delete
+
+
+def _get_invalidation(model: type[Model]) -> tuple[tuple[str, ...], Callable[[list], None]]:
+    """
+    Return the fields identifying the grantees and the grants of the rows of
+    `model`, and a function invalidating the cached permissions of the
+    grantees of a list of rows of those fields, and refreshing their
+    effective permissions.
+    """
+    if model is EffectivePermission:
+        return ("user_id",), lambda rows: cache.invalidate_users({user_pk for user_pk, in rows})
+
+    grantee_models = get_grantee_models()
+
+    for protected_model, from_name, direct_model in iter_direct_models():
+        if direct_model is model:
+            grantee_model = grantee_models[from_name]
+            ctype_pk = ContentType.objects.get_for_model(grantee_model).pk
+            object_ctype_pk = ContentType.objects.get_for_model(protected_model).pk
+
+            def invalidate(rows):
+                grants_by_grantee = defaultdict(set)
+                for grantee_pk, perm_pk, object_pk in rows:
+                    grants_by_grantee[grantee_pk].add((perm_pk, object_ctype_pk, str(object_pk)))
+
+                for grantee_pk, grants in grants_by_grantee.items():
+                    cache.invalidate_grantee(ctype_pk, grantee_pk)
+                    effective.grants_changed(grantee_model, [grantee_pk], grants)
+
+            return (f"{from_name}_id", "permission_id", "content_object_id"), invalidate
+
+    def invalidate(rows):
+        grants_by_grantee = defaultdict(set)
+        for grantee_ctype_pk, grantee_id, perm_pk, object_ctype_pk, object_id in rows:
+            grants_by_grantee[grantee_ctype_pk, grantee_id].add((perm_pk, object_ctype_pk, str(object_id)))
+
+        for (grantee_ctype_pk, grantee_id), grants in grants_by_grantee.items():
+            cache.invalidate_grantee(grantee_ctype_pk, grantee_id)
+
+            grantee_model = ContentType.objects.get_for_id(grantee_ctype_pk).model_class()
+            if grantee_model is not None:
+                effective.grants_changed(grantee_model, [grantee_id], grants)
+
+    fields = ("grantee_content_type_id", "grantee_id", "permission_id", "object_content_type_id", "object_id")
+    return fields, invalidate
+
+
+def delete_in_batches(
+    queryset: QuerySet, batch_size: int = 1000, progress: Callable[[int], None] | None = None
+) -> int:
+    """
+    Delete the rows of `queryset`, a query on ObjectPermission,
+    EffectivePermission or a direct foreign key table, `batch_size` at a
+    time in primary key order, each batch in its own short DELETE statement,
+    and invalidate the cached permissions of their grantees, and refresh
+    their effective permissions, once per batch. `progress` is called after
+    each batch with the number of rows deleted so far. Return the number of
+    rows deleted.
+    """
+    model = queryset.model
+    grant_fields, invalidate = _get_invalidation(model)
+    deleted = 0
+    after_pk = None
+
+    while True:
+        batch = queryset.order_by("pk")
+        if after_pk is not None:
+            batch = batch.filter(pk__gt=after_pk)
+
+        rows = list(batch.values_list("pk", *grant_fields)[:batch_size])
+        if not rows:
+            return deleted
+
+        # A raw delete doesn't send a signal per row: the grantees are
+        # invalidated once for the whole batch instead.
+        deleted += raw_delete(model._base_manager.using(queryset.db).filter(pk__in=[pk for pk, *grant in rows]))
+        after_pk = rows[-1][0]
+
+        invalidate([tuple(grant) for pk, *grant in rows])
+
+        if progress is not None:
+            progress(deleted)
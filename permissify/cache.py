@@ -0,0 +1,252 @@
+import math
+from typing import Awaitable, Callable
+from uuid import uuid4
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.db.models import Q
+from django.utils import timezone
+
+from permissify import grants, hierarchy
+from permissify.models import Role
+from permissify.utils import model_field_exists
+
+
+UserModel = get_user_model()
+
+
+def _get_cache():
+    """
+    Return the cache configured by the `PERMISSIFY_CACHE` setting, or None
+    when the shared permission cache is disabled (the default).
+    """
+    alias = getattr(settings, "PERMISSIFY_CACHE", None)
+
+    if alias is None:
+        return None
+
+    return caches[alias]
+
+
+def is_enabled() -> bool:
+    return getattr(settings, "PERMISSIFY_CACHE", None) is not None
+
+
+def _make_key(*parts) -> str:
+    prefix = getattr(settings, "PERMISSIFY_CACHE_KEY_PREFIX", "permissify")
+    return ":".join(str(part) for part in (prefix, *parts))
+
+
+def _get_next_expiry(cache, user_obj, version):
+    """
+    Return the earliest expiry still to come of the grants reaching
+    `user_obj`, directly, through a group or through a role. It's read once
+    per version of the user's permissions, memoized on `user_obj` and in the
+    shared cache until it passes.
+    """
+    now = timezone.now()
+    expires_at = user_obj.__dict__.get("_permissify_next_expiry", ())
+
+    if expires_at == ():
+        key = _make_key("expiry", user_obj.pk, version)
+        expires_at = cache.get(key, ())
+
+        if expires_at == () or (expires_at is not None and expires_at <= now):
+            grantees = {"user": user_obj, "role": hierarchy.get_user_roles(user_obj)}
+            if model_field_exists(UserModel, "groups"):
+                grantees["group"] = user_obj.groups.all()
+
+            expires_at = grants.get_next_expiry(grantees)
+            cache.set(key, expires_at, timeout=_get_seconds_until(expires_at, now))
+
+        user_obj._permissify_next_expiry = expires_at
+
+    return expires_at
+
+
+def _get_seconds_until(expires_at, now):
+    if expires_at is None:
+        return None
+
+    return max(math.ceil((expires_at - now).total_seconds()), 1)
+
+
+def _get_timeout(cache, expires_at):
+    """
+    Return how long to cache a permission set computed from grants of which
+    the first to expire does at `expires_at`: no longer than that, so that
+    an expired grant is never read from the cache.
+    """
+    timeout = getattr(settings, "PERMISSIFY_CACHE_TIMEOUT", DEFAULT_TIMEOUT)
+
+    if expires_at is None:
+        return timeout
+
+    if timeout is DEFAULT_TIMEOUT:
+        timeout = cache.default_timeout
+
+    remaining = _get_seconds_until(expires_at, timezone.now())
+    return remaining if timeout is None else min(timeout, remaining)
+
+
+def _get_version(cache, user_obj) -> str:
+    """
+    Return the current cache version of `user_obj`, made of a global version
+    and a per-user one. Bumping either of them discards every permission set
+    cached for the user. The result is memoized on `user_obj`, just like the
+    permission sets themselves.
+    """
+    if not hasattr(user_obj, "_permissify_cache_version"):
+        keys = [_make_key("version"), _make_key("version", user_obj.pk)]
+        versions = cache.get_many(keys)
+
+        for key in keys:
+            if key not in versions:
+                version = uuid4().hex
+                if not cache.add(key, version, timeout=None):
+                    version = cache.get(key, version)
+                versions[key] = version
+
+        user_obj._permissify_cache_version = ".".join(versions[key] for key in keys)
+
+    return user_obj._permissify_cache_version
+
+
+async def _aget_version(cache, user_obj) -> str:
+    if not hasattr(user_obj, "_permissify_cache_version"):
+        keys = [_make_key("version"), _make_key("version", user_obj.pk)]
+        versions = await cache.aget_many(keys)
+
+        for key in keys:
+            if key not in versions:
+                version = uuid4().hex
+                if not await cache.aadd(key, version, timeout=None):
+                    version = await cache.aget(key, version)
+                versions[key] = version
+
+        user_obj._permissify_cache_version = ".".join(versions[key] for key in keys)
+
+    return user_obj._permissify_cache_version
+
+
+def get_or_set_perms(user_obj, name: str, compute: Callable[[], set]) -> set:
+    """
+    Return the permission set `name` of `user_obj` from the shared cache,
+    calling `compute` and storing its result on a miss.
+    """
+    cache = _get_cache()
+
+    if cache is None:
+        return compute()
+
+    version = _get_version(cache, user_obj)
+    key = _make_key("perms", user_obj.pk, version, name)
+    perms = cache.get(key)
+
+    if perms is None:
+        perms = compute()
+        cache.set(key, perms, timeout=_get_timeout(cache, _get_next_expiry(cache, user_obj, version)))
+
+    return perms
+
+
+async def aget_or_set_perms(user_obj, name: str, compute: Callable[[], Awaitable[set]]) -> set:
+    """
+    Async version of `get_or_set_perms`, awaiting `compute` on a miss.
+    """
+    cache = _get_cache()
+
+    if cache is None:
+        return await compute()
+
+    version = await _aget_version(cache, user_obj)
+    key = _make_key("perms", user_obj.pk, version, name)
+    perms = await cache.aget(key)
+
+    if perms is None:
+        perms = await compute()
+        expires_at = await sync_to_async(_get_next_expiry)(cache, user_obj, version)
+        await cache.aset(key, perms, timeout=_get_timeout(cache, expires_at))
+
+    return perms
+
+
+def set_many_perms(user_obj, perms: dict[str, set]):
+    """
+    Store several permission sets of `user_obj` in the shared cache at once.
+    """
+    cache = _get_cache()
+
+    if cache is None:
+        return
+
+    version = _get_version(cache, user_obj)
+    cache.set_many(
+        {_make_key("perms", user_obj.pk, version, name): value for name, value in perms.items()},
+        timeout=_get_timeout(cache, _get_next_expiry(cache, user_obj, version)),
+    )
+
+
+def invalidate_users(user_pks):
+    """
+    Discard every permission set cached for the users in `user_pks`.
+    """
+    cache = _get_cache()
+
+    if cache is None:
+        return
+
+    cache.delete_many([_make_key("version", pk) for pk in user_pks])
+
+
+def invalidate_all():
+    """
+    Discard every permission set cached for every user.
+    """
+    cache = _get_cache()
+
+    if cache is None:
+        return
+
+    cache.delete(_make_key("version"))
+
+
+def get_members(model, pks) -> list:
+    """
+    Return the primary keys of the users belonging to the groups (or roles,
+    depending on `model`) in `pks`, or to a role inheriting from them.
+    """
+    if issubclass(model, Group):
+        members_q = Q(groups__in=pks)
+    else:
+        # The members of a role's descendants inherit its permissions too.
+        members_q = hierarchy.get_inheriting_q(pks, lookup="roles")
+
+    return list(UserModel._default_manager.filter(members_q).values_list("pk", flat=True).distinct())
+
+
+def invalidate_grantee(grantee_content_type_id, grantee_id):
+    """
+    Discard every permission set cached for the users affected by a change
+    to the permissions of a grantee (the user itself, or the members of a
+    group or a role).
+    """
+    if not is_enabled():
+        return
+
+    model = ContentType.objects.get_for_id(grantee_content_type_id).model_class()
+
+    if model is None:
+        return
+
+    if issubclass(model, UserModel):
+        invalidate_users([UserModel._meta.pk.to_python(grantee_id)])
+
+    elif issubclass(model, Group) or (issubclass(model, Role) and model_field_exists(UserModel, "roles")):
+        invalidate_users(get_members(model, [grantee_id]))
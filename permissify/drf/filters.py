@@ -0,0 +1,27 @@
+from rest_framework.filters import BaseFilterBackend
+
+from permissify.shortcuts import get_objects_for_user
+
+
+class ObjectPermissionsFilter(BaseFilterBackend):
+    """
+    Restrict the queryset of a view to the objects the request user has the
+    "view" permission on. The filtering happens in the database, so
+    paginated views only load one page, and composes with the other filter
+    backends of the view.
+
+    Set `perm_format` to require another permission, and `backend` when
+    several authentication backends are configured.
+    """
+
+    perm_format = '%(app_label)s.view_%(model_name)s'
+    backend = None
+
+    def get_perm(self, model):
+        return self.perm_format % {
+            'app_label': model._meta.app_label,
+            'model_name': model._meta.model_name,
+        }
+
+    def filter_queryset(self, request, queryset, view):
+        return get_objects_for_user(request.user, self.get_perm(queryset.model), queryset, backend=self.backend)
@@ -1,22 +1,88 @@
+from django.http import Http404
 from rest_framework.permissions import DjangoObjectPermissions, SAFE_METHODS
 
 
 class PermissifyObjectPermissions(DjangoObjectPermissions):
+    # When enabled, the permissions of the request user are resolved once
+    # per request (and per object) with `get_all_permissions`, memoized on
+    # the request, and every check is answered from these sets. As
+    # `ObjectPermissionModelBackend` includes the model-level permissions in
+    # the permissions on an object, the model-level fallback of
+    # `has_object_permission` is answered by the same set.
+    memoize_permissions = False
+
     def has_permission(self, request, view):
         # For list or other non-object-specific actions, check model-level permissions
         if not view.detail:
-            return super().has_permission(request, view)
+            return self._has_model_permission(request, view)
 
         # For detail views, bypass and delegate to has_object_permission
         return True
 
     def has_object_permission(self, request, view, obj):
+        if self.memoize_permissions:
+            return self._has_memoized_object_permission(request, view, obj)
+
         # For detail actions, check object-level permissions
         if super().has_object_permission(request, view, obj):
             return True
 
         # Fallback to model-level permissions if object-level permission fails
-        return super().has_permission(request, view)
+        return self._has_model_permission(request, view)
+
+    def _has_model_permission(self, request, view):
+        if not self.memoize_permissions:
+            return super().has_permission(request, view)
+
+        if not request.user or (not request.user.is_authenticated and self.authenticated_users_only):
+            return False
+
+        if getattr(view, '_ignore_model_permissions', False):
+            return True
+
+        perms = self.get_required_permissions(request.method, self._queryset(view).model)
+        return self._has_perms(request, perms)
+
+    def _has_memoized_object_permission(self, request, view, obj):
+        # Same as `DjangoObjectPermissions.has_object_permission`: a user who
+        # can't even read the object gets a 404 rather than a 403.
+        model_cls = self._queryset(view).model
+
+        if self._has_perms(request, self.get_required_object_permissions(request.method, model_cls), obj):
+            return True
+
+        if request.method in SAFE_METHODS:
+            raise Http404
+
+        if not self._has_perms(request, self.get_required_object_permissions('GET', model_cls), obj):
+            raise Http404
+
+        return False
+
+    def _get_perms(self, request, obj=None) -> set:
+        memo = getattr(request, '_permissify_perms', None)
+        if memo is None:
+            memo = request._permissify_perms = {}
+
+        key = None if obj is None else (obj._meta.concrete_model, obj.pk)
+        if key not in memo:
+            memo[key] = request.user.get_all_permissions(obj)
+
+        return memo[key]
+
+    def _has_perms(self, request, perms, obj=None) -> bool:
+        user = request.user
+
+        if not perms:
+            return True
+
+        if not user.is_active:
+            return False
+
+        if user.is_superuser:
+            return True
+
+        return set(perms) <= self._get_perms(request, obj)
 
 
 class PermissifyObjectPermissionsOrAnonReadOnly(PermissifyObjectPermissions):
@@ -0,0 +1,452 @@
+"""
+Maintenance of the EffectivePermission table, which materializes the
+permissions every user holds, directly or through their groups and roles,
+model-wide and per object.
+"""
+import threading
+import weakref
+from collections import defaultdict
+from datetime import datetime
+from functools import reduce
+from itertools import islice
+from operator import or_
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Q
+
+from permissify import cache
+from permissify.grants import get_grantee_models, get_unexpired_q, iter_direct_models
+from permissify.models import EffectivePermission, RoleClosure
+from permissify.utils import get_object_permission_model, model_field_exists
+
+
+UserModel = get_user_model()
+ObjectPermission = get_object_permission_model()
+
+# The object of a model-level permission, in the keys of the table.
+MODEL_LEVEL = (None, "")
+
+_local = threading.local()
+
+
+def is_enabled() -> bool:
+    return getattr(settings, "PERMISSIFY_EFFECTIVE_PERMISSIONS", False)
+
+
+def _get_grantees(user_pks) -> dict[str, dict]:
+    """
+    Return, by kind, the grantees giving permissions to the users in
+    `user_pks`: each grantee primary key maps to the users it applies to.
+    """
+    grantees = {"user": {pk: {pk} for pk in user_pks}}
+
+    for from_name, field_name in (("group", "groups"), ("role", "roles")):
+        if not model_field_exists(UserModel, field_name):
+            continue
+
+        field = UserModel._meta.get_field(field_name)
+
+        rows = list(
+            field.remote_field.through._default_manager.filter(
+                **{f"{field.m2m_field_name()}__in": user_pks}
+            ).values_list(field.m2m_reverse_field_name(), field.m2m_field_name())
+        )
+
+        if from_name == "role":
+            # Roles also give their permissions to the members of the roles
+            # inheriting from them.
+            members_query = f"descendant__{field.related_query_name()}"
+            rows += RoleClosure.objects.filter(**{f"{members_query}__in": user_pks}).values_list(
+                "ancestor_id", members_query
+            )
+
+        members = grantees[from_name] = defaultdict(set)
+        for grantee_pk, user_pk in rows:
+            members[grantee_pk].add(user_pk)
+
+    return grantees
+
+
+def _get_scope(keys) -> tuple[set, set, dict[int, set]]:
+    """
+    Return the permissions granted model-wide, the permissions granted on
+    objects, and the objects by content type, that the keys `keys` refer to.
+    """
+    model_perm_pks, object_perm_pks, objects_by_ctype = set(), set(), defaultdict(set)
+
+    for user_pk, perm_pk, object_ctype_pk, object_id in keys:
+        if object_ctype_pk is None:
+            model_perm_pks.add(perm_pk)
+        else:
+            object_perm_pks.add(perm_pk)
+            objects_by_ctype[object_ctype_pk].add(object_id)
+
+    return model_perm_pks, object_perm_pks, objects_by_ctype
+
+
+def compute(user_pks, keys: set | None = None) -> dict[tuple, datetime | None]:
+    """
+    Return the effective permissions of the users in `user_pks`, as
+    (user pk, permission pk, object content type pk, object id) tuples mapped
+    to their expiry. The object content type is None and the object id empty
+    for model-level permissions. Grants that have already expired are left
+    out; a permission given by several grants expires with the last of them.
+    When `keys` is given, only the grants that may give them are read, and
+    only the effective permissions among them are returned.
+    """
+    user_pks = list(user_pks)
+    grantees = _get_grantees(user_pks)
+    grantee_models = get_grantee_models()
+    rows = {}
+
+    if keys is not None:
+        model_perm_pks, object_perm_pks, objects_by_ctype = _get_scope(keys)
+
+    def add(from_name, grantee_pk, perm_pk, object_ctype_pk=None, object_id="", expires_at=None):
+        for user_pk in grantees[from_name].get(grantee_pk, ()):
+            key = (user_pk, perm_pk, object_ctype_pk, object_id)
+
+            if key not in rows:
+                rows[key] = expires_at
+            elif rows[key] is not None:
+                rows[key] = None if expires_at is None else max(rows[key], expires_at)
+
+    # Model-level permissions.
+    for from_name, members in grantees.items():
+        if not members or (keys is not None and not model_perm_pks):
+            continue
+
+        model = grantee_models[from_name]
+        field = model._meta.get_field("user_permissions" if from_name == "user" else "permissions")
+        lookups = {f"{field.m2m_field_name()}__in": list(members)}
+        if keys is not None:
+            lookups[f"{field.m2m_reverse_field_name()}__in"] = list(model_perm_pks)
+
+        through_rows = field.remote_field.through._default_manager.filter(**lookups).values_list(
+            field.m2m_field_name(), field.m2m_reverse_field_name()
+        )
+
+        for grantee_pk, perm_pk in through_rows:
+            add(from_name, grantee_pk, perm_pk)
+
+    # Object permissions stored in ObjectPermission, for every kind at once.
+    generic_q = Q()
+    grantee_ids = {}
+
+    for from_name, members in grantees.items():
+        if not members:
+            continue
+
+        ctype = ContentType.objects.get_for_model(grantee_models[from_name])
+        ids = grantee_ids[ctype.pk] = {ObjectPermission.to_grantee_id(pk): (from_name, pk) for pk in members}
+        generic_q |= Q(grantee_content_type=ctype, grantee_id__in=list(ids))
+
+    if generic_q and (keys is None or objects_by_ctype):
+        obj_perms = ObjectPermission.objects.filter(generic_q, get_unexpired_q())
+
+        if keys is not None:
+            obj_perms = obj_perms.filter(
+                reduce(
+                    or_,
+                    (
+                        Q(
+                            object_content_type_id=object_ctype_pk,
+                            object_id__in=[ObjectPermission.to_object_id(object_id) for object_id in object_ids],
+                        )
+                        for object_ctype_pk, object_ids in objects_by_ctype.items()
+                    ),
+                ),
+                permission_id__in=list(object_perm_pks),
+            )
+
+        obj_perms = obj_perms.values_list(
+            "grantee_content_type_id",
+            "grantee_id",
+            "permission_id",
+            "object_content_type_id",
+            "object_id",
+            "expires_at",
+        )
+        for grantee_ctype_pk, grantee_id, perm_pk, object_ctype_pk, object_id, expires_at in obj_perms:
+            add(*grantee_ids[grantee_ctype_pk][grantee_id], perm_pk, object_ctype_pk, str(object_id), expires_at)
+
+    # Object permissions stored in direct foreign key tables.
+    for model, from_name, direct_model in iter_direct_models():
+        if not grantees.get(from_name):
+            continue
+
+        object_ctype_pk = ContentType.objects.get_for_model(model).pk
+        if keys is not None and object_ctype_pk not in objects_by_ctype:
+            continue
+
+        direct_rows = direct_model.objects.filter(
+            get_unexpired_q(),
+            **{f"{from_name}__in": list(grantees[from_name])},
+        )
+
+        if keys is not None:
+            direct_rows = direct_rows.filter(
+                content_object__in=list(objects_by_ctype[object_ctype_pk]),
+                permission_id__in=list(object_perm_pks),
+            )
+
+        direct_rows = direct_rows.values_list(
+            f"{from_name}_id",
+            "permission_id",
+            "content_object_id",
+            "expires_at",
+        )
+        for grantee_pk, perm_pk, object_pk, expires_at in direct_rows:
+            add(from_name, grantee_pk, perm_pk, object_ctype_pk, str(object_pk), expires_at)
+
+    if keys is not None:
+        rows = {key: expires_at for key, expires_at in rows.items() if key in keys}
+
+    return rows
+
+
+def _write(wanted, existing_rows) -> tuple[int, int, set]:
+    """
+    Bring the rows `existing_rows`, (pk, user pk, permission pk, object
+    content type pk, object id, expiry) tuples, in line with `wanted`, as
+    returned by `compute`, only writing the rows that changed. Return the
+    number of rows created and deleted, and the users whose rows changed.
+    """
+    existing = {}
+    duplicate_pks = []
+    deleted = 0
+
+    for pk, *key, expires_at in existing_rows:
+        # Duplicates left by concurrent rebuilds are all deleted but one.
+        if tuple(key) in existing:
+            duplicate_pks.append(pk)
+        else:
+            existing[tuple(key)] = (pk, expires_at)
+
+    # Rows whose expiry changed are replaced.
+    stale = {key for key, (pk, expires_at) in existing.items() if wanted.get(key, expires_at) != expires_at}
+    stale |= existing.keys() - wanted.keys()
+    if stale or duplicate_pks:
+        deleted = EffectivePermission.objects.filter(
+            pk__in=[existing[key][0] for key in stale] + duplicate_pks
+        ).delete()[0]
+
+    missing = [key for key in wanted if key not in existing or key in stale]
+    EffectivePermission.objects.bulk_create(
+        [
+            EffectivePermission(
+                user_id=user_pk,
+                permission_id=perm_pk,
+                object_content_type_id=object_ctype_pk,
+                object_id=object_id,
+                expires_at=wanted[user_pk, perm_pk, object_ctype_pk, object_id],
+            )
+            for user_pk, perm_pk, object_ctype_pk, object_id in missing
+        ],
+        ignore_conflicts=True,
+    )
+
+    return len(missing), deleted, {key[0] for key in stale.union(missing)}
+
+
+def rebuild_users(user_pks, batch_size: int = 1000) -> tuple[int, int]:
+    """
+    Recompute the effective permissions of the users in `user_pks`, in
+    batches of `batch_size` users, only writing the rows that changed.
+    Return the number of rows created and deleted.
+    """
+    created = deleted = 0
+    iterator = iter(sorted(set(user_pks)))
+
+    while chunk := list(islice(iterator, batch_size)):
+        with transaction.atomic():
+            chunk_created, chunk_deleted, changed_pks = _write(
+                compute(chunk),
+                EffectivePermission.objects.filter(user_id__in=chunk).values_list(
+                    "pk", "user_id", "permission_id", "object_content_type_id", "object_id", "expires_at"
+                ),
+            )
+
+        cache.invalidate_users(changed_pks)
+        created += chunk_created
+        deleted += chunk_deleted
+
+    return created, deleted
+
+
+def refresh(keys, batch_size: int = 1000) -> tuple[int, int]:
+    """
+    Re-check the effective permissions with keys `keys`, (user pk,
+    permission pk, object content type pk, object id) tuples, against the
+    grants, `batch_size` keys at a time, only writing the rows that changed.
+    Return the number of rows created and deleted.
+    """
+    created = deleted = 0
+    iterator = iter(sorted(set(keys), key=lambda key: (key[0], key[1], key[2] or 0, key[3])))
+
+    while chunk := set(islice(iterator, batch_size)):
+        user_pks = {key[0] for key in chunk}
+        model_perm_pks, object_perm_pks, objects_by_ctype = _get_scope(chunk)
+
+        objects_q = [
+            Q(object_content_type_id=object_ctype_pk, object_id__in=list(object_ids))
+            for object_ctype_pk, object_ids in objects_by_ctype.items()
+        ]
+        if model_perm_pks:
+            objects_q.append(Q(object_content_type=None))
+
+        with transaction.atomic():
+            existing_rows = EffectivePermission.objects.filter(
+                reduce(or_, objects_q),
+                user_id__in=list(user_pks),
+                permission_id__in=list(model_perm_pks | object_perm_pks),
+            ).values_list("pk", "user_id", "permission_id", "object_content_type_id", "object_id", "expires_at")
+
+            chunk_created, chunk_deleted, changed_pks = _write(
+                compute(user_pks, chunk), [row for row in existing_rows if tuple(row[1:5]) in chunk]
+            )
+
+        cache.invalidate_users(changed_pks)
+        created += chunk_created
+        deleted += chunk_deleted
+
+    return created, deleted
+
+
+class _PendingKeys:
+    """
+    The keys of the effective permissions to re-check once the transaction
+    that changed their grants commits. Only the `on_commit` callback holds
+    on to them: Django drops it when the transaction is rolled back, and the
+    pending keys with it. Keys queued in a savepoint rolled back since are
+    re-checked too, which leaves their rows as they were.
+    """
+
+    def __init__(self, using):
+        self.using = using
+        self.keys = set()
+
+    def flush(self):
+        if _local.pending.get(self.using) is self:
+            del _local.pending[self.using]
+
+        refresh(self.keys)
+
+
+def _queue(keys):
+    connection = transaction.get_connection()
+
+    # Outside a transaction, the rows are refreshed right away.
+    if not connection.in_atomic_block:
+        refresh(keys)
+        return
+
+    pending_by_alias = _local.__dict__.setdefault("pending", weakref.WeakValueDictionary())
+    pending = pending_by_alias.get(connection.alias)
+
+    if pending is None:
+        pending = pending_by_alias[connection.alias] = _PendingKeys(connection.alias)
+        transaction.on_commit(pending.flush)
+
+    pending.keys.update(keys)
+
+
+def _get_from_name(grantee_model) -> str | None:
+    for from_name, model in get_grantee_models().items():
+        if issubclass(grantee_model, model):
+            return from_name
+
+    return None
+
+
+def _get_members(from_name, grantee_pks) -> set:
+    if from_name == "user":
+        return set(grantee_pks)
+
+    if from_name == "role" and not model_field_exists(UserModel, "roles"):
+        return set()
+
+    return set(cache.get_members(get_grantee_models()[from_name], list(grantee_pks)))
+
+
+def _get_grant_keys(from_name, grantee_pks) -> set:
+    """
+    Return the (permission pk, object content type pk, object id) keys of
+    every grant to the grantees `grantee_pks` of kind `from_name`, and to
+    the ancestors of the roles among them.
+    """
+    grantee_pks = set(grantee_pks)
+    grantee_model = get_grantee_models()[from_name]
+
+    if from_name == "role":
+        grantee_pks |= set(
+            RoleClosure.objects.filter(descendant__in=grantee_pks).values_list("ancestor_id", flat=True)
+        )
+
+    field = grantee_model._meta.get_field("user_permissions" if from_name == "user" else "permissions")
+    keys = {
+        (perm_pk, *MODEL_LEVEL)
+        for perm_pk in field.remote_field.through._default_manager.filter(
+            **{f"{field.m2m_field_name()}__in": grantee_pks}
+        ).values_list(field.m2m_reverse_field_name(), flat=True)
+    }
+
+    keys |= {
+        (perm_pk, object_ctype_pk, str(object_id))
+        for perm_pk, object_ctype_pk, object_id in ObjectPermission.objects.filter(
+            grantee_content_type=ContentType.objects.get_for_model(grantee_model),
+            grantee_id__in=[ObjectPermission.to_grantee_id(pk) for pk in grantee_pks],
+        ).values_list("permission_id", "object_content_type_id", "object_id")
+    }
+
+    for model, direct_from_name, direct_model in iter_direct_models():
+        if direct_from_name == from_name:
+            object_ctype_pk = ContentType.objects.get_for_model(model).pk
+            keys |= {
+                (perm_pk, object_ctype_pk, str(object_pk))
+                for perm_pk, object_pk in direct_model.objects.filter(
+                    **{f"{from_name}__in": grantee_pks}
+                ).values_list("permission_id", "content_object_id")
+            }
+
+    return keys
+
+
+def grants_changed(grantee_model, grantee_pks, grants):
+    """
+    Re-check, once the transaction commits, the effective permissions given
+    by `grants`, (permission pk, object content type pk, object id) keys
+    with `MODEL_LEVEL` as object for model-level permissions, to the users
+    the grantees of `grantee_model` with `grantee_pks` apply to, after those
+    grants were added, changed or removed.
+    """
+    from_name = _get_from_name(grantee_model) if is_enabled() else None
+
+    if from_name is None:
+        return
+
+    grants = list(grants)
+    user_pks = _get_members(from_name, {grantee_model._meta.pk.to_python(pk) for pk in grantee_pks})
+
+    if grants and user_pks:
+        _queue({(user_pk, *grant) for user_pk in user_pks for grant in grants})
+
+
+def memberships_changed(user_pks, grantee_model, grantee_pks):
+    """
+    Re-check, once the transaction commits, the effective permissions the
+    groups or roles of `grantee_model` with `grantee_pks` give to the users
+    in `user_pks`, after they joined or left them, or after the ancestors of
+    the roles changed. The grants are read right away, before the group or
+    role can be deleted.
+    """
+    if not is_enabled() or not user_pks:
+        return
+
+    grants = _get_grant_keys(_get_from_name(grantee_model), grantee_pks)
+
+    if grants:
+        _queue({(user_pk, *grant) for user_pk in user_pks for grant in grants})
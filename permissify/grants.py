@@ -0,0 +1,346 @@
+"""
+Object permissions live either in the generic ObjectPermission model or, for
+protected models that declare one, in a direct foreign key table (a subclass
+of `UserObjectPermissionBase`, `GroupObjectPermissionBase` or
+`RoleObjectPermissionBase`). The helpers below hide which one is used for a
+given protected model and kind of grantee ("user", "group" or "role").
+
+A protected model can also inherit the grants made on a parent object, by
+naming the foreign key to it in a `permissify_parent` attribute:
+
+    class Task(models.Model):
+        project = models.ForeignKey(Project, on_delete=models.CASCADE)
+
+        permissify_parent = "project"
+
+A permission on tasks granted on a project then applies to all its tasks,
+and to the tasks of its own children if `Project` declares a parent too.
+"""
+from datetime import datetime
+from functools import lru_cache
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import CharField, F, ForeignKey, Min, Model, OuterRef, Q, QuerySet, TextField
+from django.db.models.functions import Cast, Now
+from django.utils import timezone
+
+from permissify.models import (
+    GroupObjectPermissionBase,
+    Role,
+    RoleObjectPermissionBase,
+    UserObjectPermissionBase,
+)
+from permissify.utils import cast_to_field, get_object_permission_model, pks_for_field
+
+
+UserModel = get_user_model()
+ObjectPermission = get_object_permission_model()
+
+_DIRECT_BASES = {
+    "user": UserObjectPermissionBase,
+    "group": GroupObjectPermissionBase,
+    "role": RoleObjectPermissionBase,
+}
+
+
+def get_grantee_models() -> dict[str, type[Model]]:
+    return {"user": UserModel, "group": Group, "role": Role}
+
+
+def get_from_name(grantee_model: type[Model]) -> str:
+    """
+    Return the kind of grantee ("user", "group" or "role") of `grantee_model`.
+    """
+    for from_name, model in get_grantee_models().items():
+        if issubclass(grantee_model, model):
+            return from_name
+
+    raise TypeError(f"{grantee_model.__name__} can't be granted permissions.")
+
+
+@lru_cache(maxsize=None)
+def _get_direct_models() -> dict[tuple[type[Model], str], type[Model]]:
+    direct_models = {}
+
+    for model in apps.get_models():
+        for from_name, base in _DIRECT_BASES.items():
+            if issubclass(model, base):
+                protected_model = model._meta.get_field("content_object").related_model
+                direct_models[(protected_model._meta.concrete_model, from_name)] = model
+
+    return direct_models
+
+
+def get_direct_model(model: type[Model], from_name: str) -> type[Model] | None:
+    """
+    Return the direct foreign key table holding the permissions granted to
+    grantees of kind `from_name` on objects of `model`, if there is one.
+    """
+    return _get_direct_models().get((model._meta.concrete_model, from_name))
+
+
+def get_direct_models() -> list[type[Model]]:
+    return list(_get_direct_models().values())
+
+
+def iter_direct_models():
+    """
+    Yield the protected model, the kind of grantee and the model of every
+    direct foreign key table.
+    """
+    for (model, from_name), direct_model in _get_direct_models().items():
+        yield model, from_name, direct_model
+
+
+def get_key_fields(grant_model: type[Model]) -> tuple[str, ...]:
+    """
+    Return the names of the attributes identifying a grant of `grant_model`,
+    either a direct foreign key table or ObjectPermission.
+    """
+    for from_name, base in _DIRECT_BASES.items():
+        if issubclass(grant_model, base):
+            return f"{from_name}_id", "content_object_id", "permission_id"
+
+    return "grantee_content_type_id", "grantee_id", "object_id", "permission_id"
+
+
+@lru_cache(maxsize=None)
+def get_ancestors(model: type[Model]) -> tuple[tuple[type[Model], str], ...]:
+    """
+    Return the models `model` inherits grants from, following the
+    `permissify_parent` attributes, each with the lookup from `model` to it.
+    """
+    ancestors = []
+    current = model._meta.concrete_model
+    seen = {current}
+    path = ""
+
+    while (parent := getattr(current, "permissify_parent", None)) is not None:
+        field = current._meta.get_field(parent)
+
+        if not isinstance(field, ForeignKey):
+            raise ImproperlyConfigured(
+                f"{current.__name__}.permissify_parent must name a foreign key, not '{parent}'."
+            )
+
+        path = f"{path}__{parent}" if path else parent
+        current = field.related_model._meta.concrete_model
+
+        if current in seen:
+            raise ImproperlyConfigured(f"The permissify_parent chain of {model.__name__} is cyclic.")
+
+        seen.add(current)
+        ancestors.append((current, path))
+
+    return tuple(ancestors)
+
+
+def get_targets(obj: Model) -> list[tuple[type[Model], object]]:
+    """
+    Return the objects whose grants apply to `obj`, as (model, primary key
+    or queryset) pairs: `obj` itself and its ancestors. The parent's key is
+    read from `obj`, the ancestors further up are resolved in a subquery.
+    """
+    model = obj._meta.concrete_model
+    targets = [(model, obj.pk)]
+
+    for ancestor_model, path in get_ancestors(model):
+        if "__" in path:
+            ancestor_pks = model._default_manager.filter(pk=obj.pk).values(path)
+            targets.append((ancestor_model, ancestor_model._default_manager.filter(pk__in=ancestor_pks)))
+            continue
+
+        parent_pk = getattr(obj, model._meta.get_field(path).attname)
+        if parent_pk is None:
+            break
+
+        targets.append((ancestor_model, parent_pk))
+
+    return targets
+
+
+def get_outer_targets(model: type[Model]) -> list[tuple[type[Model], OuterRef]]:
+    """
+    Return the objects whose grants apply to each row of a queryset of
+    `model`, as (model, outer reference) pairs to filter it with.
+    """
+    return [(model._meta.concrete_model, OuterRef("pk"))] + [
+        (ancestor_model, OuterRef(path)) for ancestor_model, path in get_ancestors(model)
+    ]
+
+
+def get_unexpired_q() -> Q:
+    """
+    Return a filter matching the grants that haven't expired, read from
+    ObjectPermission, a direct foreign key table or EffectivePermission.
+    """
+    return Q(expires_at=None) | Q(expires_at__gt=Now())
+
+
+def get_next_expiry(grantees: dict) -> datetime | None:
+    """
+    Return the earliest expiry still to come of the grants to `grantees`, a
+    mapping of kinds of grantee to a grantee or a queryset of grantees, from
+    ObjectPermission and the direct foreign key tables.
+    """
+    grantee_field = ObjectPermission._meta.get_field("grantee_id")
+    now = timezone.now()
+    generic_q = Q()
+    expiries = []
+
+    for from_name, kind_grantees in grantees.items():
+        if isinstance(kind_grantees, QuerySet):
+            grantee_q = Q(grantee_id__in=pks_for_field(kind_grantees, grantee_field))
+            direct_lookup = f"{from_name}__in"
+        else:
+            grantee_q = Q(grantee_id=ObjectPermission.to_grantee_id(kind_grantees.pk))
+            direct_lookup = from_name
+
+        generic_q |= Q(
+            grantee_q, grantee_content_type=ContentType.objects.get_for_model(get_grantee_models()[from_name])
+        )
+
+        for model, direct_from_name, direct_model in iter_direct_models():
+            if direct_from_name == from_name:
+                expiries.append(
+                    direct_model.objects.filter(expires_at__gt=now, **{direct_lookup: kind_grantees}).aggregate(
+                        next_expiry=Min("expires_at")
+                    )["next_expiry"]
+                )
+
+    if generic_q:
+        expiries.append(
+            ObjectPermission.objects.filter(generic_q, expires_at__gt=now).aggregate(next_expiry=Min("expires_at"))[
+                "next_expiry"
+            ]
+        )
+
+    return min((expires_at for expires_at in expiries if expires_at is not None), default=None)
+
+
+def _is_many(value) -> bool:
+    return isinstance(value, (QuerySet, list, tuple, set))
+
+
+def get_generic_grants_q(model: type[Model], from_name: str, grantees, objects) -> Q:
+    """
+    Return a filter on ObjectPermission matching the grants to `grantees`
+    on `objects` of `model`. `grantees` is a grantee, a list or queryset of
+    grantees, or None for any grantee of kind `from_name`; `objects` a primary
+    key, an expression, or a list or queryset.
+    """
+    grantee_field = ObjectPermission._meta.get_field("grantee_id")
+    object_field = ObjectPermission._meta.get_field("object_id")
+
+    if grantees is None:
+        grantee_q = Q()
+    elif isinstance(grantees, QuerySet):
+        grantee_q = Q(grantee_id__in=pks_for_field(grantees, grantee_field))
+    elif _is_many(grantees):
+        grantee_q = Q(grantee_id__in=[ObjectPermission.to_grantee_id(grantee.pk) for grantee in grantees])
+    else:
+        grantee_q = Q(grantee_id=ObjectPermission.to_grantee_id(grantees.pk))
+
+    if isinstance(objects, QuerySet):
+        object_q = Q(object_id__in=pks_for_field(objects, object_field))
+    elif _is_many(objects):
+        object_q = Q(object_id__in=[ObjectPermission.to_object_id(pk) for pk in objects])
+    elif hasattr(objects, "resolve_expression"):
+        object_q = Q(object_id=cast_to_field(objects, object_field))
+    else:
+        object_q = Q(object_id=ObjectPermission.to_object_id(objects))
+
+    return Q(
+        grantee_q,
+        object_q,
+        grantee_content_type=ContentType.objects.get_for_model(get_grantee_models()[from_name]),
+        object_content_type=ContentType.objects.get_for_model(model),
+    )
+
+
+def filter_grants(model: type[Model], from_name: str, grantees, objects) -> QuerySet:
+    """
+    Return the grants to `grantees` on `objects` of `model`, from the direct
+    foreign key table of `model` if there is one, or from ObjectPermission.
+    """
+    direct_model = get_direct_model(model, from_name)
+
+    if direct_model is None:
+        return ObjectPermission.objects.filter(get_generic_grants_q(model, from_name, grantees, objects))
+
+    object_lookup = "content_object" + ("__in" if _is_many(objects) else "")
+    grants = direct_model.objects.filter(**{object_lookup: objects})
+
+    if grantees is None:
+        return grants
+
+    grantee_lookup = from_name + ("__in" if _is_many(grantees) else "")
+    return grants.filter(**{grantee_lookup: grantees})
+
+
+def get_grantee_pks(from_name: str, targets, **filters) -> list[QuerySet]:
+    """
+    Return subqueries of the primary keys of the grantees of kind
+    `from_name` holding unexpired grants, matching `filters`, on any of
+    `targets`, (model, objects) pairs such as the ones of `get_targets`: one
+    for ObjectPermission and one for each direct foreign key table involved.
+    """
+    grantee_model = get_grantee_models()[from_name]
+    generic_q = Q()
+    subqueries = []
+
+    for model, objects in targets:
+        if get_direct_model(model, from_name) is None:
+            generic_q |= get_generic_grants_q(model, from_name, None, objects)
+        else:
+            subqueries.append(
+                filter_grants(model, from_name, None, objects)
+                .filter(get_unexpired_q(), **filters)
+                .values(f"{from_name}_id")
+            )
+
+    if generic_q:
+        grantee_field = ObjectPermission._meta.get_field("grantee_id")
+        grantee_pk = F("grantee_id")
+
+        # Read string grantee ids as primary keys, rather than casting the
+        # primary keys of the outer query which would prevent using their index.
+        if isinstance(grantee_field, (CharField, TextField)):
+            grantee_pk = Cast(grantee_pk, grantee_model._meta.pk)
+
+        subqueries.append(
+            ObjectPermission.objects.filter(generic_q, get_unexpired_q(), **filters).values(grantee_pk=grantee_pk)
+        )
+
+    return subqueries
+
+
+def make_grant(model: type[Model], from_name: str, grantee_pk, object_pk, perm_pk, expires_at=None) -> Model:
+    """
+    Return an unsaved grant of the permission `perm_pk` to the grantee
+    `grantee_pk` on the object `object_pk` of `model`.
+    """
+    direct_model = get_direct_model(model, from_name)
+
+    if direct_model is None:
+        return ObjectPermission(
+            grantee_content_type=ContentType.objects.get_for_model(get_grantee_models()[from_name]),
+            grantee_id=ObjectPermission.to_grantee_id(grantee_pk),
+            object_content_type=ContentType.objects.get_for_model(model),
+            object_id=ObjectPermission.to_object_id(object_pk),
+            permission_id=perm_pk,
+            expires_at=expires_at,
+        )
+
+    return direct_model(
+        **{
+            f"{from_name}_id": grantee_pk,
+            "content_object_id": object_pk,
+            "permission_id": perm_pk,
+            "expires_at": expires_at,
+        }
+    )
@@ -0,0 +1,153 @@
+"""
+Maintenance of the RoleClosure table, the transitive closure of the role
+hierarchy declared by `Role.parents`.
+"""
+from collections import defaultdict, deque
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+
+from permissify.models import Role, RoleClosure
+from permissify.utils import model_field_exists
+
+
+UserModel = get_user_model()
+
+
+def _get_members_query() -> str:
+    return UserModel._meta.get_field("roles").related_query_name()
+
+
+def get_members_q(user, prefix: str = "") -> Q:
+    """
+    Return a filter matching the roles, at `prefix` from the filtered model,
+    that `user` holds directly or through one of their descendants.
+    """
+    members_query = _get_members_query()
+
+    return Q(**{f"{prefix}{members_query}": user}) | Q(
+        **{f"{prefix}descendant_links__descendant__{members_query}": user}
+    )
+
+
+def get_inheriting_q(role_pks, lookup: str = "pk") -> Q:
+    """
+    Return a filter matching, at `lookup`, the roles in `role_pks` (a list or
+    a subquery) and the roles inheriting from them, in uncorrelated
+    subqueries.
+    """
+    return Q(**{f"{lookup}__in": role_pks}) | Q(
+        **{f"{lookup}__in": RoleClosure.objects.filter(ancestor__in=role_pks).values("descendant")}
+    )
+
+
+def get_user_roles(user_obj):
+    """
+    Return the roles of `user_obj` and the roles they inherit from.
+    """
+    if not model_field_exists(UserModel, "roles"):
+        return Role.objects.none()
+
+    roles = Role.objects.filter(**{_get_members_query(): user_obj}).values("pk")
+
+    return Role.objects.filter(
+        Q(pk__in=roles) | Q(pk__in=RoleClosure.objects.filter(descendant__in=roles).values("ancestor"))
+    )
+
+
+def get_descendants(role_pks, using=None) -> set:
+    """
+    Return the primary keys of the roles in `role_pks` and of every role
+    inheriting from them.
+    """
+    return set(role_pks) | set(
+        RoleClosure.objects.using(using).filter(ancestor__in=role_pks).values_list("descendant_id", flat=True)
+    )
+
+
+def check_parents(role_pk, parent_pks, using=None):
+    """
+    Raise a ValidationError if making the roles in `parent_pks` parents of
+    the role `role_pk` would create a cycle.
+    """
+    if (
+        role_pk in parent_pks
+        or RoleClosure.objects.using(using).filter(ancestor=role_pk, descendant__in=parent_pks).exists()
+    ):
+        raise ValidationError(
+            _("A role can't inherit from itself or from one of its descendants."),
+            code="role_cycle",
+        )
+
+
+def _get_parents(using) -> dict:
+    field = Role._meta.get_field("parents")
+    rows = field.remote_field.through._default_manager.using(using).values_list(
+        field.m2m_field_name(),
+        field.m2m_reverse_field_name(),
+    )
+
+    parents = defaultdict(set)
+    for role_pk, parent_pk in rows:
+        parents[role_pk].add(parent_pk)
+
+    return parents
+
+
+def _get_ancestors(parents, role_pk) -> dict:
+    """
+    Return the ancestors of `role_pk` mapped to their distance to it.
+    """
+    ancestors = {role_pk: 0}
+    queue = deque([role_pk])
+
+    while queue:
+        pk = queue.popleft()
+        for parent_pk in parents.get(pk, ()):
+            if parent_pk not in ancestors:
+                ancestors[parent_pk] = ancestors[pk] + 1
+                queue.append(parent_pk)
+
+    return ancestors
+
+
+def rebuild_closure(role_pks=None, using=None) -> tuple[int, int]:
+    """
+    Recompute the ancestors of the roles in `role_pks`, all roles by default,
+    in the database `using`, only writing the rows that changed. Changing the
+    parents of a role changes the ancestors of its descendants too: pass
+    them all. Return the number of rows created and deleted.
+    """
+    closure = RoleClosure.objects.using(using)
+
+    with transaction.atomic(using=closure.db):
+        if role_pks is None:
+            role_pks = set(Role.objects.using(using).values_list("pk", flat=True))
+
+        parents = _get_parents(using)
+        wanted = {
+            (ancestor_pk, role_pk): depth
+            for role_pk in role_pks
+            for ancestor_pk, depth in _get_ancestors(parents, role_pk).items()
+            if ancestor_pk != role_pk
+        }
+        existing = {
+            (ancestor_pk, role_pk): (pk, depth)
+            for pk, ancestor_pk, role_pk, depth in closure.filter(descendant__in=role_pks).values_list(
+                "pk", "ancestor_id", "descendant_id", "depth"
+            )
+        }
+
+        stale = [pk for key, (pk, depth) in existing.items() if wanted.get(key) != depth]
+        deleted = closure.filter(pk__in=stale).delete()[0] if stale else 0
+
+        missing = [key for key, depth in wanted.items() if existing.get(key, (None, None))[1] != depth]
+        closure.bulk_create(
+            RoleClosure(ancestor_id=ancestor_pk, descendant_id=role_pk, depth=wanted[ancestor_pk, role_pk])
+            for ancestor_pk, role_pk in missing
+        )
+
+    return len(missing), deleted
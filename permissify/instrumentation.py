@@ -0,0 +1,108 @@
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Awaitable, Callable
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import Permission
+from django.db import connections, router
+from django.dispatch import Signal
+
+
+# Sent after each `has_perm` check of the permissify backends, with:
+#   user_obj: the user checked,
+#   perm: the permission name,
+#   obj_type: the model of the object checked, or None for a model-level check,
+#   cache_hit: whether the check was answered without querying the database,
+#   queries: the number of queries run by the check,
+#   elapsed: the duration of the check, in seconds,
+#   result: the outcome of the check.
+# Checks are only measured while the signal has receivers.
+permission_checked = Signal()
+
+
+def _send(backend, user_obj, perm, obj, queries, elapsed, result):
+    permission_checked.send(
+        sender=type(backend),
+        user_obj=user_obj,
+        perm=perm,
+        obj_type=type(obj) if obj is not None else None,
+        cache_hit=queries == 0,
+        queries=queries,
+        elapsed=elapsed,
+        result=result,
+    )
+
+
+def observe(backend, user_obj, perm, obj, check: Callable[[object, str, object], bool]) -> bool:
+    """
+    Run `check(user_obj, perm, obj)` and send `permission_checked` with its
+    query count and duration.
+    """
+    if not permission_checked.has_listeners(type(backend)):
+        return check(user_obj, perm, obj)
+
+    queries = 0
+
+    def count_queries(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    with connections[router.db_for_read(Permission)].execute_wrapper(count_queries):
+        start = perf_counter()
+        result = check(user_obj, perm, obj)
+        elapsed = perf_counter() - start
+
+    _send(backend, user_obj, perm, obj, queries, elapsed, result)
+    return result
+
+
+# The query counters of the async checks in progress, in their context.
+_query_count = ContextVar("permissify_query_count", default=None)
+
+
+def _count_query(execute, sql, params, many, context):
+    counter = _query_count.get()
+    if counter is not None:
+        counter[0] += 1
+    return execute(sql, params, many, context)
+
+
+def _watch_queries(alias, watch: bool):
+    # The queries of an async check run on the connection of the thread
+    # `sync_to_async` runs them in: count them there, for as long as a check
+    # of the thread is observed. Each check counts the queries of its own
+    # context only.
+    connection = connections[alias]
+    watchers = getattr(connection, "_permissify_watchers", 0)
+
+    if watch and not watchers:
+        connection.execute_wrappers.append(_count_query)
+    elif not watch and watchers == 1:
+        connection.execute_wrappers.remove(_count_query)
+
+    connection._permissify_watchers = watchers + (1 if watch else -1)
+
+
+async def aobserve(backend, user_obj, perm, obj, check: Callable[[object, str, object], Awaitable[bool]]) -> bool:
+    """
+    Async version of `observe`, running `await check(user_obj, perm, obj)`.
+    """
+    if not permission_checked.has_listeners(type(backend)):
+        return await check(user_obj, perm, obj)
+
+    alias = router.db_for_read(Permission)
+    counter = [0]
+    token = _query_count.set(counter)
+    await sync_to_async(_watch_queries)(alias, True)
+
+    try:
+        start = perf_counter()
+        result = await check(user_obj, perm, obj)
+        elapsed = perf_counter() - start
+    finally:
+        await sync_to_async(_watch_queries)(alias, False)
+        _query_count.reset(token)
+
+    _send(backend, user_obj, perm, obj, counter[0], elapsed, result)
+    return result
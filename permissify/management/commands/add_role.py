@@ -1,7 +1,7 @@
-from django.contrib.auth.models import Permission
 from django.core.management.base import BaseCommand
 
 from permissify.models import Role
+from permissify.registry import get_registry
 
 
 class Command(BaseCommand):
@@ -25,11 +25,7 @@ class Command(BaseCommand):
             for perm in perms:
                 codename, app_label, model = perm.split(',')
 
-                permission = Permission.objects.using(alias).filter(
-                    codename=codename,
-                    content_type__app_label=app_label,
-                    content_type__model=model
-                ).get()
+                permission = get_registry(alias).get_by_natural_key(codename, app_label, model)
 
                 role.permissions.add(permission)
 
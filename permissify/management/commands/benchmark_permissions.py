@@ -0,0 +1,252 @@
+import random
+from copy import copy
+from time import perf_counter
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from permissify.backends import ObjectPermissionModelBackend
+from permissify.models import Role
+from permissify.registry import get_registry
+from permissify.shortcuts import grant_perm
+from permissify.utils import get_object_permission_model, model_field_exists
+
+
+UserModel = get_user_model()
+ObjectPermission = get_object_permission_model()
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Generates users, groups, roles, objects and object permissions inside a '
+        'transaction, prints the query plans of the permission lookups, measures the '
+        'latency and query count of the hot paths, and rolls back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--groups', type=int, default=10)
+        parser.add_argument('--roles', type=int, default=5)
+        parser.add_argument('--objects', type=int, default=1000)
+        parser.add_argument('--grants', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--database', type=str, default='default')
+
+    def handle(self, *args, **options):
+        alias = options.get('database')
+        random.seed(options.get('seed'))
+
+        try:
+            with transaction.atomic(using=alias):
+                data = self.generate(alias, options)
+                self.explain(alias, data)
+                self.measure(alias, data, options.get('iterations'))
+                raise Rollback
+        except Rollback:
+            pass
+
+    def generate(self, alias, options):
+        """
+        Create the benchmark dataset. Groups are used as the protected
+        objects, as they are available in every project.
+        """
+        has_roles = model_field_exists(UserModel, 'roles')
+
+        users = UserModel._default_manager.db_manager(alias).bulk_create(
+            UserModel(username=f'permissify-bench-user-{i}', password='!')
+            for i in range(options['users'])
+        )
+        groups = Group.objects.using(alias).bulk_create(
+            Group(name=f'permissify-bench-group-{i}') for i in range(options['groups'])
+        )
+        roles = Role.objects.using(alias).bulk_create(
+            Role(name=f'permissify-bench-role-{i}') for i in range(options['roles'])
+        ) if has_roles else []
+        objects = Group.objects.using(alias).bulk_create(
+            Group(name=f'permissify-bench-object-{i}') for i in range(options['objects'])
+        )
+
+        UserGroup = UserModel.groups.through
+        UserGroup.objects.using(alias).bulk_create(
+            (
+                UserGroup(user_id=user.pk, group_id=group.pk)
+                for user in users
+                for group in random.sample(groups, min(len(groups), 2))
+            ),
+            ignore_conflicts=True,
+        )
+
+        if roles:
+            UserRole = UserModel.roles.through
+            UserRole.objects.using(alias).bulk_create(
+                (
+                    UserRole(user_id=user.pk, role_id=role.pk)
+                    for user in users
+                    for role in random.sample(roles, 1)
+                ),
+                ignore_conflicts=True,
+            )
+
+        object_ctype = ContentType.objects.db_manager(alias).get_for_model(Group)
+        perms = list(Permission.objects.using(alias).filter(content_type=object_ctype).select_related('content_type'))
+        grantees = [
+            (ContentType.objects.db_manager(alias).get_for_model(grantee), grantee)
+            for grantee in [*users, *groups, *roles]
+        ]
+
+        ObjectPermission.objects.using(alias).bulk_create(
+            (
+                ObjectPermission(
+                    grantee_content_type=grantee_ctype,
+                    grantee_id=ObjectPermission.to_grantee_id(grantee.pk),
+                    object_content_type=object_ctype,
+                    object_id=ObjectPermission.to_object_id(random.choice(objects).pk),
+                    permission=random.choice(perms),
+                )
+                for grantee_ctype, grantee in random.choices(grantees, k=options['grants'])
+            ),
+            batch_size=10000,
+            ignore_conflicts=True,
+        )
+
+        # Without statistics on the freshly filled tables, the planner can
+        # pick a much less selective index than it would in production.
+        if connections[alias].vendor in ('sqlite', 'postgresql'):
+            with connections[alias].cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        return {
+            'users': users,
+            'groups': groups,
+            'roles': roles,
+            'objects': objects,
+            'perms': perms,
+        }
+
+    def explain(self, alias, data):
+        backend = ObjectPermissionModelBackend()
+        user = random.choice(data['users'])
+        obj = random.choice(data['objects'])
+        perm = random.choice(data['perms'])
+
+        queries = {
+            'Permissions of a user on an object': ObjectPermission.objects.using(alias).filter(
+                backend._get_grants_condition(user, [(Group, obj.pk)]),
+            ),
+            'Objects a user can access': backend.get_objects_for_user(
+                user, perm, Group.objects.using(alias).all()
+            ),
+            'Objects a grantee can access': ObjectPermission.objects.using(alias).filter(
+                grantee_content_type=ContentType.objects.db_manager(alias).get_for_model(user),
+                grantee_id=ObjectPermission.to_grantee_id(user.pk),
+                permission=perm,
+            ).values('object_content_type', 'object_id'),
+            'Users with a permission on an object': backend.with_perm(perm, obj=obj).using(alias),
+        }
+
+        for title, queryset in queries.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(title))
+            self.stdout.write(queryset.explain())
+            self.stdout.write('')
+
+    def measure(self, alias, data, iterations):
+        """
+        Time the hot paths through the public API and print the latency
+        percentiles and the number of queries of a call. Cold checks run on a
+        fresh copy of the user, without any permission cached on it.
+        """
+        if iterations <= 0:
+            return
+
+        if alias != DEFAULT_DB_ALIAS:
+            self.stdout.write(self.style.WARNING(
+                'The backends and shortcuts query the default database, skipping the measurements.'
+            ))
+            return
+
+        backend = ObjectPermissionModelBackend()
+        users, objects = data['users'], data['objects']
+        perms = {f'{perm.content_type.app_label}.{perm.codename}': perm for perm in data['perms']}
+        perm_names = list(perms)
+
+        warm_user = copy(random.choice(users))
+        warm_obj = random.choice(objects)
+        backend.get_all_permissions(warm_user, warm_obj)
+
+        # The registry and content types are process-wide and warm in a
+        # long-running process, load them upfront.
+        get_registry().warm()
+        ContentType.objects.get_for_models(UserModel, Group, Role)
+
+        hot_paths = {
+            'has_perm on an object, cold': lambda: backend.has_perm(
+                copy(random.choice(users)), random.choice(perm_names), random.choice(objects)
+            ),
+            'has_perm on an object, warm': lambda: backend.has_perm(
+                warm_user, random.choice(perm_names), warm_obj
+            ),
+            'get_all_permissions, cold': lambda: backend.get_all_permissions(copy(random.choice(users))),
+            'get_objects_for_user': lambda: list(backend.get_objects_for_user(
+                copy(random.choice(users)), random.choice(perm_names), Group.objects.all()
+            )),
+            'with_perm': lambda: list(backend.with_perm(random.choice(perm_names))),
+            'with_perm on an object': lambda: list(
+                backend.with_perm(random.choice(perm_names), obj=random.choice(objects))
+            ),
+            'users_with_perm_for_objects': lambda: backend.users_with_perm_for_objects(
+                random.choice(perm_names),
+                Group.objects.filter(pk__in=[obj.pk for obj in random.sample(objects, min(len(objects), 100))]),
+            ),
+            'grant_perm on an object': lambda: grant_perm(
+                random.choice(users), perms[random.choice(perm_names)], random.choice(objects)
+            ),
+        }
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{"Hot path (ms)":<32}{"p50":>10}{"p95":>10}{"p99":>10}{"queries":>10}'
+        ))
+
+        for title, func in hot_paths.items():
+            timings, queries = self.run(func, iterations)
+            self.stdout.write(
+                f'{title:<32}'
+                f'{percentile(timings, 50):>10.3f}'
+                f'{percentile(timings, 95):>10.3f}'
+                f'{percentile(timings, 99):>10.3f}'
+                f'{sum(queries) / len(queries):>10.1f}'
+            )
+
+    def run(self, func, iterations):
+        timings, queries = [], []
+        executed = 0
+
+        def count_queries(execute, sql, params, many, context):
+            nonlocal executed
+            executed += 1
+            return execute(sql, params, many, context)
+
+        with connections[DEFAULT_DB_ALIAS].execute_wrapper(count_queries):
+            for _ in range(iterations):
+                executed = 0
+                start = perf_counter()
+                func()
+                timings.append((perf_counter() - start) * 1000)
+                queries.append(executed)
+
+        return timings, queries
+
+
+def percentile(values, percent):
+    """
+    Return the `percent`th percentile of `values`, using the nearest-rank method.
+    """
+    values = sorted(values)
+    return values[max(0, -(-len(values) * percent // 100) - 1)]
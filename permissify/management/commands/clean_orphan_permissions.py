@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from permissify import batches, orphans
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes the object permissions whose object or grantee no longer exists, found per '
+        'content type with an anti-join and deleted in small batches so that no table is locked '
+        'for long.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Count the orphans without deleting them.')
+        parser.add_argument('--database', type=str, default='default')
+
+    def handle(self, *args, **options):
+        batch_size = options.get('batch_size')
+        dry_run = options.get('dry_run')
+        total = 0
+
+        for label, queryset in orphans.get_orphans(options.get('database')):
+            count = queryset.count() if dry_run else batches.delete_in_batches(queryset, batch_size)
+
+            if count:
+                self.stdout.write(f'{count} orphan {label}{" found" if dry_run else " deleted"}.')
+            total += count
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING(f'Dry run: {total} orphan permissions found.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{total} orphan permissions deleted.'))
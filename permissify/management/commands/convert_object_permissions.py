@@ -0,0 +1,91 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+from permissify.utils import get_object_permission_model
+
+
+ObjectPermission = get_object_permission_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Copies the object permissions stored in the string-typed permissify table into the '
+        'model set by PERMISSIFY_OBJECT_PERMISSION_MODEL, converting the grantee and object ids.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source-table', type=str, default='permissify_objectpermission')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--database', type=str, default='default')
+
+    def handle(self, *args, **options):
+        source_table = options.get('source_table')
+        batch_size = options.get('batch_size')
+        alias = options.get('database')
+
+        if ObjectPermission._meta.db_table == source_table:
+            raise CommandError(
+                'PERMISSIFY_OBJECT_PERMISSION_MODEL must point to a model other than the one '
+                f'stored in "{source_table}".'
+            )
+
+        connection = connections[alias]
+        quote_name = connection.ops.quote_name
+        columns = [
+            'grantee_content_type_id', 'grantee_id', 'object_content_type_id', 'object_id', 'permission_id', 'expires_at'
+        ]
+
+        with connection.cursor() as cursor:
+            source_columns = {
+                column.name for column in connection.introspection.get_table_description(cursor, source_table)
+            }
+
+        missing = [column for column in columns if column not in source_columns and column != 'expires_at']
+        if missing:
+            raise CommandError(f'"{source_table}" has no {", ".join(missing)} column.')
+
+        # Tables created before grants could expire have no expiry column:
+        # their grants never expire.
+        select = [quote_name(column) if column in source_columns else 'NULL' for column in columns]
+
+        # The cursor returns raw values: some backends store datetimes as
+        # strings, convert them as the ORM would.
+        expires_at_col = ObjectPermission._meta.get_field('expires_at').get_col(source_table)
+        converters = connection.ops.get_db_converters(expires_at_col)
+
+        copied = skipped = 0
+
+        # A server-side cursor, where supported, streams the rows.
+        with transaction.atomic(using=alias), connection.chunked_cursor() as cursor:
+            cursor.execute(
+                'SELECT %s FROM %s' % (', '.join(select), quote_name(source_table))
+            )
+
+            while rows := cursor.fetchmany(batch_size):
+                obj_perms = []
+
+                for grantee_ctype_id, grantee_id, object_ctype_id, object_id, perm_id, expires_at in rows:
+                    for converter in converters:
+                        expires_at = converter(expires_at, expires_at_col, connection)
+
+                    try:
+                        obj_perms.append(
+                            ObjectPermission(
+                                grantee_content_type_id=grantee_ctype_id,
+                                grantee_id=ObjectPermission.to_grantee_id(grantee_id),
+                                object_content_type_id=object_ctype_id,
+                                object_id=ObjectPermission.to_object_id(object_id),
+                                permission_id=perm_id,
+                                expires_at=expires_at,
+                            )
+                        )
+                    except ValidationError:
+                        skipped += 1
+
+                ObjectPermission.objects.using(alias).bulk_create(obj_perms, ignore_conflicts=True)
+                copied += len(obj_perms)
+
+                self.stdout.write(f'{copied} object permissions copied...')
+
+        self.stdout.write(self.style.SUCCESS(f'{copied} object permissions copied, {skipped} skipped.'))
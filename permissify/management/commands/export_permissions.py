@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from permissify import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Streams every object permission grant, from ObjectPermission and the direct foreign '
+        'key tables, as JSON Lines or CSV records using natural keys for the permissions and '
+        'content types.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', type=str, default='-', help='File to write to, "-" for stdout.')
+        parser.add_argument('--format', type=str, choices=transfer.FORMATS, default='jsonl')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--database', type=str, default='default')
+
+    def handle(self, *args, **options):
+        output = options.get('output')
+        chunk_size = options.get('chunk_size')
+        records = transfer.iter_records(options.get('database'), chunk_size)
+
+        stream = self.stdout if output == '-' else open(output, 'w', newline='', encoding='utf-8')
+        exported = 0
+
+        try:
+            for exported, record in enumerate(transfer.write_records(records, stream, options.get('format')), 1):
+                # The progress goes to stderr, stdout may be the export itself.
+                if exported % chunk_size == 0:
+                    self.stderr.write(f'{exported} permissions exported...')
+        finally:
+            if stream is not self.stdout:
+                stream.close()
+
+        self.stderr.write(self.style.SUCCESS(f'{exported} permissions exported.'))
@@ -0,0 +1,40 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from permissify import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Imports the object permission grants written by export_permissions, in batches '
+        'inserted with bulk_create(ignore_conflicts=True), skipping the grants already there '
+        'and the ones referring to unknown permissions or content types.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', type=str, help='File to read from, "-" for stdin.')
+        parser.add_argument('--format', type=str, choices=transfer.FORMATS, default='jsonl')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--database', type=str, default='default')
+
+    def handle(self, *args, **options):
+        path = options.get('input')
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        imported = skipped = 0
+
+        try:
+            records = transfer.read_records(stream, options.get('format'))
+
+            for batch_imported, batch_skipped in transfer.import_records(
+                records, options.get('database'), options.get('batch_size')
+            ):
+                imported += batch_imported
+                skipped += batch_skipped
+
+                self.stdout.write(f'{imported} permissions imported...')
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        self.stdout.write(self.style.SUCCESS(f'{imported} permissions imported, {skipped} skipped.'))
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from permissify.batches import delete_in_batches
+from permissify.grants import get_direct_models
+from permissify.models import EffectivePermission
+from permissify.utils import get_object_permission_model
+
+
+ObjectPermission = get_object_permission_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes the object permissions that have expired, in small batches so that no '
+        'table is locked for long.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--database', type=str, default='default')
+
+    def handle(self, *args, **options):
+        batch_size = options.get('batch_size')
+        alias = options.get('database')
+        now = timezone.now()
+        deleted = 0
+
+        # The expired rows of EffectivePermission are already ignored, only
+        # the cached permission sets of their users are stale.
+        for model in (ObjectPermission, *get_direct_models(), EffectivePermission):
+            deleted += self.purge(model, alias, now, batch_size)
+
+        self.stdout.write(self.style.SUCCESS(f'{deleted} expired permissions deleted.'))
+
+    def purge(self, model, alias, now, batch_size) -> int:
+        """
+        Delete the rows of `model` in the database `alias` that expired
+        before `now`, `batch_size` at a time, reporting the progress after
+        each batch.
+        """
+        return delete_in_batches(
+            model._base_manager.using(alias).filter(expires_at__lte=now),
+            batch_size,
+            lambda deleted: self.stdout.write(f'{deleted} expired {model._meta.verbose_name_plural} deleted...'),
+        )
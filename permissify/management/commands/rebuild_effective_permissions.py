@@ -0,0 +1,39 @@
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from permissify import effective
+
+
+UserModel = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Recomputes the effective permissions of every user, in batches, only writing '
+        'the rows that changed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options.get('batch_size')
+
+        user_pks = UserModel._default_manager.order_by('pk').values_list('pk', flat=True).iterator(
+            chunk_size=batch_size
+        )
+        users = created = deleted = 0
+
+        while chunk := list(islice(user_pks, batch_size)):
+            chunk_created, chunk_deleted = effective.rebuild_users(chunk, batch_size)
+            users += len(chunk)
+            created += chunk_created
+            deleted += chunk_deleted
+
+            self.stdout.write(f'{users} users processed...')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{users} users processed, {created} effective permissions created, {deleted} deleted.'
+        ))
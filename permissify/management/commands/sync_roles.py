@@ -0,0 +1,161 @@
+import json
+import re
+from functools import reduce
+from operator import or_
+
+from django.contrib.auth.models import Permission
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Q
+
+from permissify import cache, effective
+from permissify.models import Role
+from permissify.registry import get_registry
+
+
+class Command(BaseCommand):
+    help = (
+        'Synchronizes the permissions of the roles declared in a JSON or YAML spec, creating '
+        'the missing roles and only adding and removing the permissions that differ, in a '
+        'single transaction.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('spec', type=str, help='JSON or YAML file mapping role names to permissions.')
+        parser.add_argument('--dry-run', action='store_true', help='Print the changes without applying them.')
+        parser.add_argument('--database', type=str, default='default')
+
+    def handle(self, *args, **options):
+        alias = options.get('database')
+        dry_run = options.get('dry_run')
+        registry = get_registry(alias)
+
+        wanted = {
+            role_name: self.resolve(registry, role_name, perms)
+            for role_name, perms in self.load(options.get('spec')).items()
+        }
+
+        perms_field = Role._meta.get_field('permissions')
+        through = perms_field.remote_field.through._default_manager.db_manager(alias)
+        role_field, perm_field = perms_field.m2m_field_name(), perms_field.m2m_reverse_field_name()
+
+        # The roles and their permissions are read in the transaction that
+        # writes the changes, which are computed from them.
+        with transaction.atomic(using=alias):
+            roles = {role.name: role for role in Role.objects.using(alias).filter(name__in=wanted)}
+            current = {role.pk: set() for role in roles.values()}
+            for role_pk, perm_pk in through.filter(**{f'{role_field}__in': list(current)}).values_list(
+                f'{role_field}_id', f'{perm_field}_id'
+            ):
+                current[role_pk].add(perm_pk)
+
+            changes = {}
+            for role_name, perm_pks in wanted.items():
+                role = roles.get(role_name)
+                existing = current[role.pk] if role is not None else set()
+                added, removed = perm_pks - existing, existing - perm_pks
+
+                if role is None or added or removed:
+                    changes[role_name] = (added, removed)
+
+                if role is None:
+                    self.stdout.write(f'+ role {role_name}')
+                for perm_pk in sorted(added, key=registry.get_name):
+                    self.stdout.write(f'+ {role_name}: {registry.get_name(perm_pk)}')
+                for perm_pk in sorted(removed, key=registry.get_name):
+                    self.stdout.write(f'- {role_name}: {registry.get_name(perm_pk)}')
+
+            created = sum(role_name not in roles for role_name in changes)
+            added = sum(len(perm_pks) for perm_pks, _ in changes.values())
+            removed = sum(len(perm_pks) for _, perm_pks in changes.values())
+            summary = f'{created} roles created, {added} permissions added, {removed} removed'
+
+            if dry_run:
+                self.stdout.write(self.style.WARNING(f'Dry run: {summary}.'))
+                return
+
+            if not changes:
+                self.stdout.write(self.style.SUCCESS(f'{summary}.'))
+                return
+
+            # The missing roles are created in bulk as well, then read back
+            # for their primary keys, which not every backend returns.
+            missing = [role_name for role_name in changes if role_name not in roles]
+            Role.objects.using(alias).bulk_create([Role(name=role_name) for role_name in missing], ignore_conflicts=True)
+            roles.update((role.name, role) for role in Role.objects.using(alias).filter(name__in=missing))
+
+            through.bulk_create(
+                (
+                    perms_field.remote_field.through(**{f'{role_field}_id': roles[role_name].pk, f'{perm_field}_id': pk})
+                    for role_name, (perm_pks, _) in changes.items()
+                    for pk in perm_pks
+                ),
+                ignore_conflicts=True,
+            )
+
+            removals = [
+                Q(**{f'{role_field}_id': roles[role_name].pk, f'{perm_field}_id__in': perm_pks})
+                for role_name, (_, perm_pks) in changes.items()
+                if perm_pks
+            ]
+            if removals:
+                through.filter(reduce(or_, removals)).delete()
+
+            # The through table was written directly, without the signals
+            # that invalidate the members of the roles.
+            changed_pks = [
+                roles[role_name].pk for role_name, (perms_added, perms_removed) in changes.items()
+                if perms_added or perms_removed
+            ]
+            if changed_pks and alias == DEFAULT_DB_ALIAS:
+                if cache.is_enabled():
+                    cache.invalidate_users(cache.get_members(Role, changed_pks))
+
+                for role_name, (perms_added, perms_removed) in changes.items():
+                    effective.grants_changed(
+                        Role,
+                        [roles[role_name].pk],
+                        [(perm_pk, *effective.MODEL_LEVEL) for perm_pk in perms_added | perms_removed],
+                    )
+
+        self.stdout.write(self.style.SUCCESS(f'{summary}.'))
+
+    def load(self, path) -> dict:
+        """
+        Read the spec, a mapping of role names to lists of permissions, from
+        a JSON file, or a YAML file when PyYAML is installed.
+        """
+        with open(path, encoding='utf-8') as f:
+            if path.endswith(('.yaml', '.yml')):
+                try:
+                    import yaml
+                except ImportError:
+                    raise CommandError('Reading a YAML spec requires PyYAML, install it or use JSON.')
+
+                spec = yaml.safe_load(f)
+            else:
+                spec = json.load(f)
+
+        if not isinstance(spec, dict) or not all(isinstance(perms, list) for perms in spec.values()):
+            raise CommandError('The spec must map each role name to a list of permissions.')
+
+        return spec
+
+    def resolve(self, registry, role_name, perms) -> set:
+        """
+        Return the primary keys of `perms`, "app_label.codename" names or
+        "app_label.*" and "app_label.*_model" patterns, from the registry.
+        """
+        perm_pks = set()
+
+        for perm in perms:
+            if match := re.match(r'^(?P<app_label>\w+)\.\*(?:_(?P<model>\w+))?$', perm):
+                perm_pks.update(match_perm.pk for match_perm in registry.filter(**match.groupdict()))
+                continue
+
+            try:
+                perm_pks.add(registry.get(perm).pk)
+            except (Permission.DoesNotExist, ValueError):
+                raise CommandError(f'Unknown permission "{perm}" for role "{role_name}".')
+
+        return perm_pks
@@ -11,3 +11,25 @@ class RoleManager(models.Manager):
 
     def get_by_natural_key(self, name):
         return self.get(name=name)
+
+
+class PermissifyQuerySetMixin:
+    """
+    Add object permission filtering to a model's QuerySet.
+    """
+
+    def visible_to(self, user, perm="view", backend=None):
+        """
+        Return the objects on which `user` has permission "perm", e.g.
+        `Document.objects.visible_to(user, "change")`.
+        """
+        from permissify.shortcuts import get_objects_for_user
+
+        return get_objects_for_user(user, perm, self, backend=backend)
+
+
+class PermissifyQuerySet(PermissifyQuerySetMixin, models.QuerySet):
+    pass
+
+
+PermissifyManager = models.Manager.from_queryset(PermissifyQuerySet)
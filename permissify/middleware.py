@@ -0,0 +1,106 @@
+import logging
+from collections import Counter
+from contextvars import ContextVar
+
+from django.conf import settings
+
+from permissify.instrumentation import permission_checked
+
+
+logger = logging.getLogger("permissify")
+
+_current_stats = ContextVar("permissify_stats", default=None)
+
+
+class PermissionStats:
+    """
+    The permission checks of a request: their count, queries and duration,
+    and the checks that missed the caches by permission and model.
+    """
+
+    def __init__(self):
+        self.checks = 0
+        self.cache_hits = 0
+        self.queries = 0
+        self.elapsed = 0.0
+        self.misses = Counter()
+
+    def add(self, perm, obj_type, cache_hit, queries, elapsed):
+        self.checks += 1
+        self.cache_hits += cache_hit
+        self.queries += queries
+        self.elapsed += elapsed
+
+        if not cache_hit:
+            self.misses[(perm, obj_type._meta.label if obj_type is not None else None)] += 1
+
+
+def record_permission_check(sender, perm, obj_type, cache_hit, queries, elapsed, **kwargs):
+    stats = _current_stats.get()
+
+    if stats is not None:
+        stats.add(perm, obj_type, cache_hit, queries, elapsed)
+
+
+class PermissionInstrumentationMiddleware:
+    """
+    Aggregate the permission checks of each request into
+    `request.permissify_stats` and log them on the "permissify" logger.
+    A warning is logged when the same permission is checked on objects of a
+    model `PERMISSIFY_N_PLUS_ONE_THRESHOLD` times (10 by default) or more
+    without hitting the caches, which usually calls for
+    `prefetch_object_perms`. With DEBUG on, the totals are also sent in a
+    `Server-Timing` response header.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        permission_checked.connect(record_permission_check, dispatch_uid="permissify.middleware")
+
+    def __call__(self, request):
+        stats = request.permissify_stats = PermissionStats()
+        token = _current_stats.set(stats)
+
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_stats.reset(token)
+
+        self.report(request, stats)
+
+        if settings.DEBUG and stats.checks:
+            response.headers["Server-Timing"] = 'permissify;dur=%.3f;desc="%d checks, %d queries"' % (
+                stats.elapsed * 1000,
+                stats.checks,
+                stats.queries,
+            )
+
+        return response
+
+    def report(self, request, stats):
+        if not stats.checks:
+            return
+
+        logger.debug(
+            "%s %s: %d permission checks, %d cache hits, %d queries, %.3fms",
+            request.method,
+            request.path,
+            stats.checks,
+            stats.cache_hits,
+            stats.queries,
+            stats.elapsed * 1000,
+        )
+
+        threshold = getattr(settings, "PERMISSIFY_N_PLUS_ONE_THRESHOLD", 10)
+
+        for (perm, model_label), misses in stats.misses.items():
+            if model_label is not None and misses >= threshold:
+                logger.warning(
+                    "%s %s: %s checked on %d %s objects without hitting the caches, "
+                    "consider prefetch_object_perms.",
+                    request.method,
+                    request.path,
+                    perm,
+                    misses,
+                    model_label,
+                )
@@ -73,6 +73,7 @@ class Migration(migrations.Migration):
             ],
             options={
                 'unique_together': {('grantee_content_type', 'grantee_id', 'object_content_type', 'object_id', 'permission')},
+                'swappable': 'PERMISSIFY_OBJECT_PERMISSION_MODEL',
             },
         ),
     ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.14 on 2026-10-17 02:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('permissify', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='objectpermission',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='expires at'),
+        ),
+        migrations.AddIndex(
+            model_name='objectpermission',
+            index=models.Index(fields=['object_content_type', 'object_id', 'grantee_content_type', 'grantee_id', 'permission', 'expires_at'], name='permissify_objperm_object_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='objectpermission',
+            index=models.Index(fields=['grantee_content_type', 'grantee_id', 'permission', 'object_content_type', 'object_id', 'expires_at'], name='permissify_objperm_grantee_idx'),
+        ),
+    ]
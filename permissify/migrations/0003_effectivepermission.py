@@ -0,0 +1,40 @@
+# Generated by Django 5.0.14 on 2026-10-17 02:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('permissify', '0002_objectpermission_composite_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EffectivePermission',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.CharField(blank=True, default='', max_length=150)),
+                ('expires_at', models.DateTimeField(blank=True, null=True)),
+                ('object_content_type', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+                ('permission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='auth.permission')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['permission', 'object_content_type', 'object_id', 'expires_at'], name='permissify_effperm_perm_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='effectivepermission',
+            constraint=models.UniqueConstraint(fields=('user', 'permission', 'object_content_type', 'object_id'), name='permissify_effperm_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='effectivepermission',
+            constraint=models.UniqueConstraint(condition=models.Q(('object_content_type', None)), fields=('user', 'permission'), name='permissify_effperm_model_unique'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.14 on 2026-10-17 02:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('permissify', '0003_effectivepermission'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='role',
+            name='parents',
+            field=models.ManyToManyField(blank=True, help_text='The roles this role inherits from. The members of a role get all permissions granted to its parent roles, recursively.', related_name='children', to='permissify.role', verbose_name='parent roles'),
+        ),
+        migrations.CreateModel(
+            name='RoleClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField(default=0)),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='permissify.role')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='permissify.role')),
+            ],
+            options={
+                'verbose_name': 'role closure',
+                'verbose_name_plural': 'role closures',
+                'indexes': [models.Index(fields=['descendant', 'ancestor'], name='permissify_roleclos_desc_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='roleclosure',
+            constraint=models.UniqueConstraint(fields=('ancestor', 'descendant'), name='permissify_roleclosure_unique'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.14 on 2026-10-17 02:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('permissify', '0004_role_hierarchy'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='objectpermission',
+            index=models.Index(condition=models.Q(('expires_at__isnull', False)), fields=['expires_at'], name='permissify_objperm_expires_idx'),
+        ),
+    ]
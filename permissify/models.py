@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.auth import models as auth_models
@@ -15,6 +16,17 @@ class Role(models.Model):
         verbose_name=_("permissions"),
         blank=True,
     )
+    parents = models.ManyToManyField(
+        "self",
+        verbose_name=_("parent roles"),
+        blank=True,
+        symmetrical=False,
+        related_name="children",
+        help_text=_(
+            "The roles this role inherits from. The members of a role get all "
+            "permissions granted to its parent roles, recursively."
+        ),
+    )
 
     objects = managers.RoleManager()
 
@@ -29,6 +41,33 @@ class Role(models.Model):
         return (self.name,)
 
 
+class RoleClosure(models.Model):
+    """
+    The transitive closure of the role hierarchy: one row per role and each
+    of its ancestors, at their distance from it. It is maintained from
+    `Role.parents` by `permissify.hierarchy`, so resolving the permissions
+    inherited by a role is a single join whatever the depth of the
+    hierarchy. A role without parents has no rows.
+    """
+
+    ancestor = models.ForeignKey(Role, on_delete=models.CASCADE, related_name="descendant_links")
+    descendant = models.ForeignKey(Role, on_delete=models.CASCADE, related_name="ancestor_links")
+    depth = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = _("role closure")
+        verbose_name_plural = _("role closures")
+        constraints = [
+            models.UniqueConstraint(fields=["ancestor", "descendant"], name="permissify_roleclosure_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["descendant", "ancestor"], name="permissify_roleclos_desc_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.ancestor} > {self.descendant}"
+
+
 class RolePermissionsMixin(auth_models.PermissionsMixin):
     """
     Add the fields and methods necessary to support the Group and Permission
@@ -64,7 +103,14 @@ class User(RolePermissionsMixin, auth_models.AbstractUser):
         swappable = 'AUTH_USER_MODEL'
 
 
-class ObjectPermission(models.Model):
+class AbstractObjectPermission(models.Model):
+    """
+    The fields and methods of an object permission. The grantee and object
+    ids are strings, so any primary key type can be referenced; subclass
+    `AbstractBigIntegerObjectPermission` or `AbstractUUIDObjectPermission`
+    instead to store them in typed, more compact columns.
+    """
+
     grantee_content_type = models.ForeignKey(
         to=ContentType,
         limit_choices_to=models.Q(
@@ -112,10 +158,19 @@ class ObjectPermission(models.Model):
         on_delete=models.CASCADE
     )
 
+    # When the grant stops applying, if ever. Expired grants are ignored by
+    # the backends and deleted by the `purge_expired_permissions` command.
+    expires_at = models.DateTimeField(
+        _("expires at"),
+        null=True,
+        blank=True,
+    )
+
     # Is it to the entire object ('__all__') or to a specific property?
     # property = models.CharField(max_length=150, null=False, default="__all__")
 
     class Meta:
+        abstract = True
         unique_together = (
             (
                 "grantee_content_type",
@@ -125,6 +180,37 @@ class ObjectPermission(models.Model):
                 "permission",
             ),
         )
+        indexes = [
+            # Which permissions does a grantee hold on an object? The trailing
+            # expiry lets the unexpired rows be filtered on the index alone.
+            models.Index(
+                fields=[
+                    "object_content_type",
+                    "object_id",
+                    "grantee_content_type",
+                    "grantee_id",
+                    "permission",
+                    "expires_at",
+                ],
+            ),
+            # Which objects can a grantee access with a permission?
+            models.Index(
+                fields=[
+                    "grantee_content_type",
+                    "grantee_id",
+                    "permission",
+                    "object_content_type",
+                    "object_id",
+                    "expires_at",
+                ],
+            ),
+            # Which grants have expired? Only the few expiring rows are indexed.
+            models.Index(
+                fields=["expires_at"],
+                condition=models.Q(expires_at__isnull=False),
+                name="%(class)s_exp",
+            ),
+        ]
 
     def save(self, force_insert=False, force_update=False, using=None, update_fields=None):
         if self.object_content_type is None:
@@ -134,3 +220,206 @@ class ObjectPermission(models.Model):
 
     def __str__(self):
         return f"{self.permission}({self.object_id}) | {self.grantee}({self.grantee_id})"
+
+    @classmethod
+    def to_grantee_id(cls, pk):
+        """
+        Convert the primary key of a grantee to the type of `grantee_id`.
+        """
+        return cls._meta.get_field("grantee_id").to_python(pk)
+
+    @classmethod
+    def to_object_id(cls, pk):
+        """
+        Convert the primary key of an object to the type of `object_id`.
+        """
+        return cls._meta.get_field("object_id").to_python(pk)
+
+
+class AbstractBigIntegerObjectPermission(AbstractObjectPermission):
+    """
+    An object permission for grantees and objects with integer primary keys.
+    """
+
+    grantee_id = models.BigIntegerField()
+    object_id = models.BigIntegerField()
+
+    class Meta(AbstractObjectPermission.Meta):
+        abstract = True
+
+
+class AbstractUUIDObjectPermission(AbstractObjectPermission):
+    """
+    An object permission for grantees and objects with UUID primary keys.
+    """
+
+    grantee_id = models.UUIDField()
+    object_id = models.UUIDField()
+
+    class Meta(AbstractObjectPermission.Meta):
+        abstract = True
+
+
+class ObjectPermission(AbstractObjectPermission):
+    class Meta(AbstractObjectPermission.Meta):
+        swappable = 'PERMISSIFY_OBJECT_PERMISSION_MODEL'
+        indexes = [
+            # Which permissions does a grantee hold on an object? The trailing
+            # expiry lets the unexpired rows be filtered on the index alone.
+            models.Index(
+                fields=[
+                    "object_content_type",
+                    "object_id",
+                    "grantee_content_type",
+                    "grantee_id",
+                    "permission",
+                    "expires_at",
+                ],
+                name="permissify_objperm_object_idx",
+            ),
+            # Which objects can a grantee access with a permission?
+            models.Index(
+                fields=[
+                    "grantee_content_type",
+                    "grantee_id",
+                    "permission",
+                    "object_content_type",
+                    "object_id",
+                    "expires_at",
+                ],
+                name="permissify_objperm_grantee_idx",
+            ),
+            # Which grants have expired?
+            models.Index(
+                fields=["expires_at"],
+                condition=models.Q(expires_at__isnull=False),
+                name="permissify_objperm_expires_idx",
+            ),
+        ]
+
+
+class DirectObjectPermissionBase(models.Model):
+    """
+    An object permission stored with a real foreign key to the protected
+    object. Subclasses must declare the protected model as `content_object`:
+
+        class DocumentUserObjectPermission(UserObjectPermissionBase):
+            content_object = models.ForeignKey(Document, on_delete=models.CASCADE)
+
+    The backends and shortcuts pick these tables up automatically and use
+    them, instead of ObjectPermission, for the protected model.
+    """
+
+    permission = models.ForeignKey(
+        to=auth_models.Permission,
+        on_delete=models.CASCADE
+    )
+
+    expires_at = models.DateTimeField(
+        _("expires at"),
+        null=True,
+        blank=True,
+        db_index=True,
+    )
+
+    class Meta:
+        abstract = True
+
+
+class UserObjectPermissionBase(DirectObjectPermissionBase):
+    user = models.ForeignKey(
+        to=settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+
+    class Meta:
+        abstract = True
+        unique_together = (("content_object", "user", "permission"),)
+
+
+class GroupObjectPermissionBase(DirectObjectPermissionBase):
+    group = models.ForeignKey(
+        to=auth_models.Group,
+        on_delete=models.CASCADE
+    )
+
+    class Meta:
+        abstract = True
+        unique_together = (("content_object", "group", "permission"),)
+
+
+class RoleObjectPermissionBase(DirectObjectPermissionBase):
+    role = models.ForeignKey(
+        to=Role,
+        on_delete=models.CASCADE
+    )
+
+    class Meta:
+        abstract = True
+        unique_together = (("content_object", "role", "permission"),)
+
+
+class EffectivePermission(models.Model):
+    """
+    A permission held by a user, granted to them directly or through a group
+    or a role, either model-wide (without object) or on a single object.
+
+    The table materializes all the other permission tables. It's kept up to
+    date when `PERMISSIFY_EFFECTIVE_PERMISSIONS` is enabled, and read by
+    `EffectivePermissionModelBackend`.
+    """
+
+    user = models.ForeignKey(
+        to=settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+
+    permission = models.ForeignKey(
+        to=auth_models.Permission,
+        on_delete=models.CASCADE
+    )
+
+    # Both empty for a model-level permission.
+    object_content_type = models.ForeignKey(
+        to=ContentType,
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE
+    )
+
+    object_id = models.CharField(
+        max_length=150,
+        blank=True,
+        default=""
+    )
+
+    # The latest expiry of the grants giving the permission, if they all expire.
+    expires_at = models.DateTimeField(
+        null=True,
+        blank=True,
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "permission", "object_content_type", "object_id"],
+                name="permissify_effperm_unique",
+            ),
+            # NULLs are distinct in the constraint above: model-level rows
+            # need their own to be unique.
+            models.UniqueConstraint(
+                fields=["user", "permission"],
+                condition=models.Q(object_content_type=None),
+                name="permissify_effperm_model_unique",
+            ),
+        ]
+        indexes = [
+            # Which users hold a permission (on an object)?
+            models.Index(
+                fields=["permission", "object_content_type", "object_id", "expires_at"],
+                name="permissify_effperm_perm_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.permission}({self.object_id or '*'}) | {self.user}"
@@ -0,0 +1,200 @@
+"""
+Cleanup of the grants left behind by deleted objects and grantees.
+ObjectPermission refers to both through generic foreign keys, and the
+EffectivePermission rows on an object through a generic one, which the
+database doesn't cascade. The direct foreign key tables cascade natively.
+"""
+import threading
+import weakref
+from itertools import islice
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import connections, transaction
+from django.db.models import CharField, Exists, OuterRef, QuerySet, TextField
+from django.db.models.functions import Cast
+from django.db.models.signals import post_delete
+
+from permissify import batches
+from permissify.grants import get_direct_models, get_grantee_models, iter_direct_models
+from permissify.models import EffectivePermission, RoleClosure
+from permissify.utils import get_object_permission_model
+
+
+ObjectPermission = get_object_permission_model()
+
+_local = threading.local()
+
+
+def is_enabled() -> bool:
+    return bool(getattr(settings, "PERMISSIFY_DELETE_ORPHAN_PERMISSIONS", False))
+
+
+def _is_grant_model(model) -> bool:
+    return issubclass(model, (ObjectPermission, EffectivePermission, RoleClosure, *get_direct_models()))
+
+
+def _get_tracked_models() -> list:
+    """
+    Return the models whose deleted instances have their grants deleted:
+    the ones listed by label in `PERMISSIFY_DELETE_ORPHAN_PERMISSIONS`, or
+    the models that can hold grants, i.e. the grantees, the models with
+    direct foreign key tables, and the models declaring `permissify_parent`
+    along with their parents. The other models can still be fast-deleted
+    on cascades.
+    """
+    setting = getattr(settings, "PERMISSIFY_DELETE_ORPHAN_PERMISSIONS", False)
+
+    if isinstance(setting, (list, tuple)):
+        models = {apps.get_model(label) for label in setting}
+    else:
+        models = {*get_grantee_models().values(), *(model for model, from_name, direct_model in iter_direct_models())}
+
+        for model in apps.get_models():
+            if getattr(model, "permissify_parent", None) is not None:
+                models |= {model, model._meta.get_field(model.permissify_parent).related_model}
+
+    # The many-to-many and grant tables are left out, so that they can
+    # still be fast-deleted on cascades.
+    return [model for model in models if not model._meta.auto_created and not _is_grant_model(model)]
+
+
+def connect():
+    """
+    Delete the grants of every object or grantee of the tracked models
+    deleted from now on.
+    """
+    for model in _get_tracked_models():
+        post_delete.connect(_collect_deleted, sender=model, dispatch_uid="permissify_orphans")
+
+
+def disconnect():
+    for model in apps.get_models():
+        post_delete.disconnect(sender=model, dispatch_uid="permissify_orphans")
+
+
+class _PendingDeletions:
+    """
+    The primary keys of the instances deleted in a savepoint, by model,
+    whose grants are deleted once the transaction commits. Only the
+    `on_commit` callback holds on to them: Django drops it, and the pending
+    deletions with it, when the savepoint or the transaction is rolled back.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.pks_by_model = {}
+
+    def flush(self):
+        if _local.pending.get(self.key) is self:
+            del _local.pending[self.key]
+
+        for model, pks in self.pks_by_model.items():
+            delete_grants(model, pks, self.key[0])
+
+
+def _collect_deleted(sender, instance, using, **kwargs):
+    connection = connections[using]
+    model = sender._meta.concrete_model
+
+    # Outside a transaction, the grants are deleted right away.
+    if not connection.in_atomic_block:
+        delete_grants(model, [instance.pk], using)
+        return
+
+    # A queryset delete sends a signal per instance: batch them per savepoint
+    # until the transaction commits, so that rolling back a savepoint only
+    # discards the instances deleted in it.
+    key = (using, tuple(connection.savepoint_ids))
+    pending_by_savepoint = _local.__dict__.setdefault("pending", weakref.WeakValueDictionary())
+    pending = pending_by_savepoint.get(key)
+
+    if pending is None:
+        pending = pending_by_savepoint[key] = _PendingDeletions(key)
+        transaction.on_commit(pending.flush, using=using)
+
+    pending.pks_by_model.setdefault(model, set()).add(instance.pk)
+
+
+def delete_grants(model, pks, using, batch_size: int = 1000) -> int:
+    """
+    Delete the grants on the instances of `model` with primary keys `pks`,
+    and the grants to them if `model` is a grantee, `batch_size` keys at a
+    time. Return the number of rows deleted.
+    """
+    ctype = ContentType.objects.db_manager(using).get_for_model(model)
+    is_grantee = any(issubclass(model, grantee_model) for grantee_model in get_grantee_models().values())
+    deleted = 0
+    pks = iter(pks)
+
+    while batch := list(islice(pks, batch_size)):
+        object_ids = [ObjectPermission.to_object_id(pk) for pk in batch]
+        querysets = [
+            ObjectPermission._base_manager.using(using).filter(object_content_type=ctype, object_id__in=object_ids),
+            EffectivePermission._base_manager.using(using).filter(
+                object_content_type=ctype, object_id__in=[str(pk) for pk in batch]
+            ),
+        ]
+
+        if is_grantee:
+            querysets.append(
+                ObjectPermission._base_manager.using(using).filter(
+                    grantee_content_type=ctype, grantee_id__in=[ObjectPermission.to_grantee_id(pk) for pk in batch]
+                )
+            )
+
+        for queryset in querysets:
+            deleted += batches.delete_in_batches(queryset, batch_size)
+
+    return deleted
+
+
+def get_orphans(using) -> list[tuple[str, QuerySet]]:
+    """
+    Return a description and a queryset of the orphan grants for each
+    content type referenced by ObjectPermission or EffectivePermission: the
+    ones whose object, or grantee, doesn't exist anymore. Each queryset is
+    an anti-join against the table of its model, on its primary key.
+    """
+    orphans = []
+
+    for grant_model, kind in (
+        (ObjectPermission, "object"),
+        (ObjectPermission, "grantee"),
+        (EffectivePermission, "object"),
+    ):
+        grants = grant_model._base_manager.using(using)
+        ctype_pk_field, id_field = f"{kind}_content_type_id", f"{kind}_id"
+        ctype_pks = (
+            grants.exclude(**{ctype_pk_field: None}).order_by().values_list(ctype_pk_field, flat=True).distinct()
+        )
+
+        for ctype_pk in ctype_pks:
+            ctype = ContentType.objects.db_manager(using).get_for_id(ctype_pk)
+            model = ctype.model_class()
+            queryset = grants.filter(**{ctype_pk_field: ctype_pk})
+
+            # Every grant on a model that was removed is an orphan.
+            if model is not None:
+                queryset = queryset.exclude(
+                    Exists(model._base_manager.using(using).filter(pk=_cast_to_pk(grant_model, id_field, model)))
+                )
+
+            label = f"{grant_model._meta.verbose_name_plural} ({kind} {ctype.app_label}.{ctype.model})"
+            orphans.append((label, queryset))
+
+    return orphans
+
+
+def _cast_to_pk(grant_model, id_field, model):
+    """
+    Return a reference to the `id_field` of the outer `grant_model` query,
+    compared against the primary key of `model`: string columns are cast to
+    the type of the primary key, which keeps the lookup on its index.
+    """
+    if isinstance(grant_model._meta.get_field(id_field), (CharField, TextField)):
+        return Cast(OuterRef(id_field), model._meta.pk)
+
+    return OuterRef(id_field)
+
@@ -0,0 +1,159 @@
+from threading import Lock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import Permission
+from django.db import DEFAULT_DB_ALIAS
+
+
+class PermissionRegistry:
+    """
+    An in-process index of the permissions of a database, resolving
+    "app_label.codename" names, natural keys and primary keys without
+    querying the database.
+
+    The index is built from a single scan of the Permission table on first
+    use, and rebuilt lazily after it's cleared (on `post_migrate` and when a
+    permission or a content type is saved or deleted). Unknown permissions
+    are remembered too, so that checking one doesn't query the database
+    every time.
+    """
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.using = using
+        self._lock = Lock()
+        self._index = None
+
+    def _load(self):
+        index = self._index
+
+        if index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = self._build()
+                index = self._index
+
+        return index
+
+    def _build(self):
+        index = {"names": {}, "natural_keys": {}, "pks": {}, "missing": set()}
+
+        for perm in Permission.objects.using(self.using).select_related("content_type"):
+            self._add(index, perm)
+
+        return index
+
+    def _add(self, index, perm):
+        ctype = perm.content_type
+        index["names"]["%s.%s" % (ctype.app_label, perm.codename)] = perm
+        index["natural_keys"][(perm.codename, ctype.app_label, ctype.model)] = perm
+        index["pks"][perm.pk] = perm
+
+    def _fetch(self, key, **lookup) -> Permission:
+        index = self._load()
+
+        if key in index["missing"]:
+            raise Permission.DoesNotExist("Permission matching query does not exist.")
+
+        try:
+            perm = Permission.objects.using(self.using).select_related("content_type").get(**lookup)
+        except Permission.DoesNotExist:
+            index["missing"].add(key)
+            raise
+
+        self._add(index, perm)
+        return perm
+
+    def warm(self):
+        self._load()
+
+    async def awarm(self):
+        if self._index is None:
+            await sync_to_async(self._load)()
+
+    def clear(self):
+        with self._lock:
+            self._index = None
+
+    def get(self, name: str) -> Permission:
+        """
+        Return the permission named "app_label.codename".
+        """
+        try:
+            return self._load()["names"][name]
+        except KeyError:
+            pass
+
+        try:
+            app_label, codename = name.split(".")
+        except ValueError:
+            raise ValueError(
+                "Permission name should be in the form "
+                "app_label.permission_codename."
+            )
+
+        return self._fetch(("names", name), content_type__app_label=app_label, codename=codename)
+
+    async def aget(self, name: str) -> Permission:
+        """
+        Async version of `get`, only leaving the event loop to build the index
+        or to look up a permission missing from it.
+        """
+        await self.awarm()
+
+        index = self._index
+        if index is not None and name in index["names"]:
+            return index["names"][name]
+
+        if index is not None and ("names", name) in index["missing"]:
+            raise Permission.DoesNotExist("Permission matching query does not exist.")
+
+        return await sync_to_async(self.get)(name)
+
+    def get_by_natural_key(self, codename: str, app_label: str, model: str) -> Permission:
+        try:
+            return self._load()["natural_keys"][(codename, app_label, model)]
+        except KeyError:
+            return self._fetch(
+                ("natural_keys", (codename, app_label, model)),
+                codename=codename,
+                content_type__app_label=app_label,
+                content_type__model=model,
+            )
+
+    def get_by_pk(self, pk: int) -> Permission:
+        try:
+            return self._load()["pks"][pk]
+        except KeyError:
+            return self._fetch(("pks", pk), pk=pk)
+
+    def get_name(self, pk: int) -> str:
+        """
+        Return the "app_label.codename" name of the permission with `pk`.
+        """
+        perm = self.get_by_pk(pk)
+        return "%s.%s" % (perm.content_type.app_label, perm.codename)
+
+    def filter(self, app_label: str | None = None, model: str | None = None) -> list[Permission]:
+        """
+        Return the permissions of an app, or of a model when `model` is given.
+        """
+        return [
+            perm for (codename, perm_app_label, perm_model), perm in self._load()["natural_keys"].items()
+            if (app_label is None or perm_app_label == app_label) and (model is None or perm_model == model)
+        ]
+
+
+_registries = {}
+
+
+def get_registry(using: str = DEFAULT_DB_ALIAS) -> PermissionRegistry:
+    try:
+        return _registries[using]
+    except KeyError:
+        return _registries.setdefault(using, PermissionRegistry(using))
+
+
+def clear(using: str | None = None):
+    for alias, registry in _registries.items():
+        if using is None or alias == using:
+            registry.clear()
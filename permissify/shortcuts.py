@@ -1,15 +1,33 @@
 import re
-from typing import Any, Callable
+from datetime import datetime
+from functools import partial
+from itertools import islice
+from typing import Any, Callable, Iterable
 
+from asgiref.sync import sync_to_async
+from django.contrib import auth
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group, Permission
 from django.contrib.contenttypes.models import ContentType
-from django.db.models import Model
-
-from permissify.models import ObjectPermission, Role
+from django.db import transaction
+from django.db.models import Model, Q, QuerySet
+
+from permissify import cache, effective
+from permissify.grants import (
+    filter_grants,
+    get_direct_model,
+    get_from_name,
+    get_generic_grants_q,
+    get_key_fields,
+    make_grant,
+)
+from permissify.models import Role
+from permissify.registry import get_registry
+from permissify.utils import get_object_permission_model, raw_delete
 
 
 User = get_user_model()
+ObjectPermission = get_object_permission_model()
 
 _Permission = str | tuple[str, str, str] | Permission
 _Permissions = list[_Permission]
@@ -18,8 +36,7 @@ _Permissions = list[_Permission]
 def _get_perm(perm: _Permission, obj: Any = None) -> Permission:
     if isinstance(perm, str):
         if '.' in perm:
-            app_label, codename = perm.split('.')
-            action, model = codename.split('_')
+            return get_registry().get(perm)
         elif obj is not None:
             ctype = ContentType.objects.get_for_model(obj)
             app_label, model = ctype.app_label, ctype.model
@@ -35,23 +52,44 @@ def _get_perm(perm: _Permission, obj: Any = None) -> Permission:
         perm = (codename, app_label, model)
 
     if isinstance(perm, tuple):
-        perm = Permission.objects.get_by_natural_key(*perm)
+        perm = get_registry().get_by_natural_key(*perm)
 
     return perm
 
 
-def _grant_object_permission(grantee: User | Role | Group, perm: Permission, obj: Model):
-    obj_perm, created = ObjectPermission.objects.get_or_create(
-        grantee_id=grantee.pk,
-        grantee_content_type=ContentType.objects.get_for_model(grantee),
-        permission_id=perm.pk,
-        object_id=obj.pk,
-        object_content_type=ContentType.objects.get_for_model(obj)
-    )
+def _grant_object_permission(
+    grantee: User | Role | Group,
+    perm: Permission,
+    obj: Model,
+    expires_at: datetime | None = None,
+):
+    from_name = get_from_name(type(grantee))
+    direct_model = get_direct_model(type(obj), from_name)
+
+    # Granting again an existing permission sets its expiry anew, and only
+    # writes it when it changed.
+    if direct_model is not None:
+        grant, created = direct_model.objects.get_or_create(
+            **{from_name: grantee, 'content_object': obj, 'permission': perm},
+            defaults={'expires_at': expires_at},
+        )
+    else:
+        grant, created = ObjectPermission.objects.get_or_create(
+            grantee_id=ObjectPermission.to_grantee_id(grantee.pk),
+            grantee_content_type=ContentType.objects.get_for_model(grantee),
+            permission_id=perm.pk,
+            object_id=ObjectPermission.to_object_id(obj.pk),
+            object_content_type=ContentType.objects.get_for_model(obj),
+            defaults={'expires_at': expires_at},
+        )
+
+    if not created and grant.expires_at != expires_at:
+        grant.expires_at = expires_at
+        grant.save(update_fields=['expires_at'])
 
 
 def _revoke_object_permission(grantee: User | Role | Group, perm: Permission, obj: Model):
-    obj_perm = ObjectPermission.objects.filter(grantee_id=grantee.id, permission=perm, object_id=obj.id)
+    obj_perm = filter_grants(type(obj), get_from_name(type(grantee)), grantee, obj.pk).filter(permission=perm)
     obj_perm.delete()
 
 
@@ -61,8 +99,10 @@ def _perform_grant_or_revoke_perms(
     fn_grant_or_remove_perm: Callable[[User | Role | Group, str | tuple[str, str, str] | Permission, Model], None],
     obj: Model | None = None
 ):
-    for perm in perms:
-        fn_grant_or_remove_perm(grantee, perm, obj)
+    # The effective permissions of the grantee are refreshed once for all.
+    with transaction.atomic():
+        for perm in perms:
+            fn_grant_or_remove_perm(grantee, perm, obj)
 
 
 def _perform_grant_or_revoke_all_perms(
@@ -71,7 +111,7 @@ def _perform_grant_or_revoke_all_perms(
     obj: Model | None = None
 ):
     ctype = ContentType.objects.get_for_model(obj)
-    perms = Permission.objects.filter(content_type=ctype).all()
+    perms = get_registry().filter(app_label=ctype.app_label, model=ctype.model)
 
     _perform_grant_or_revoke_perms(grantee, perms, fn, obj)
 
@@ -91,7 +131,7 @@ def _grant_or_revoke_perms(
         # Check for grant/revoke all permissions for an app
         if match := re.match(r"^(?P<app_label>\w+)\.(?:\*|__all__)$", perm):
             app_label = match.group('app_label')
-            perm = Permission.objects.filter(content_type__app_label=app_label).all()
+            perm = get_registry().filter(app_label=app_label)
             _perform_grant_or_revoke_perms(grantee, perm, fn_grant_or_revoke, obj)
 
             return True
@@ -99,8 +139,7 @@ def _grant_or_revoke_perms(
         # Check for grant/revoke all permissions of a model (including future ones)
         elif match := re.match(r"^(?P<app_label>\w+)\.\*_(?P<model_name>\w+)$", perm):
             app_label, model_name = match.groups()
-            ctype = ContentType.objects.get_by_natural_key(app_label, model_name)
-            perm = Permission.objects.filter(content_type=ctype).all()
+            perm = get_registry().filter(app_label=app_label, model=model_name)
             _perform_grant_or_revoke_perms(grantee, perm, fn_grant_or_revoke, obj)
             return True
 
@@ -117,15 +156,19 @@ def _grant_or_revoke_perms(
 def grant_perm(
     grantee: User | Role | Group,
     perm: _Permission | _Permissions,
-    obj: Model | None = None
+    obj: Model | None = None,
+    expires_at: datetime | None = None,
 ):
-    if _grant_or_revoke_perms(grantee, perm, grant_perm, obj):
+    if expires_at is not None and obj is None:
+        raise ValueError('Only object permissions can expire.')
+
+    if _grant_or_revoke_perms(grantee, perm, partial(grant_perm, expires_at=expires_at), obj):
         return
 
     perm = _get_perm(perm, obj)
 
     if obj is not None:
-        return _grant_object_permission(grantee, perm, obj)
+        return _grant_object_permission(grantee, perm, obj, expires_at)
 
     permissions_relationship_name = 'user_permissions' if isinstance(grantee, User) else 'permissions'
     permissions_relationship = getattr(grantee, permissions_relationship_name)
@@ -152,3 +195,392 @@ def revoke_perm(
 
     # if permissions_relationship.filter(pk=perm.pk).exists():
     permissions_relationship.remove(perm)
+
+
+async def agrant_perm(
+    grantee: User | Role | Group,
+    perm: _Permission | _Permissions,
+    obj: Model | None = None,
+    expires_at: datetime | None = None,
+):
+    """
+    Async version of `grant_perm`. Django runs the writes of the async ORM in
+    a thread anyway, so the whole grant runs in a single one, sending the
+    same signals (and invalidating the same caches) as `grant_perm`.
+    """
+    return await sync_to_async(grant_perm)(grantee, perm, obj, expires_at)
+
+
+async def arevoke_perm(
+    grantee: User | Role | Group,
+    perm: _Permission | _Permissions,
+    obj: Model | None = None
+):
+    """
+    Async version of `revoke_perm`, see `agrant_perm`.
+    """
+    return await sync_to_async(revoke_perm)(grantee, perm, obj)
+
+
+def get_objects_for_user(
+    user: User,
+    perm: _Permission,
+    queryset: QuerySet,
+    backend: str | None = None,
+) -> QuerySet:
+    """
+    Return the objects of `queryset` on which `user` has permission "perm",
+    filtered in the database by the authentication backend.
+    """
+    backend = _load_backend(backend)
+
+    if hasattr(backend, "get_objects_for_user"):
+        return backend.get_objects_for_user(user, perm, queryset)
+
+    return queryset.none()
+
+
+def users_with_perm_for_objects(
+    perm: _Permission,
+    queryset: QuerySet,
+    backend: str | None = None,
+    **kwargs,
+) -> dict[Any, set]:
+    """
+    Return a mapping of the primary key of each object of `queryset` to the
+    primary keys of the users that have permission "perm" on it, computed by
+    the authentication backend in a few queries per batch of objects rather
+    than one `with_perm` query per object.
+    """
+    backend = _load_backend(backend)
+
+    if hasattr(backend, "users_with_perm_for_objects"):
+        return backend.users_with_perm_for_objects(perm, queryset, **kwargs)
+
+    return {pk: set() for pk in queryset.values_list("pk", flat=True)}
+
+
+def _load_backend(backend: str | None):
+    if backend is None:
+        backends = auth._get_backends(return_tuples=True)
+        if len(backends) == 1:
+            return backends[0][0]
+
+        raise ValueError(
+            "You have multiple authentication backends configured and "
+            "therefore must provide the `backend` argument."
+        )
+
+    if not isinstance(backend, str):
+        raise TypeError(
+            "backend must be a dotted import path string (got %r)." % backend
+        )
+
+    return auth.load_backend(backend)
+
+
+def prefetch_object_perms(user: User, objs: list[Model]):
+    """
+    Load the object permissions of `user` on all of `objs` at once, so that
+    checking `user.has_perm(perm, obj)` for each of them needs no further query.
+    """
+    for backend in auth.get_backends():
+        if hasattr(backend, "prefetch_object_permissions"):
+            backend.prefetch_object_permissions(user, objs)
+
+
+def _resolve_perms(perm: _Permission | _Permissions, model: type[Model] | None = None) -> list[Permission]:
+    """
+    Resolve "perm", in any of the forms accepted by `grant_perm`, to a list
+    of permissions from the permission registry.
+    """
+    if isinstance(perm, Permission):
+        return [perm]
+
+    if isinstance(perm, tuple):
+        return [get_registry().get_by_natural_key(*perm)]
+
+    if isinstance(perm, str):
+        if perm in ('__all__', '*') and model is not None:
+            ctype = ContentType.objects.get_for_model(model)
+            return get_registry().filter(app_label=ctype.app_label, model=ctype.model)
+
+        if match := re.match(r"^(?P<app_label>\w+)\.(?:\*|__all__)$", perm):
+            return get_registry().filter(app_label=match.group('app_label'))
+
+        if match := re.match(r"^(?P<app_label>\w+)\.\*_(?P<model_name>\w+)$", perm):
+            app_label, model_name = match.groups()
+            return get_registry().filter(app_label=app_label, model=model_name)
+
+        perm = list(map(str.strip, perm.split(',')))
+
+    perms = []
+    for item in perm:
+        if isinstance(item, str) and re.match(r"^\w+\.\w+$", item):
+            perms.append(get_registry().get(item))
+        elif isinstance(item, str) and re.match(r"^\w+$", item) and model is not None:
+            ctype = ContentType.objects.get_for_model(model)
+            codename = f'{item}_{ctype.model}' if item in ['add', 'change', 'delete', 'view'] else item
+            perms.append(get_registry().get_by_natural_key(codename, ctype.app_label, ctype.model))
+        elif isinstance(item, str) and len(perm) == 1:
+            raise PermissionError(f'Invalid permission type: {item}')
+        else:
+            perms.extend(_resolve_perms(item, model))
+
+    return perms
+
+
+def _chunks(iterable: Iterable, size: int):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _group_by_model(objs: Iterable[Model] | QuerySet) -> dict[type[Model], list[Model] | QuerySet]:
+    if isinstance(objs, QuerySet):
+        return {objs.model: objs}
+
+    groups = {}
+    for obj in objs:
+        groups.setdefault(type(obj), []).append(obj)
+
+    return groups
+
+
+def _group_by_kind(grantees: list[User | Role | Group]) -> dict[str, list[User | Role | Group]]:
+    groups = {}
+    for grantee in grantees:
+        groups.setdefault(get_from_name(type(grantee)), []).append(grantee)
+
+    return groups
+
+
+def _create_missing_grants(queryset: QuerySet, grants: list[Model], expires_at: datetime | None = None) -> int:
+    """
+    Insert the `grants` not found in `queryset` with a single `bulk_create`,
+    and set the expiry of the ones found to `expires_at`.
+    """
+    key_fields = get_key_fields(queryset.model)
+    existing = set()
+    outdated = []
+
+    for pk, *key, grant_expires_at in queryset.values_list('pk', *key_fields, 'expires_at'):
+        existing.add(tuple(key))
+        if grant_expires_at != expires_at:
+            outdated.append(pk)
+
+    if outdated:
+        queryset.model._default_manager.filter(pk__in=outdated).update(expires_at=expires_at)
+
+    missing = {}
+    for grant in grants:
+        key = tuple(getattr(grant, field) for field in key_fields)
+        if key not in existing:
+            missing[key] = grant
+
+    queryset.model._default_manager.bulk_create([missing[key] for key in sorted(missing)], ignore_conflicts=True)
+    return len(missing)
+
+
+def _get_permissions_field(model: type[Model]):
+    return model._meta.get_field('user_permissions' if issubclass(model, User) else 'permissions')
+
+
+def _invalidate_grantees(grantees: list[User | Role | Group]):
+    for grantee in grantees:
+        cache.invalidate_grantee(ContentType.objects.get_for_model(grantee).pk, grantee.pk)
+
+
+def _refresh_effective(grantees: list[User | Role | Group], grants: list[tuple]):
+    """
+    Re-check the effective permissions given by `grants`, (permission pk,
+    object content type pk, object id) keys, to the users the grantees
+    apply to, after grants written without signals.
+    """
+    for model, model_grantees in _group_by_model(grantees).items():
+        effective.grants_changed(model, [grantee.pk for grantee in model_grantees], grants)
+
+
+def _bulk_grant_model_perms(grantees: list[User | Role | Group], perm: _Permission | _Permissions, batch_size: int) -> int:
+    perms = _resolve_perms(perm)
+    created = 0
+
+    for model, model_grantees in _group_by_model(grantees).items():
+        field = _get_permissions_field(model)
+        through = field.remote_field.through
+        source, target = field.m2m_field_name(), field.m2m_reverse_field_name()
+
+        wanted = {(grantee.pk, p.pk) for grantee in model_grantees for p in perms}
+        existing = set(
+            through._default_manager.filter(
+                **{f'{source}__in': model_grantees, f'{target}__in': perms}
+            ).values_list(source, target)
+        )
+        missing = wanted - existing
+
+        through._default_manager.bulk_create(
+            [through(**{f'{source}_id': grantee_pk, f'{target}_id': perm_pk}) for grantee_pk, perm_pk in sorted(missing)],
+            batch_size=batch_size,
+            ignore_conflicts=True,
+        )
+        created += len(missing)
+
+        effective.grants_changed(
+            model,
+            [grantee.pk for grantee in model_grantees],
+            [(p.pk, *effective.MODEL_LEVEL) for p in perms],
+        )
+
+    return created
+
+
+def _bulk_revoke_model_perms(grantees: list[User | Role | Group], perm: _Permission | _Permissions) -> int:
+    perms = _resolve_perms(perm)
+    deleted = 0
+
+    for model, model_grantees in _group_by_model(grantees).items():
+        field = _get_permissions_field(model)
+        source, target = field.m2m_field_name(), field.m2m_reverse_field_name()
+
+        deleted += field.remote_field.through._default_manager.filter(
+            **{f'{source}__in': model_grantees, f'{target}__in': perms}
+        ).delete()[0]
+
+        effective.grants_changed(
+            model,
+            [grantee.pk for grantee in model_grantees],
+            [(p.pk, *effective.MODEL_LEVEL) for p in perms],
+        )
+
+    return deleted
+
+
+def bulk_grant_perms(
+    grantees: Iterable[User | Role | Group],
+    perm: _Permission | _Permissions,
+    objs: Iterable[Model] | QuerySet | None = None,
+    batch_size: int = 1000,
+    expires_at: datetime | None = None,
+) -> int:
+    """
+    Grant "perm" to every grantee on every object of `objs` (or model-wide
+    when `objs` is None), until `expires_at` if given. The permissions are
+    resolved once, and the grants missing on each batch of `batch_size`
+    objects are inserted with `bulk_create`. Return the number of grants
+    created.
+    """
+    grantees = list(grantees)
+
+    if expires_at is not None and objs is None:
+        raise ValueError('Only object permissions can expire.')
+
+    if not grantees:
+        return 0
+
+    if objs is None:
+        created = _bulk_grant_model_perms(grantees, perm, batch_size)
+        _invalidate_grantees(grantees)
+        return created
+
+    grantees_by_kind = _group_by_kind(grantees)
+    created = 0
+
+    for model, model_objs in _group_by_model(objs).items():
+        perms = _resolve_perms(perm, model)
+
+        if isinstance(model_objs, QuerySet):
+            model_objs = model_objs.iterator(chunk_size=batch_size)
+
+        for chunk in _chunks(model_objs, batch_size):
+            object_pks = [obj.pk for obj in chunk]
+            generic_q, generic_grants = Q(), []
+
+            for from_name, kind_grantees in grantees_by_kind.items():
+                grants = [
+                    make_grant(model, from_name, grantee.pk, object_pk, p.pk, expires_at)
+                    for grantee in kind_grantees
+                    for object_pk in object_pks
+                    for p in perms
+                ]
+
+                if get_direct_model(model, from_name) is None:
+                    generic_q |= get_generic_grants_q(model, from_name, kind_grantees, object_pks)
+                    generic_grants += grants
+                else:
+                    created += _create_missing_grants(
+                        filter_grants(model, from_name, kind_grantees, object_pks).filter(permission__in=perms),
+                        grants,
+                        expires_at,
+                    )
+
+            # The grants stored in ObjectPermission are looked up and inserted
+            # together, whatever the kind of grantee.
+            if generic_grants:
+                created += _create_missing_grants(
+                    ObjectPermission.objects.filter(generic_q, permission__in=perms),
+                    generic_grants,
+                    expires_at,
+                )
+
+            if effective.is_enabled():
+                ctype_pk = ContentType.objects.get_for_model(model).pk
+                _refresh_effective(grantees, [(p.pk, ctype_pk, str(pk)) for pk in object_pks for p in perms])
+
+    _invalidate_grantees(grantees)
+    return created
+
+
+def bulk_revoke_perms(
+    grantees: Iterable[User | Role | Group],
+    perm: _Permission | _Permissions,
+    objs: Iterable[Model] | QuerySet | None = None,
+) -> int:
+    """
+    Revoke "perm" from every grantee on every object of `objs` (or model-wide
+    when `objs` is None) with a single DELETE statement per table. Return the
+    number of grants removed.
+    """
+    grantees = list(grantees)
+
+    if not grantees:
+        return 0
+
+    if objs is None:
+        deleted = _bulk_revoke_model_perms(grantees, perm)
+        _invalidate_grantees(grantees)
+        return deleted
+
+    grantees_by_kind = _group_by_kind(grantees)
+    generic_q = Q()
+    obj_perms_list = []
+    effective_grants = []
+
+    for model, model_objs in _group_by_model(objs).items():
+        perms = _resolve_perms(perm, model)
+        objects = model_objs if isinstance(model_objs, QuerySet) else [obj.pk for obj in model_objs]
+
+        # The revoked grants are read before they are deleted.
+        if effective.is_enabled():
+            ctype_pk = ContentType.objects.get_for_model(model).pk
+            object_pks = objects.values_list('pk', flat=True) if isinstance(objects, QuerySet) else objects
+            effective_grants += [(p.pk, ctype_pk, str(pk)) for pk in object_pks for p in perms]
+
+        for from_name, kind_grantees in grantees_by_kind.items():
+            if get_direct_model(model, from_name) is None:
+                generic_q |= get_generic_grants_q(model, from_name, kind_grantees, objects) & Q(permission__in=perms)
+            else:
+                obj_perms_list.append(
+                    filter_grants(model, from_name, kind_grantees, objects).filter(permission__in=perms)
+                )
+
+    if generic_q:
+        obj_perms_list.append(ObjectPermission.objects.filter(generic_q))
+
+    # A raw delete issues one DELETE per table without fetching the rows to
+    # send `post_delete` signals; the caches are invalidated per grantee instead.
+    deleted = sum(raw_delete(obj_perms) for obj_perms in obj_perms_list)
+
+    _invalidate_grantees(grantees)
+    if effective_grants:
+        _refresh_effective(grantees, effective_grants)
+    return deleted
@@ -0,0 +1,268 @@
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.contrib.contenttypes.models import ContentType
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_migrate, post_save, pre_delete
+from django.dispatch import receiver
+
+from permissify import cache, effective, grants, hierarchy, orphans, registry
+from permissify.models import Role
+from permissify.utils import get_object_permission_model, model_field_exists
+
+
+UserModel = get_user_model()
+ObjectPermission = get_object_permission_model()
+
+
+@receiver(post_save, sender=ObjectPermission)
+@receiver(post_delete, sender=ObjectPermission)
+def invalidate_object_permission(sender, instance, **kwargs):
+    cache.invalidate_grantee(instance.grantee_content_type_id, instance.grantee_id)
+
+    if effective.is_enabled():
+        grantee_model = ContentType.objects.get_for_id(instance.grantee_content_type_id).model_class()
+        if grantee_model is not None:
+            effective.grants_changed(
+                grantee_model,
+                [instance.grantee_id],
+                [(instance.permission_id, instance.object_content_type_id, str(instance.object_id))],
+            )
+
+
+def invalidate_direct_object_permission(sender, instance, **kwargs):
+    content_model = instance._meta.get_field("content_object").related_model
+
+    for from_name, model in grants.get_grantee_models().items():
+        if grants.get_direct_model(content_model, from_name) is sender:
+            grantee_pk = getattr(instance, f"{from_name}_id")
+            cache.invalidate_grantee(ContentType.objects.get_for_model(model).pk, grantee_pk)
+            effective.grants_changed(
+                model,
+                [grantee_pk],
+                [
+                    (
+                        instance.permission_id,
+                        ContentType.objects.get_for_model(content_model).pk,
+                        str(instance.content_object_id),
+                    )
+                ],
+            )
+
+
+for direct_model in grants.get_direct_models():
+    post_save.connect(invalidate_direct_object_permission, sender=direct_model)
+    post_delete.connect(invalidate_direct_object_permission, sender=direct_model)
+
+
+@receiver(post_save, sender=UserModel)
+def invalidate_user(sender, instance, update_fields=None, **kwargs):
+    # Logging in only updates `last_login`, which doesn't affect permissions.
+    if update_fields is not None and set(update_fields) == {"last_login"}:
+        return
+
+    if cache.is_enabled():
+        cache.invalidate_users([instance.pk])
+
+
+def remember_parent(sender, instance, **kwargs):
+    attname = sender._meta.get_field(sender.permissify_parent).attname
+
+    # A deferred parent isn't known, nor compared on save.
+    if attname in instance.__dict__:
+        instance._permissify_parent_pk = instance.__dict__[attname]
+
+
+def invalidate_moved_object(sender, instance, created, **kwargs):
+    attname = sender._meta.get_field(sender.permissify_parent).attname
+    parent_pk = instance.__dict__.get(attname)
+
+    # The permission sets cached on the object, and on its descendants, were
+    # computed from the grants on its former ancestors: whoever held them.
+    if not created and parent_pk != getattr(instance, "_permissify_parent_pk", parent_pk) and cache.is_enabled():
+        cache.invalidate_all()
+
+    instance._permissify_parent_pk = parent_pk
+
+
+for model in apps.get_models():
+    if getattr(model, "permissify_parent", None) is not None:
+        post_init.connect(remember_parent, sender=model)
+        post_save.connect(invalidate_moved_object, sender=model)
+
+
+@receiver(pre_delete, sender=Role)
+def collect_descendants(sender, instance, using, **kwargs):
+    instance._permissify_descendants = hierarchy.get_descendants([instance.pk], using) - {instance.pk}
+
+
+@receiver(post_delete, sender=Role)
+def rebuild_descendants_closure(sender, instance, using, **kwargs):
+    # The parent links of the role are deleted without signals: the
+    # ancestors its descendants inherited through it are stale.
+    descendants = getattr(instance, "_permissify_descendants", None)
+
+    if descendants:
+        hierarchy.rebuild_closure(descendants, using)
+
+
+def update_role_closure(sender, instance, action, reverse, pk_set, using, **kwargs):
+    if action == "pre_add":
+        if reverse:
+            for pk in pk_set:
+                hierarchy.check_parents(pk, {instance.pk}, using)
+        else:
+            hierarchy.check_parents(instance.pk, pk_set, using)
+        return
+
+    if action == "pre_clear" and reverse:
+        instance._permissify_children = list(instance.children.using(using).values_list("pk", flat=True))
+
+    if action not in ("pre_remove", "pre_clear", "post_add", "post_remove", "post_clear"):
+        return
+
+    if not reverse:
+        children = [instance.pk]
+    elif action == "post_clear":
+        children = instance.__dict__.pop("_permissify_children", [])
+    elif action == "pre_clear":
+        children = instance._permissify_children
+    else:
+        children = pk_set or []
+
+    if action.startswith("post_"):
+        hierarchy.rebuild_closure(hierarchy.get_descendants(children, using), using)
+
+    if not model_field_exists(UserModel, "roles"):
+        return
+
+    # The members of the roles below `children` keep the grants of the
+    # ancestors they still have: the ones read before removing parents are
+    # re-checked along with the ones read after adding them.
+    if effective.is_enabled():
+        effective.memberships_changed(cache.get_members(Role, children), Role, children)
+
+    if cache.is_enabled() and action.startswith("post_"):
+        cache.invalidate_users(cache.get_members(Role, children))
+
+
+m2m_changed.connect(update_role_closure, sender=Role.parents.through)
+
+
+@receiver(pre_delete, sender=Group)
+@receiver(pre_delete, sender=Role)
+def collect_members(sender, instance, **kwargs):
+    # The membership rows are deleted without signals: collect the members
+    # now and invalidate them once the group or role is gone.
+    if cache.is_enabled() or effective.is_enabled():
+        instance._permissify_members = cache.get_members(sender, [instance.pk])
+
+        # The grants of the group or role are read before they cascade.
+        effective.memberships_changed(instance._permissify_members, sender, [instance.pk])
+
+
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Role)
+def invalidate_members(sender, instance, **kwargs):
+    cache.invalidate_users(getattr(instance, "_permissify_members", []))
+
+
+@receiver(post_delete, sender=Permission)
+def invalidate_permission(sender, instance, **kwargs):
+    # Removing a permission cascades to many relations at once.
+    cache.invalidate_all()
+
+
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+@receiver(post_save, sender=ContentType)
+@receiver(post_delete, sender=ContentType)
+def clear_registry(sender, using, **kwargs):
+    registry.clear(using)
+
+
+@receiver(post_migrate)
+def clear_registry_after_migrate(sender, using, **kwargs):
+    registry.clear(using)
+
+
+def _connect_m2m_invalidation(field, get_users, refresh_effective):
+    """
+    Invalidate the users affected by changes to the many-to-many `field`,
+    and refresh their effective permissions. `get_users(pks)` returns the
+    users affected by a change on the instances of the model declaring
+    `field` (a user, a group or a role) with `pks`, and
+    `refresh_effective(source_pks, target_pks)` re-checks the effective
+    permissions affected by links between them and the related instances.
+    """
+    through = field.remote_field.through
+    source_field_name = field.m2m_field_name()
+    target_field_name = field.m2m_reverse_field_name()
+
+    def invalidate(sender, instance, action, reverse, pk_set, **kwargs):
+        if not (cache.is_enabled() or effective.is_enabled()):
+            return
+
+        if action == "pre_clear":
+            # `pk_set` is None when clearing, collect the related rows first.
+            instance._permissify_cleared_pks = list(
+                through._default_manager.filter(
+                    **{target_field_name if reverse else source_field_name: instance.pk}
+                ).values_list(source_field_name, target_field_name)
+            )
+            return
+
+        if not action.startswith("post_"):
+            return
+
+        if action == "post_clear":
+            links = instance.__dict__.pop("_permissify_cleared_pks", [])
+        elif reverse:
+            links = [(pk, instance.pk) for pk in pk_set or ()]
+        else:
+            links = [(instance.pk, pk) for pk in pk_set or ()]
+
+        source_pks = {source_pk for source_pk, target_pk in links}
+        target_pks = {target_pk for source_pk, target_pk in links}
+
+        if source_pks and cache.is_enabled():
+            cache.invalidate_users(get_users(source_pks))
+
+        if source_pks and effective.is_enabled():
+            refresh_effective(source_pks, target_pks)
+
+    m2m_changed.connect(invalidate, sender=through, weak=False)
+
+
+def _model_perms_changed(grantee_model):
+    return lambda grantee_pks, perm_pks: effective.grants_changed(
+        grantee_model, grantee_pks, [(perm_pk, *effective.MODEL_LEVEL) for perm_pk in perm_pks]
+    )
+
+
+_connect_m2m_invalidation(
+    Group._meta.get_field("permissions"), lambda pks: cache.get_members(Group, pks), _model_perms_changed(Group)
+)
+
+if model_field_exists(UserModel, "user_permissions"):
+    _connect_m2m_invalidation(UserModel._meta.get_field("user_permissions"), list, _model_perms_changed(UserModel))
+
+if model_field_exists(UserModel, "groups"):
+    _connect_m2m_invalidation(
+        UserModel._meta.get_field("groups"),
+        list,
+        lambda user_pks, group_pks: effective.memberships_changed(user_pks, Group, group_pks),
+    )
+
+if model_field_exists(UserModel, "roles"):
+    _connect_m2m_invalidation(
+        UserModel._meta.get_field("roles"),
+        list,
+        lambda user_pks, role_pks: effective.memberships_changed(user_pks, Role, role_pks),
+    )
+    _connect_m2m_invalidation(
+        Role._meta.get_field("permissions"), lambda pks: cache.get_members(Role, pks), _model_perms_changed(Role)
+    )
+
+
+if orphans.is_enabled():
+    orphans.connect()
@@ -0,0 +1,114 @@
+from collections.abc import Iterable, Set
+
+from django.conf import settings
+from django.contrib.auth.models import Permission
+from django.db import DEFAULT_DB_ALIAS
+
+from permissify.registry import get_registry
+
+
+def is_enabled() -> bool:
+    return getattr(settings, "PERMISSIFY_PERMISSION_SNAPSHOTS", False)
+
+
+def _restore(data: bytes, using: str) -> "PermissionSnapshot":
+    return PermissionSnapshot.from_bytes(data, using)
+
+
+class PermissionSnapshot(Set):
+    """
+    An immutable set of permissions stored as a bitset indexed by the primary
+    keys of the Permission table. A user with thousands of permissions holds
+    a single integer, which pickles to a few hundred bytes for the shared
+    cache.
+
+    "app_label.codename" names are resolved through the permission registry
+    for membership tests and iteration, so a snapshot can be used wherever a
+    set of permission names is expected.
+    """
+
+    __slots__ = ("_bits", "using")
+
+    def __init__(self, bits: int = 0, using: str = DEFAULT_DB_ALIAS):
+        self._bits = bits
+        self.using = using
+
+    @classmethod
+    def from_pks(cls, pks: Iterable[int], using: str = DEFAULT_DB_ALIAS) -> "PermissionSnapshot":
+        bits = 0
+        for pk in pks:
+            bits |= 1 << pk
+
+        return cls(bits, using)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, using: str = DEFAULT_DB_ALIAS) -> "PermissionSnapshot":
+        return cls(int.from_bytes(data, "little"), using)
+
+    def to_bytes(self) -> bytes:
+        return self._bits.to_bytes((self._bits.bit_length() + 7) // 8, "little")
+
+    def __reduce__(self):
+        return _restore, (self.to_bytes(), self.using)
+
+    def has_pk(self, pk: int | None) -> bool:
+        return pk is not None and (self._bits >> pk) & 1 == 1
+
+    def has(self, perm: str) -> bool:
+        """
+        Return whether the permission named "app_label.codename" is in the
+        snapshot.
+        """
+        try:
+            return self.has_pk(get_registry(self.using).get(perm).pk)
+        except (Permission.DoesNotExist, ValueError):
+            return False
+
+    async def ahas(self, perm: str) -> bool:
+        try:
+            return self.has_pk((await get_registry(self.using).aget(perm)).pk)
+        except (Permission.DoesNotExist, ValueError):
+            return False
+
+    def pks(self):
+        bits = self._bits
+
+        while bits:
+            lowest = bits & -bits
+            yield lowest.bit_length() - 1
+            bits ^= lowest
+
+    def __contains__(self, perm) -> bool:
+        return isinstance(perm, str) and self.has(perm)
+
+    def __iter__(self):
+        registry = get_registry(self.using)
+
+        for pk in self.pks():
+            yield registry.get_name(pk)
+
+    def __len__(self) -> int:
+        return self._bits.bit_count()
+
+    def __or__(self, other):
+        if isinstance(other, PermissionSnapshot) and other.using == self.using:
+            return PermissionSnapshot(self._bits | other._bits, self.using)
+
+        return super().__or__(other)
+
+    def __eq__(self, other):
+        if isinstance(other, PermissionSnapshot) and other.using == self.using:
+            return self._bits == other._bits
+
+        return super().__eq__(other)
+
+    __hash__ = None
+
+    @classmethod
+    def _from_iterable(cls, iterable):
+        # The results of set operations mixing snapshots and sets of names are
+        # plain sets of names.
+        return set(iterable)
+
+    def __repr__(self):
+        return "<PermissionSnapshot: %d permissions>" % len(self)
@@ -0,0 +1,239 @@
+"""
+Streaming export and import of object permission grants, from
+ObjectPermission and the direct foreign key tables, as JSON Lines or CSV
+records referring to permissions and content types by natural key.
+"""
+import csv
+import json
+from itertools import islice
+from typing import Iterable, Iterator, TextIO
+
+from django.contrib.auth.models import Permission
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ValidationError
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.dateparse import parse_datetime
+
+from permissify import cache, effective
+from permissify.grants import get_direct_model, get_from_name, get_grantee_models, iter_direct_models, make_grant
+from permissify.utils import get_object_permission_model
+
+
+ObjectPermission = get_object_permission_model()
+
+FIELDS = ("permission", "grantee_type", "grantee_id", "object_type", "object_id", "expires_at")
+FORMATS = ("jsonl", "csv")
+
+
+def _get_type(model) -> str:
+    return "%s.%s" % (model._meta.app_label, model._meta.model_name)
+
+
+def iter_records(using: str = DEFAULT_DB_ALIAS, chunk_size: int = 2000) -> Iterator[dict]:
+    """
+    Yield a record for every grant of the database `using`, reading each
+    table with a streaming cursor, `chunk_size` rows at a time.
+    """
+    rows = ObjectPermission._base_manager.using(using).order_by("pk").values_list(
+        "permission__content_type__app_label",
+        "permission__codename",
+        "grantee_content_type__app_label",
+        "grantee_content_type__model",
+        "grantee_id",
+        "object_content_type__app_label",
+        "object_content_type__model",
+        "object_id",
+        "expires_at",
+    )
+
+    for row in rows.iterator(chunk_size=chunk_size):
+        perm_app_label, codename, grantee_app_label, grantee_model, grantee_id, *row = row
+        object_app_label, object_model, object_id, expires_at = row
+
+        yield _make_record(
+            f"{perm_app_label}.{codename}",
+            f"{grantee_app_label}.{grantee_model}",
+            grantee_id,
+            f"{object_app_label}.{object_model}",
+            object_id,
+            expires_at,
+        )
+
+    grantee_models = get_grantee_models()
+
+    for model, from_name, direct_model in iter_direct_models():
+        rows = direct_model._base_manager.using(using).order_by("pk").values_list(
+            "permission__content_type__app_label",
+            "permission__codename",
+            f"{from_name}_id",
+            "content_object_id",
+            "expires_at",
+        )
+
+        for perm_app_label, codename, grantee_id, object_id, expires_at in rows.iterator(chunk_size=chunk_size):
+            yield _make_record(
+                f"{perm_app_label}.{codename}",
+                _get_type(grantee_models[from_name]),
+                grantee_id,
+                _get_type(model),
+                object_id,
+                expires_at,
+            )
+
+
+def _make_record(perm, grantee_type, grantee_id, object_type, object_id, expires_at) -> dict:
+    return {
+        "permission": perm,
+        "grantee_type": grantee_type,
+        "grantee_id": str(grantee_id),
+        "object_type": object_type,
+        "object_id": str(object_id),
+        "expires_at": expires_at.isoformat() if expires_at is not None else None,
+    }
+
+
+def write_records(records: Iterable[dict], stream: TextIO, format: str = "jsonl") -> Iterator[dict]:
+    """
+    Write `records` to `stream` in `format`, yielding each record once it is
+    written so that the caller can report progress.
+    """
+    if format == "csv":
+        writer = csv.DictWriter(stream, fieldnames=FIELDS)
+        writer.writeheader()
+
+        for record in records:
+            writer.writerow({**record, "expires_at": record["expires_at"] or ""})
+            yield record
+    else:
+        for record in records:
+            stream.write(json.dumps(record) + "\n")
+            yield record
+
+
+def read_records(stream: TextIO, format: str = "jsonl") -> Iterator[dict]:
+    """
+    Yield the records read from `stream`, one line at a time.
+    """
+    if format == "csv":
+        for record in csv.DictReader(stream):
+            yield {**record, "expires_at": record["expires_at"] or None}
+    else:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+
+class _Resolver:
+    """
+    Resolve the natural keys of the records to primary keys and models in
+    the database `using`, remembering each answer.
+    """
+
+    def __init__(self, using):
+        self.using = using
+        self.perm_pks = {}
+        self.content_types = {}
+
+    def get_perm_pk(self, name):
+        if name not in self.perm_pks:
+            app_label, codename = name.split(".", 1)
+            self.perm_pks[name] = (
+                Permission.objects.using(self.using)
+                .filter(content_type__app_label=app_label, codename=codename)
+                .values_list("pk", flat=True)
+                .first()
+            )
+
+        return self.perm_pks[name]
+
+    def get_content_type(self, natural_key):
+        if natural_key not in self.content_types:
+            try:
+                ctype = ContentType.objects.db_manager(self.using).get_by_natural_key(*natural_key.split(".", 1))
+            except (ContentType.DoesNotExist, TypeError):
+                ctype = None
+
+            self.content_types[natural_key] = ctype
+
+        return self.content_types[natural_key]
+
+
+def import_records(
+    records: Iterable[dict],
+    using: str = DEFAULT_DB_ALIAS,
+    batch_size: int = 2000,
+) -> Iterator[tuple[int, int]]:
+    """
+    Insert the grants of `records` into the database `using`, `batch_size`
+    records at a time with one `bulk_create(ignore_conflicts=True)` per table,
+    skipping the ones already there. Yield the number of records imported and
+    skipped (unknown permission, content type or grantee kind) per batch.
+    """
+    resolver = _Resolver(using)
+    records = iter(records)
+
+    while batch := list(islice(records, batch_size)):
+        grants_by_model = {}
+        grantees = {}
+        skipped = 0
+
+        for record in batch:
+            grant = _make_grant(resolver, record)
+
+            if grant is None:
+                skipped += 1
+                continue
+
+            grant, grantee_ctype, grantee_id, key = grant
+            grants_by_model.setdefault(type(grant), []).append(grant)
+            grantees.setdefault((grantee_ctype, grantee_id), set()).add(key)
+
+        for model, grants in grants_by_model.items():
+            model._base_manager.using(using).bulk_create(grants, ignore_conflicts=True)
+
+        # The backends and their caches read the default database.
+        if using == DEFAULT_DB_ALIAS:
+            for (grantee_ctype, grantee_id), keys in grantees.items():
+                cache.invalidate_grantee(grantee_ctype.pk, grantee_id)
+                effective.grants_changed(grantee_ctype.model_class(), [grantee_id], keys)
+
+        yield len(batch) - skipped, skipped
+
+
+def _make_grant(resolver, record):
+    perm_pk = resolver.get_perm_pk(record["permission"])
+    grantee_ctype = resolver.get_content_type(record["grantee_type"])
+    object_ctype = resolver.get_content_type(record["object_type"])
+
+    if perm_pk is None or grantee_ctype is None or object_ctype is None:
+        return None
+
+    grantee_model, model = grantee_ctype.model_class(), object_ctype.model_class()
+    if grantee_model is None or model is None:
+        return None
+
+    try:
+        from_name = get_from_name(grantee_model)
+    except TypeError:
+        return None
+
+    expires_at = parse_datetime(record["expires_at"]) if record.get("expires_at") else None
+
+    if get_direct_model(model, from_name) is not None:
+        grant = make_grant(model, from_name, record["grantee_id"], record["object_id"], perm_pk, expires_at)
+    else:
+        # The content types are those of `using`, which may not be the
+        # default database.
+        try:
+            grant = ObjectPermission(
+                grantee_content_type=grantee_ctype,
+                grantee_id=ObjectPermission.to_grantee_id(record["grantee_id"]),
+                object_content_type=object_ctype,
+                object_id=ObjectPermission.to_object_id(record["object_id"]),
+                permission_id=perm_pk,
+                expires_at=expires_at,
+            )
+        except ValidationError:
+            return None
+
+    return grant, grantee_ctype, record["grantee_id"], (perm_pk, object_ctype.pk, str(record["object_id"]))
@@ -1,5 +1,9 @@
-from django.core.exceptions import FieldDoesNotExist
-from django.db.models import Model
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.db.models import CharField, F, Field, Model, QuerySet, TextField
+from django.db.models.expressions import Combinable
+from django.db.models.functions import Cast
 
 
 def model_field_exists(cls: Model, field: str):
@@ -8,3 +12,54 @@ def model_field_exists(cls: Model, field: str):
         return True
     except FieldDoesNotExist:
         return False
+
+
+def get_object_permission_model():
+    """
+    Return the ObjectPermission model that is active in this project, as
+    set by the `PERMISSIFY_OBJECT_PERMISSION_MODEL` setting.
+    """
+    model = getattr(settings, "PERMISSIFY_OBJECT_PERMISSION_MODEL", "permissify.ObjectPermission")
+
+    try:
+        return django_apps.get_model(model, require_ready=False)
+    except ValueError:
+        raise ImproperlyConfigured(
+            "PERMISSIFY_OBJECT_PERMISSION_MODEL must be of the form 'app_label.model_name'"
+        )
+    except LookupError:
+        raise ImproperlyConfigured(
+            "PERMISSIFY_OBJECT_PERMISSION_MODEL refers to model '%s' that has not been installed" % model
+        )
+
+
+def cast_to_field(expression: Combinable, field: Field) -> Combinable:
+    """
+    Return `expression`, a primary key, ready to be compared against `field`
+    (the `grantee_id` or `object_id` of an object permission). String columns
+    need the primary key cast explicitly, typed columns compare natively.
+    """
+    if isinstance(field, (CharField, TextField)):
+        return Cast(expression, CharField())
+
+    return expression
+
+
+def pks_for_field(queryset: QuerySet, field: Field) -> QuerySet:
+    """
+    Return a subquery of the primary keys of `queryset`, ready to be compared
+    against `field` (the `grantee_id` or `object_id` of an object permission).
+    """
+    return queryset.annotate(pk_for_field=cast_to_field(F("pk"), field)).values("pk_for_field")
+
+
+def raw_delete(queryset: QuerySet) -> int:
+    """
+    Delete the rows of `queryset` in a single DELETE statement, without
+    fetching them to collect cascades or send `pre_delete` and `post_delete`
+    signals. Return the number of rows deleted.
+
+    This relies on `QuerySet._raw_delete`, a private Django API: keep its
+    only call here.
+    """
+    return queryset._raw_delete(queryset.db)
@@ -0,0 +1,37 @@
+from django.db import models
+from django.contrib.contenttypes.models import ContentType
+
+from permissify.models import AbstractBigIntegerObjectPermission, GroupObjectPermissionBase, UserObjectPermissionBase
+
+
+class Project(models.Model):
+    name = models.CharField(max_length=150)
+
+
+class ProjectUserObjectPermission(UserObjectPermissionBase):
+    content_object = models.ForeignKey(Project, on_delete=models.CASCADE)
+
+
+class ProjectGroupObjectPermission(GroupObjectPermissionBase):
+    content_object = models.ForeignKey(Project, on_delete=models.CASCADE)
+
+
+class Task(models.Model):
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='tasks')
+    name = models.CharField(max_length=150)
+
+    permissify_parent = 'project'
+
+
+class Subtask(models.Model):
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='subtasks', null=True)
+    name = models.CharField(max_length=150)
+
+    permissify_parent = 'task'
+
+
+class BigIntegerObjectPermission(AbstractBigIntegerObjectPermission):
+    # Swapped in by the tests of the typed id columns only, without reverse
+    # accessors clashing with those of permissify.ObjectPermission.
+    grantee_content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, related_name='+')
+    object_content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, related_name='+', editable=False)
@@ -0,0 +1,98 @@
+from asgiref.sync import async_to_sync
+from django.test import TestCase, override_settings
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+
+from permissify.backends import ObjectPermissionModelBackend
+from permissify.models import Role
+from permissify.shortcuts import agrant_perm, arevoke_perm, grant_perm, revoke_perm
+from tests.models import Project
+
+
+User = get_user_model()
+
+
+class AsyncPermissionsTestCase(TestCase):
+    def setUp(self):
+        self.backend = ObjectPermissionModelBackend()
+        self.user = User.objects.create_user(username='test', password='test', email='test@test.test')
+        self.group = Group.objects.create(name='group')
+        self.role = Role.objects.create(name='role')
+        self.role1 = Role.objects.create(name='role1')
+        self.role2 = Role.objects.create(name='role2')
+
+        self.user.groups.add(self.group)
+        self.user.roles.add(self.role)
+
+    async def get_user(self):
+        return await User.objects.aget(pk=self.user.pk)
+
+    async def test_ahas_perm(self):
+        await agrant_perm(self.group, 'permissify.view_role')
+        await agrant_perm(self.role, 'permissify.change_role', self.role1)
+
+        user = await self.get_user()
+
+        self.assertTrue(await self.backend.ahas_perm(user, 'permissify.view_role'))
+        self.assertFalse(await self.backend.ahas_perm(user, 'permissify.change_role'))
+        self.assertTrue(await self.backend.ahas_perm(user, 'permissify.change_role', self.role1))
+        self.assertFalse(await self.backend.ahas_perm(user, 'permissify.change_role', self.role2))
+
+    async def test_aget_all_permissions(self):
+        await agrant_perm(self.user, 'permissify.add_role')
+        await agrant_perm(self.group, 'permissify.delete_role', self.role1)
+        await agrant_perm(self.role, 'permissify.change_role', self.role1)
+
+        user = await self.get_user()
+
+        perms = await self.backend.aget_all_permissions(user, self.role1)
+        self.assertEqual(
+            perms,
+            {'permissify.add_role', 'permissify.delete_role', 'permissify.change_role'},
+        )
+        self.assertEqual(await self.backend.aget_all_permissions(user), {'permissify.add_role'})
+
+    async def test_arevoke_perm(self):
+        await agrant_perm(self.user, 'permissify.change_role', self.role1)
+        await arevoke_perm(self.user, 'permissify.change_role', self.role1)
+
+        user = await self.get_user()
+        self.assertFalse(await self.backend.ahas_perm(user, 'permissify.change_role', self.role1))
+
+    async def test_aget_objects_for_user(self):
+        project = await Project.objects.acreate(name='project')
+        await Project.objects.acreate(name='other')
+        await agrant_perm(self.group, 'tests.view_project', project)
+        await agrant_perm(self.role, 'permissify.view_role', self.role2)
+
+        user = await self.get_user()
+
+        projects = await self.backend.aget_objects_for_user(user, 'view', Project.objects.all())
+        self.assertEqual([obj async for obj in projects], [project])
+
+        roles = await self.backend.aget_objects_for_user(user, 'permissify.view_role', Role.objects.all())
+        self.assertEqual([obj async for obj in roles], [self.role2])
+
+    async def test_awith_perm(self):
+        await agrant_perm(self.group, 'permissify.view_role')
+
+        users = await self.backend.awith_perm('permissify.view_role')
+        self.assertEqual([user async for user in users], [self.user])
+
+        users = await self.backend.awith_perm('permissify.missing_perm')
+        self.assertEqual([user async for user in users], [])
+
+    @override_settings(PERMISSIFY_CACHE='default')
+    def test_shares_the_cache_with_the_sync_path(self):
+        ahas_perm = async_to_sync(self.backend.ahas_perm)
+        grant_perm(self.user, 'permissify.change_role', self.role1)
+
+        # Computed by the async path, read by the sync one.
+        self.assertTrue(ahas_perm(User.objects.get(pk=self.user.pk), 'permissify.change_role', self.role1))
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(self.backend.has_perm(user, 'permissify.change_role', self.role1))
+
+        revoke_perm(self.user, 'permissify.change_role', self.role1)
+        self.assertFalse(ahas_perm(User.objects.get(pk=self.user.pk), 'permissify.change_role', self.role1))
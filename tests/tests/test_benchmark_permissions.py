@@ -0,0 +1,31 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TransactionTestCase
+
+from permissify.models import ObjectPermission
+
+
+User = get_user_model()
+
+
+class BenchmarkPermissionsTestCase(TransactionTestCase):
+    def test_reports_hot_paths_and_rolls_back(self):
+        out = StringIO()
+
+        call_command(
+            'benchmark_permissions',
+            users=5, groups=2, roles=2, objects=10, grants=50, iterations=5,
+            stdout=out,
+        )
+
+        output = out.getvalue()
+        self.assertIn('has_perm on an object, cold', output)
+        self.assertIn('grant_perm on an object', output)
+        self.assertIn('with_perm on an object', output)
+        self.assertIn('users_with_perm_for_objects', output)
+        self.assertIn('Users with a permission on an object', output)
+
+        self.assertFalse(User.objects.exists())
+        self.assertFalse(ObjectPermission.objects.exists())
@@ -0,0 +1,74 @@
+from django.test import TestCase
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+
+from permissify.models import ObjectPermission, Role
+from permissify.registry import get_registry
+from permissify.shortcuts import bulk_grant_perms, bulk_revoke_perms
+
+
+User = get_user_model()
+
+
+class BulkPermissionsTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='test', password='test', email='test@test.test')
+        self.member_of = Group.objects.create(name='member-of')
+        self.role = Role.objects.create(name='role')
+
+        self.user.groups.add(self.member_of)
+        self.user.roles.add(self.role)
+
+        self.groups = [Group.objects.create(name=f'group{i}') for i in range(20)]
+
+    def test_bulk_grant_and_revoke_obj_perms(self):
+        grantees = [self.user, self.member_of, self.role]
+
+        get_registry().warm()
+
+        with self.assertNumQueries(4):
+            created = bulk_grant_perms(grantees, 'auth.change_group, auth.view_group', self.groups, batch_size=10)
+
+        self.assertEqual(created, 3 * 2 * 20)
+        self.assertEqual(ObjectPermission.objects.count(), 3 * 2 * 20)
+
+        # granting again only creates what is missing
+        self.assertEqual(bulk_grant_perms(grantees, '*', self.groups), 3 * 2 * 20)
+
+        user = User.objects.get(pk=self.user.pk)
+        self.assertTrue(user.has_perm('auth.change_group', self.groups[0]))
+        self.assertTrue(user.has_perm('auth.delete_group', self.groups[-1]))
+        self.assertFalse(user.has_perm('auth.change_group'))
+
+        with self.assertNumQueries(1):
+            deleted = bulk_revoke_perms([self.user], ['change', 'delete'], Group.objects.filter(name__startswith='group'))
+
+        self.assertEqual(deleted, 2 * 20)
+
+        self.assertEqual(bulk_revoke_perms([self.member_of, self.role], '*', self.groups), 2 * 4 * 20)
+        self.assertEqual(ObjectPermission.objects.count(), 2 * 20)
+
+        user = User.objects.get(pk=self.user.pk)
+        self.assertTrue(user.has_perm('auth.view_group', self.groups[0]))
+        self.assertFalse(user.has_perm('auth.change_group', self.groups[0]))
+
+    def test_bulk_grant_and_revoke_model_perms(self):
+        self.assertEqual(bulk_grant_perms([self.user, self.member_of, self.role], 'auth.*_group'), 3 * 4)
+        self.assertEqual(bulk_grant_perms([self.user], 'auth.*_group'), 0)
+
+        user = User.objects.get(pk=self.user.pk)
+        self.assertEqual(user.get_user_permissions(), user.get_group_permissions())
+        self.assertTrue(user.has_perm('auth.view_group'))
+
+        self.assertEqual(bulk_revoke_perms([self.user, self.member_of, self.role], ['auth.view_group']), 3)
+
+        user = User.objects.get(pk=self.user.pk)
+        self.assertFalse(user.has_perm('auth.view_group'))
+        self.assertTrue(user.has_perm('auth.change_group'))
+
+    def test_bulk_grant_unknown_perm(self):
+        from django.contrib.auth.models import Permission
+
+        with self.assertRaises(Permission.DoesNotExist):
+            bulk_grant_perms([self.user], ['auth.view_group', 'auth.fly_group'], self.groups)
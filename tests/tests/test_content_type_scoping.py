@@ -0,0 +1,56 @@
+from asgiref.sync import async_to_sync
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+
+from permissify.backends import ObjectPermissionModelBackend
+from permissify.models import Role
+from permissify.shortcuts import grant_perm, prefetch_object_perms
+
+
+User = get_user_model()
+
+
+class ContentTypeScopingTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(pk=1000, username='test', password='test', email='test@test.test')
+        self.group = Group.objects.create(pk=1000, name='group')
+        self.role = Role.objects.create(pk=1000, name='role')
+
+    def test_same_pk_objects_of_different_models(self):
+        grant_perm(self.user, 'permissify.view_role', self.role)
+        user = User.objects.get(pk=self.user.pk)
+
+        self.assertTrue(user.has_perm('permissify.view_role', self.role))
+        self.assertFalse(user.has_perm('permissify.view_role', self.group))
+        self.assertEqual(user.get_user_permissions(self.group), set())
+
+    def test_same_pk_objects_of_different_models_async(self):
+        grant_perm(self.user, 'permissify.view_role', self.role)
+        user = User.objects.get(pk=self.user.pk)
+        ahas_perm = async_to_sync(ObjectPermissionModelBackend().ahas_perm)
+
+        self.assertTrue(ahas_perm(user, 'permissify.view_role', self.role))
+        self.assertFalse(ahas_perm(user, 'permissify.view_role', self.group))
+
+    def test_same_pk_objects_of_different_models_prefetched(self):
+        grant_perm(self.user, 'permissify.view_role', self.role)
+        user = User.objects.get(pk=self.user.pk)
+
+        prefetch_object_perms(user, [self.role, self.group])
+
+        with self.assertNumQueries(0):
+            self.assertTrue(user.has_perm('permissify.view_role', self.role))
+            self.assertFalse(user.has_perm('permissify.view_role', self.group))
+
+    def test_same_pk_grantees_of_different_models(self):
+        # The group shares the primary key of the user, who isn't a member.
+        grant_perm(self.group, 'permissify.change_role', self.role)
+        user = User.objects.get(pk=self.user.pk)
+
+        self.assertFalse(user.has_perm('permissify.change_role', self.role))
+
+        self.user.groups.add(self.group)
+        user = User.objects.get(pk=self.user.pk)
+
+        self.assertTrue(user.has_perm('permissify.change_role', self.role))
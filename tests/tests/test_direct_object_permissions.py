@@ -0,0 +1,131 @@
+from django.test import TestCase, override_settings
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+
+from permissify.models import ObjectPermission, Role
+from permissify.shortcuts import (
+    bulk_grant_perms,
+    bulk_revoke_perms,
+    get_objects_for_user,
+    grant_perm,
+    prefetch_object_perms,
+    revoke_perm,
+)
+from tests.models import Project, ProjectGroupObjectPermission, ProjectUserObjectPermission
+
+
+User = get_user_model()
+
+
+class DirectObjectPermissionTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='test', password='test', email='test@test.test')
+        self.project1 = Project.objects.create(name='project1')
+        self.project2 = Project.objects.create(name='project2')
+
+    def test_grant_user_obj_perm(self):
+        grant_perm(self.user, 'tests.change_project', self.project1)
+
+        self.assertEqual(ProjectUserObjectPermission.objects.count(), 1)
+        self.assertFalse(ObjectPermission.objects.exists())
+
+        user = User.objects.get(pk=self.user.pk)
+        self.assertTrue(user.has_perm('tests.change_project', self.project1))
+        self.assertFalse(user.has_perm('tests.change_project', self.project2))
+        self.assertFalse(user.has_perm('tests.change_project'))
+
+    def test_revoke_user_obj_perm(self):
+        grant_perm(self.user, 'tests.change_project', self.project1)
+        revoke_perm(self.user, 'tests.change_project', self.project1)
+
+        self.assertFalse(ProjectUserObjectPermission.objects.exists())
+
+        user = User.objects.get(pk=self.user.pk)
+        self.assertFalse(user.has_perm('tests.change_project', self.project1))
+
+    def test_grant_user_obj_perm_through_group(self):
+        group = Group.objects.create(name='group')
+        self.user.groups.add(group)
+
+        grant_perm(group, 'tests.change_project', self.project1)
+
+        self.assertEqual(ProjectGroupObjectPermission.objects.count(), 1)
+
+        user = User.objects.get(pk=self.user.pk)
+        self.assertTrue(user.has_perm('tests.change_project', self.project1))
+        self.assertFalse(user.has_perm('tests.change_project', self.project2))
+
+    def test_role_without_direct_table_falls_back_to_object_permission(self):
+        role = Role.objects.create(name='role')
+        self.user.roles.add(role)
+
+        grant_perm(role, 'tests.change_project', self.project1)
+
+        self.assertEqual(ObjectPermission.objects.count(), 1)
+
+        user = User.objects.get(pk=self.user.pk)
+        self.assertTrue(user.has_perm('tests.change_project', self.project1))
+
+    def test_get_objects_for_user(self):
+        group = Group.objects.create(name='group')
+        role = Role.objects.create(name='role')
+        project3 = Project.objects.create(name='project3')
+        Project.objects.create(name='project4')
+
+        self.user.groups.add(group)
+        self.user.roles.add(role)
+
+        grant_perm(self.user, 'tests.view_project', self.project1)
+        grant_perm(group, 'tests.view_project', self.project2)
+        grant_perm(role, 'tests.view_project', project3)
+
+        user = User.objects.get(pk=self.user.pk)
+        self.assertQuerySetEqual(
+            get_objects_for_user(user, 'tests.view_project', Project.objects.order_by('pk')),
+            [self.project1, self.project2, project3],
+        )
+
+    def test_bulk_grant_and_revoke(self):
+        group = Group.objects.create(name='group')
+
+        created = bulk_grant_perms([self.user, group], 'tests.view_project', [self.project1, self.project2])
+        self.assertEqual(created, 4)
+        self.assertEqual(ProjectUserObjectPermission.objects.count(), 2)
+        self.assertEqual(ProjectGroupObjectPermission.objects.count(), 2)
+
+        created = bulk_grant_perms([self.user, group], 'tests.view_project', [self.project1, self.project2])
+        self.assertEqual(created, 0)
+
+        deleted = bulk_revoke_perms([self.user, group], 'tests.view_project', Project.objects.all())
+        self.assertEqual(deleted, 4)
+        self.assertFalse(ProjectUserObjectPermission.objects.exists())
+        self.assertFalse(ProjectGroupObjectPermission.objects.exists())
+
+    def test_deleting_the_object_deletes_its_permissions(self):
+        grant_perm(self.user, 'tests.change_project', self.project1)
+
+        self.project1.delete()
+
+        self.assertFalse(ProjectUserObjectPermission.objects.exists())
+
+    def test_prefetch_object_perms(self):
+        grant_perm(self.user, 'tests.change_project', self.project1)
+
+        user = User.objects.get(pk=self.user.pk)
+        user.has_perm('tests.change_project')
+        prefetch_object_perms(user, [self.project1, self.project2])
+
+        with self.assertNumQueries(0):
+            self.assertTrue(user.has_perm('tests.change_project', self.project1))
+            self.assertFalse(user.has_perm('tests.change_project', self.project2))
+
+    @override_settings(PERMISSIFY_CACHE='default')
+    def test_shared_cache_is_invalidated(self):
+        self.assertFalse(User.objects.get(pk=self.user.pk).has_perm('tests.change_project', self.project1))
+
+        grant_perm(self.user, 'tests.change_project', self.project1)
+        self.assertTrue(User.objects.get(pk=self.user.pk).has_perm('tests.change_project', self.project1))
+
+        revoke_perm(self.user, 'tests.change_project', self.project1)
+        self.assertFalse(User.objects.get(pk=self.user.pk).has_perm('tests.change_project', self.project1))
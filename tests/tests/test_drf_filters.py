@@ -0,0 +1,58 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+
+from rest_framework.test import APITestCase
+from rest_framework import status
+
+from permissify.models import Role
+from permissify.shortcuts import grant_perm
+
+
+User = get_user_model()
+
+
+class DRFObjectPermissionsFilterTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.group = Group.objects.create(name='testgroup')
+        self.user.groups.add(self.group)
+        self.roles = [Role.objects.create(name=f'role{i}') for i in range(5)]
+
+    def get_names(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [role['name'] for role in response.data['results']]
+
+    def test_lists_only_permitted_objects(self):
+        grant_perm(self.user, 'permissify.view_role', self.roles[0])
+        grant_perm(self.group, 'permissify.view_role', self.roles[3])
+        grant_perm(self.user, 'permissify.change_role', self.roles[1])
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get('/mock-roles/')
+
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(self.get_names(response), ['role0', 'role3'])
+
+    def test_model_level_permission_lists_everything(self):
+        grant_perm(self.group, 'permissify.view_role')
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get('/mock-roles/')
+
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual(self.get_names(response), ['role0', 'role1'])
+
+    def test_paginates_permitted_objects(self):
+        for role in self.roles[1:]:
+            grant_perm(self.user, 'permissify.view_role', role)
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get('/mock-roles/?page=2')
+
+        self.assertEqual(response.data['count'], 4)
+        self.assertEqual(self.get_names(response), ['role3', 'role4'])
+
+    def test_anonymous_user_lists_nothing(self):
+        response = self.client.get('/mock-roles/')
+
+        self.assertEqual(response.data['count'], 0)
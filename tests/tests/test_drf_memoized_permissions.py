@@ -0,0 +1,75 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.contrib.contenttypes.models import ContentType
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+
+from rest_framework.test import APITestCase
+from rest_framework import status
+
+from permissify.models import Role
+from permissify.registry import get_registry
+from permissify.shortcuts import grant_perm
+
+
+User = get_user_model()
+
+
+class DRFMemoizedPermissionsTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.group = Group.objects.create(name='testgroup')
+        self.user.groups.add(self.group)
+        self.role = Role.objects.create(name='role')
+
+        grant_perm(self.user, 'permissify.view_role', self.role)
+        grant_perm(self.group, 'permissify.add_role')
+
+        get_registry().warm()
+        ContentType.objects.get_for_models(Role, User, Group)
+
+    def request(self, method, url, data=None):
+        # Authenticate with a fresh user instance, without permission cached.
+        self.client.force_authenticate(user=User.objects.get(pk=self.user.pk))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data)
+
+        return response, len(queries)
+
+    def assertSameResponses(self, method, data=None):
+        response, queries = self.request(method, f'/mock-role-details/{self.role.pk}/', data)
+        memoized_response, memoized_queries = self.request(method, f'/mock-memoized-role-details/{self.role.pk}/', data)
+
+        self.assertEqual(response.status_code, memoized_response.status_code)
+        return response.status_code, queries, memoized_queries
+
+    def test_partial_update(self):
+        grant_perm(self.user, 'permissify.change_role', self.role)
+
+        status_code, queries, memoized_queries = self.assertSameResponses('patch', {'name': 'renamed'})
+
+        self.assertEqual(status_code, status.HTTP_200_OK)
+        # Fetching the object, resolving the permissions on it, validating
+        # the unique name and saving it.
+        self.assertEqual(memoized_queries, 4)
+        self.assertLessEqual(memoized_queries, queries)
+
+    def test_update_without_permission(self):
+        status_code, queries, memoized_queries = self.assertSameResponses('put', {'name': 'renamed'})
+
+        self.assertEqual(status_code, status.HTTP_403_FORBIDDEN)
+        # The model-level fallback doesn't query the user, group and role
+        # permissions again.
+        self.assertEqual(memoized_queries, 2)
+        self.assertLess(memoized_queries, queries)
+
+    def test_update_other_object(self):
+        other = Role.objects.create(name='other')
+
+        response, _ = self.request('put', f'/mock-memoized-role-details/{other.pk}/', {'name': 'renamed'})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_create(self):
+        response, _ = self.request('post', '/mock-memoized-role-details/', {'name': 'new'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
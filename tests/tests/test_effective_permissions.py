@@ -0,0 +1,242 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+
+from permissify.backends import EffectivePermissionModelBackend
+from permissify.models import EffectivePermission, Role
+from permissify.registry import get_registry
+from permissify.shortcuts import bulk_grant_perms, bulk_revoke_perms, grant_perm, revoke_perm
+from tests.models import Project
+
+
+User = get_user_model()
+
+
+@override_settings(PERMISSIFY_EFFECTIVE_PERMISSIONS=True)
+class EffectivePermissionTestCase(TestCase):
+    def setUp(self):
+        self.backend = EffectivePermissionModelBackend()
+        self.user = User.objects.create_user(username='test', password='test', email='test@test.test')
+        self.group = Group.objects.create(name='group')
+        self.role = Role.objects.create(name='role')
+        self.project1 = Project.objects.create(name='project1')
+        self.project2 = Project.objects.create(name='project2')
+
+    def commit(self):
+        return self.captureOnCommitCallbacks(execute=True)
+
+    def get_rows(self):
+        return set(
+            EffectivePermission.objects.filter(user=self.user).values_list(
+                'permission__codename', 'object_id'
+            )
+        )
+
+    def test_grant_and_revoke_model_perm(self):
+        with self.commit():
+            grant_perm(self.user, 'permissify.view_role')
+        self.assertEqual(self.get_rows(), {('view_role', '')})
+
+        with self.commit():
+            revoke_perm(self.user, 'permissify.view_role')
+        self.assertEqual(self.get_rows(), set())
+
+    def test_refreshed_on_commit(self):
+        with self.commit():
+            grant_perm(self.user, 'permissify.view_role')
+            grant_perm(self.user, 'tests.change_project', self.project1)
+            self.assertEqual(self.get_rows(), set())
+
+        self.assertEqual(self.get_rows(), {('view_role', ''), ('change_project', str(self.project1.pk))})
+
+    def test_rolled_back_changes(self):
+        with self.commit() as callbacks:
+            with transaction.atomic():
+                grant_perm(self.user, 'permissify.view_role')
+                transaction.set_rollback(True)
+
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self.get_rows(), set())
+
+    def test_multiple_perms_are_refreshed_once(self):
+        with self.commit() as callbacks:
+            grant_perm(self.user, ['permissify.view_role', 'permissify.change_role'])
+            grant_perm(self.user, 'tests.change_project', self.project1)
+
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(
+            self.get_rows(),
+            {('view_role', ''), ('change_role', ''), ('change_project', str(self.project1.pk))},
+        )
+
+    def test_only_changed_keys_are_checked(self):
+        with self.commit():
+            self.user.groups.add(self.group)
+            grant_perm(self.group, 'permissify.view_role')
+            for project in [self.project1, self.project2]:
+                grant_perm(self.group, ['tests.change_project', 'tests.view_project'], project)
+
+        with self.commit() as callbacks:
+            grant_perm(self.group, 'permissify.change_role', self.role)
+
+        # Only the new grant is read back, not every grant of the user.
+        with CaptureQueriesContext(connection) as queries:
+            callbacks[0]()
+
+        for table in ['tests_project', 'auth_group_permissions']:
+            self.assertFalse(any(table in query['sql'] for query in queries), table)
+        self.assertIn(('change_role', str(self.role.pk)), self.get_rows())
+        self.assertEqual(len(self.get_rows()), 6)
+
+    def test_model_perm_rows_are_unique(self):
+        with self.commit():
+            grant_perm(self.user, 'permissify.view_role')
+
+        # As a concurrent refresh of the same user would insert it.
+        EffectivePermission.objects.bulk_create(
+            [EffectivePermission(user=self.user, permission=get_registry().get('permissify.view_role'))],
+            ignore_conflicts=True,
+        )
+        self.assertEqual(EffectivePermission.objects.filter(user=self.user).count(), 1)
+
+        with self.commit():
+            revoke_perm(self.user, 'permissify.view_role')
+        self.assertEqual(self.get_rows(), set())
+
+    def test_grant_obj_perm_through_group(self):
+        with self.commit():
+            grant_perm(self.group, 'permissify.change_role', self.role)
+        self.assertEqual(self.get_rows(), set())
+
+        with self.commit():
+            self.user.groups.add(self.group)
+        self.assertEqual(self.get_rows(), {('change_role', str(self.role.pk))})
+
+        with self.commit():
+            self.user.groups.remove(self.group)
+        self.assertEqual(self.get_rows(), set())
+
+    def test_group_perms_change(self):
+        with self.commit():
+            self.user.groups.add(self.group)
+            self.group.permissions.add(get_registry().get('permissify.view_role'))
+        self.assertEqual(self.get_rows(), {('view_role', '')})
+
+        with self.commit():
+            self.group.permissions.clear()
+        self.assertEqual(self.get_rows(), set())
+
+    def test_clear_group_members(self):
+        with self.commit():
+            self.user.groups.add(self.group)
+            grant_perm(self.group, 'permissify.view_role')
+        self.assertEqual(self.get_rows(), {('view_role', '')})
+
+        with self.commit():
+            self.group.user_set.clear()
+        self.assertEqual(self.get_rows(), set())
+
+    def test_delete_role(self):
+        with self.commit():
+            self.user.roles.add(self.role)
+            grant_perm(self.role, 'permissify.view_role')
+        self.assertEqual(self.get_rows(), {('view_role', '')})
+
+        with self.commit():
+            self.role.delete()
+        self.assertEqual(self.get_rows(), set())
+
+    def test_direct_obj_perm(self):
+        with self.commit():
+            grant_perm(self.user, 'tests.change_project', self.project1)
+        self.assertEqual(self.get_rows(), {('change_project', str(self.project1.pk))})
+
+        with self.commit():
+            revoke_perm(self.user, 'tests.change_project', self.project1)
+        self.assertEqual(self.get_rows(), set())
+
+    def test_bulk_grant_and_revoke(self):
+        with self.commit():
+            bulk_grant_perms([self.user, self.group], 'tests.change_project', Project.objects.all())
+        self.assertEqual(
+            self.get_rows(),
+            {('change_project', str(self.project1.pk)), ('change_project', str(self.project2.pk))},
+        )
+
+        with self.commit():
+            bulk_revoke_perms([self.user], 'tests.change_project', Project.objects.filter(pk=self.project1.pk))
+        self.assertEqual(self.get_rows(), {('change_project', str(self.project2.pk))})
+
+    def test_has_perm(self):
+        with self.commit():
+            grant_perm(self.user, 'permissify.view_role')
+            grant_perm(self.user, 'tests.change_project', self.project1)
+
+        user = User.objects.get(pk=self.user.pk)
+        self.assertTrue(self.backend.has_perm(user, 'permissify.view_role'))
+        self.assertFalse(self.backend.has_perm(user, 'permissify.change_role'))
+        self.assertTrue(self.backend.has_perm(user, 'permissify.view_role', self.project1))
+        self.assertTrue(self.backend.has_perm(user, 'tests.change_project', self.project1))
+        self.assertFalse(self.backend.has_perm(user, 'tests.change_project', self.project2))
+
+    def test_has_perm_ignores_stale_sources(self):
+        grant_perm(self.user, 'permissify.view_role')
+
+        # Writes made behind permissify's back are only seen after a rebuild.
+        EffectivePermission.objects.all().delete()
+        user = User.objects.get(pk=self.user.pk)
+        self.assertFalse(self.backend.has_perm(user, 'permissify.view_role'))
+
+        call_command('rebuild_effective_permissions', stdout=StringIO())
+        user = User.objects.get(pk=self.user.pk)
+        self.assertTrue(self.backend.has_perm(user, 'permissify.view_role'))
+
+    def test_get_objects_for_user(self):
+        with self.commit():
+            grant_perm(self.user, 'tests.change_project', self.project1)
+
+        self.assertQuerySetEqual(
+            self.backend.get_objects_for_user(self.user, 'change', Project.objects.all()),
+            [self.project1],
+        )
+
+    def test_with_perm(self):
+        other = User.objects.create_user(username='other', password='other', email='other@test.test')
+        with self.commit():
+            grant_perm(self.user, 'permissify.view_role')
+            grant_perm(other, 'permissify.view_role', self.role)
+
+        self.assertQuerySetEqual(self.backend.with_perm('permissify.view_role'), [self.user])
+        self.assertQuerySetEqual(
+            self.backend.with_perm('permissify.view_role', obj=self.role),
+            [self.user, other],
+            ordered=False,
+        )
+
+    def test_rebuild_command(self):
+        grant_perm(self.user, 'permissify.view_role')
+        EffectivePermission.objects.all().delete()
+
+        out = StringIO()
+        call_command('rebuild_effective_permissions', '--batch-size', '1', stdout=out)
+
+        self.assertEqual(self.get_rows(), {('view_role', '')})
+        self.assertIn('1 effective permissions created, 0 deleted', out.getvalue())
+
+        out = StringIO()
+        call_command('rebuild_effective_permissions', stdout=out)
+        self.assertIn('0 effective permissions created, 0 deleted', out.getvalue())
+
+
+class EffectivePermissionDisabledTestCase(TestCase):
+    def test_not_maintained(self):
+        user = User.objects.create_user(username='test', password='test', email='test@test.test')
+        grant_perm(user, 'permissify.view_role')
+
+        self.assertFalse(EffectivePermission.objects.exists())
@@ -0,0 +1,194 @@
+import time
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.contrib.contenttypes.models import ContentType
+
+from permissify.backends import EffectivePermissionModelBackend
+from permissify.models import EffectivePermission, ObjectPermission, Role
+from permissify.shortcuts import bulk_grant_perms, get_objects_for_user, grant_perm, prefetch_object_perms
+from tests.models import Project, ProjectUserObjectPermission
+
+
+User = get_user_model()
+
+
+class ExpiringPermissionTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='test', password='test', email='test@test.test')
+        self.role1 = Role.objects.create(name='role1')
+        self.role2 = Role.objects.create(name='role2')
+        self.project = Project.objects.create(name='project')
+        self.past = timezone.now() - timedelta(hours=1)
+        self.future = timezone.now() + timedelta(hours=1)
+
+    def test_expired_obj_perm(self):
+        grant_perm(self.user, 'permissify.change_role', self.role1, expires_at=self.past)
+        grant_perm(self.user, 'permissify.change_role', self.role2, expires_at=self.future)
+        user = User.objects.get(pk=self.user.pk)
+
+        self.assertFalse(user.has_perm('permissify.change_role', self.role1))
+        self.assertTrue(user.has_perm('permissify.change_role', self.role2))
+        self.assertQuerySetEqual(
+            get_objects_for_user(user, 'change', Role.objects.all()),
+            [self.role2],
+        )
+
+    def test_expired_obj_perm_through_group(self):
+        group = Group.objects.create(name='group')
+        self.user.groups.add(group)
+        grant_perm(group, 'permissify.change_role', self.role1, expires_at=self.past)
+        user = User.objects.get(pk=self.user.pk)
+
+        self.assertFalse(user.has_perm('permissify.change_role', self.role1))
+        self.assertEqual(user.get_group_permissions(self.role1), set())
+
+    def test_expired_direct_obj_perm(self):
+        grant_perm(self.user, 'tests.change_project', self.project, expires_at=self.past)
+        user = User.objects.get(pk=self.user.pk)
+
+        self.assertEqual(ProjectUserObjectPermission.objects.count(), 1)
+        self.assertFalse(user.has_perm('tests.change_project', self.project))
+
+    def test_prefetch_ignores_expired(self):
+        grant_perm(self.user, 'permissify.change_role', self.role1, expires_at=self.past)
+        grant_perm(self.user, 'permissify.change_role', self.role2)
+        user = User.objects.get(pk=self.user.pk)
+
+        prefetch_object_perms(user, [self.role1, self.role2])
+
+        with self.assertNumQueries(0):
+            self.assertFalse(user.has_perm('permissify.change_role', self.role1))
+            self.assertTrue(user.has_perm('permissify.change_role', self.role2))
+
+    def test_grant_again_sets_expiry(self):
+        grant_perm(self.user, 'permissify.change_role', self.role1, expires_at=self.past)
+        grant_perm(self.user, 'permissify.change_role', self.role1)
+
+        self.assertIsNone(ObjectPermission.objects.get().expires_at)
+        self.assertTrue(User.objects.get(pk=self.user.pk).has_perm('permissify.change_role', self.role1))
+
+    def test_grant_again_with_same_expiry(self):
+        grant_perm(self.user, 'permissify.change_role', self.role1, expires_at=self.future)
+        grant_perm(self.user, 'tests.change_project', self.project, expires_at=self.future)
+
+        # Only the lookup of the existing grant, nothing is written.
+        with self.assertNumQueries(1):
+            grant_perm(self.user, 'permissify.change_role', self.role1, expires_at=self.future)
+        with self.assertNumQueries(1):
+            grant_perm(self.user, 'tests.change_project', self.project, expires_at=self.future)
+
+    def test_bulk_grant_sets_expiry(self):
+        grant_perm(self.user, 'permissify.change_role', self.role1)
+
+        created = bulk_grant_perms(
+            [self.user], 'permissify.change_role', [self.role1, self.role2], expires_at=self.future
+        )
+
+        self.assertEqual(created, 1)
+        self.assertEqual(set(ObjectPermission.objects.values_list('expires_at', flat=True)), {self.future})
+
+    def test_model_perm_cannot_expire(self):
+        with self.assertRaises(ValueError):
+            grant_perm(self.user, 'permissify.change_role', expires_at=self.future)
+
+        with self.assertRaises(ValueError):
+            bulk_grant_perms([self.user], 'permissify.change_role', expires_at=self.future)
+
+    @override_settings(PERMISSIFY_EFFECTIVE_PERMISSIONS=True)
+    def test_effective_permissions(self):
+        backend = EffectivePermissionModelBackend()
+        with self.captureOnCommitCallbacks(execute=True):
+            grant_perm(self.user, 'permissify.change_role', self.role1, expires_at=self.future)
+            grant_perm(self.user, 'permissify.change_role', self.role2, expires_at=self.future)
+
+        self.assertEqual(
+            set(EffectivePermission.objects.values_list('expires_at', flat=True)),
+            {self.future},
+        )
+
+        # Expire one of the grants behind the backends' back.
+        EffectivePermission.objects.filter(object_id=str(self.role1.pk)).update(expires_at=self.past)
+        user = User.objects.get(pk=self.user.pk)
+
+        self.assertFalse(backend.has_perm(user, 'permissify.change_role', self.role1))
+        self.assertTrue(backend.has_perm(user, 'permissify.change_role', self.role2))
+        self.assertQuerySetEqual(
+            backend.get_objects_for_user(user, 'change', Role.objects.all()),
+            [self.role2],
+        )
+        self.assertQuerySetEqual(backend.with_perm('permissify.change_role', obj=self.role1), [])
+
+    def test_purge_command(self):
+        grant_perm(self.user, 'permissify.change_role', self.role1, expires_at=self.past)
+        grant_perm(self.user, 'permissify.change_role', self.role2, expires_at=self.future)
+        grant_perm(self.user, 'permissify.delete_role', self.role2)
+        grant_perm(self.user, 'tests.change_project', self.project, expires_at=self.past)
+
+        out = StringIO()
+        call_command('purge_expired_permissions', '--batch-size', '1', stdout=out)
+
+        self.assertEqual(
+            set(ObjectPermission.objects.values_list('permission__codename', 'object_id')),
+            {('change_role', str(self.role2.pk)), ('delete_role', str(self.role2.pk))},
+        )
+        self.assertFalse(ProjectUserObjectPermission.objects.exists())
+        self.assertIn('2 expired permissions deleted.', out.getvalue())
+
+    @override_settings(
+        PERMISSIFY_CACHE='default',
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    )
+    def test_purge_command_invalidates_cache(self):
+        grant_perm(self.user, 'permissify.change_role', self.role1, expires_at=self.future)
+        self.assertTrue(User.objects.get(pk=self.user.pk).has_perm('permissify.change_role', self.role1))
+
+        ObjectPermission.objects.update(expires_at=self.past)
+        call_command('purge_expired_permissions', stdout=StringIO())
+
+        self.assertFalse(User.objects.get(pk=self.user.pk).has_perm('permissify.change_role', self.role1))
+
+    @override_settings(
+        PERMISSIFY_CACHE='default',
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    )
+    def test_cached_perms_expire_with_grant(self):
+        group = Group.objects.create(name='group')
+        self.user.groups.add(group)
+        grant_perm(group, 'permissify.change_role', self.role1, expires_at=timezone.now() + timedelta(seconds=1))
+        grant_perm(self.user, 'permissify.change_role', self.role2, expires_at=self.future)
+
+        self.assertTrue(User.objects.get(pk=self.user.pk).has_perm('permissify.change_role', self.role1))
+        self.assertTrue(User.objects.get(pk=self.user.pk).has_perm('permissify.change_role', self.role2))
+
+        time.sleep(1.5)
+
+        self.assertFalse(User.objects.get(pk=self.user.pk).has_perm('permissify.change_role', self.role1))
+        self.assertTrue(User.objects.get(pk=self.user.pk).has_perm('permissify.change_role', self.role2))
+
+
+class PurgeExpiredPermissionsDatabaseTestCase(TestCase):
+    databases = {'default', 'other'}
+
+    def test_purge_other_database(self):
+        user = User.objects.db_manager('other').create_user(username='test', password='test', email='test@test.test')
+        role = Role.objects.using('other').create(name='role')
+        ObjectPermission.objects.using('other').create(
+            grantee_content_type=ContentType.objects.db_manager('other').get_for_model(User),
+            grantee_id=str(user.pk),
+            object_content_type=ContentType.objects.db_manager('other').get_for_model(Role),
+            object_id=str(role.pk),
+            permission=Permission.objects.using('other').get(codename='change_role'),
+            expires_at=timezone.now() - timedelta(hours=1),
+        )
+
+        out = StringIO()
+        call_command('purge_expired_permissions', '--database', 'other', stdout=out)
+
+        self.assertFalse(ObjectPermission.objects.using('other').exists())
+        self.assertIn('1 expired permissions deleted.', out.getvalue())
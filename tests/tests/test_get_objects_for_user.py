@@ -0,0 +1,72 @@
+from django.test import TestCase
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+
+from permissify.managers import PermissifyQuerySet
+from permissify.models import Role
+from permissify.shortcuts import get_objects_for_user, grant_perm
+
+
+User = get_user_model()
+
+
+class GetObjectsForUserTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='test', password='test', email='test@test.test')
+
+        self.group1 = Group.objects.create(name='group1')
+        self.group2 = Group.objects.create(name='group2')
+        self.group3 = Group.objects.create(name='group3')
+
+    def test_get_objects_for_user_through_user_group_and_role(self):
+        member_of = Group.objects.create(name='member-of')
+        role = Role.objects.create(name='role')
+
+        self.user.groups.add(member_of)
+        self.user.roles.add(role)
+
+        grant_perm(self.user, 'auth.change_group', self.group1)
+        grant_perm(member_of, 'auth.change_group', self.group2)
+        grant_perm(role, 'auth.view_group', self.group3)
+
+        # warm up the model-level permission cache
+        self.assertFalse(self.user.has_perm('auth.change_group'))
+
+        with self.assertNumQueries(1):
+            groups = list(get_objects_for_user(self.user, 'auth.change_group', Group.objects.order_by('pk')))
+
+        self.assertEqual(groups, [self.group1, self.group2])
+
+        self.assertQuerySetEqual(
+            get_objects_for_user(self.user, 'view', Group.objects.all()),
+            [self.group3],
+        )
+
+    def test_get_objects_for_user_with_model_perm(self):
+        grant_perm(self.user, 'auth.change_group')
+        user = User.objects.get(pk=self.user.pk)
+
+        self.assertEqual(
+            get_objects_for_user(user, 'auth.change_group', Group.objects.all()).count(),
+            Group.objects.count(),
+        )
+
+    def test_get_objects_for_user_does_not_match_other_grantee_types(self):
+        # a group sharing the user's pk must not grant anything to the user
+        user = User.objects.create_user(pk=9999, username='same-pk', password='test')
+        group = Group.objects.create(pk=9999, name='same-pk')
+
+        grant_perm(group, 'auth.change_group', self.group1)
+
+        self.assertFalse(
+            get_objects_for_user(user, 'auth.change_group', Group.objects.all()).exists()
+        )
+
+    def test_visible_to(self):
+        grant_perm(self.user, 'auth.view_group', self.group2)
+
+        self.assertQuerySetEqual(
+            PermissifyQuerySet(Group).visible_to(self.user, 'view'),
+            [self.group2],
+        )
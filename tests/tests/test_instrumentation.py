@@ -0,0 +1,110 @@
+from asgiref.sync import async_to_sync
+from django.test import RequestFactory, TestCase, override_settings
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.contrib.contenttypes.models import ContentType
+from django.http import HttpResponse
+
+from permissify.backends import ObjectPermissionModelBackend
+from permissify.instrumentation import permission_checked
+from permissify.middleware import PermissionInstrumentationMiddleware
+from permissify.models import Role
+from permissify.shortcuts import grant_perm
+
+
+User = get_user_model()
+
+
+class InstrumentationTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='test', password='test', email='test@test.test')
+        self.roles = [Role.objects.create(name=f'role{i}') for i in range(3)]
+        grant_perm(self.user, 'permissify.change_role', self.roles[0])
+        ContentType.objects.get_for_models(Role, Group)
+
+        self.checks = []
+        permission_checked.connect(self.record, sender=ObjectPermissionModelBackend)
+        self.addCleanup(permission_checked.disconnect, self.record, sender=ObjectPermissionModelBackend)
+
+    def record(self, sender, **kwargs):
+        self.checks.append(kwargs)
+
+    def test_permission_checked_is_sent(self):
+        user = User.objects.get(pk=self.user.pk)
+
+        self.assertTrue(user.has_perm('permissify.change_role', self.roles[0]))
+        self.assertTrue(user.has_perm('permissify.change_role', self.roles[0]))
+
+        first, second = self.checks
+        self.assertEqual(first['perm'], 'permissify.change_role')
+        self.assertIs(first['obj_type'], Role)
+        self.assertFalse(first['cache_hit'])
+        self.assertEqual(first['queries'], 1)
+        self.assertTrue(first['result'])
+
+        self.assertTrue(second['cache_hit'])
+        self.assertEqual(second['queries'], 0)
+
+    async def test_permission_checked_is_sent_for_async_checks(self):
+        backend = ObjectPermissionModelBackend()
+        user = await User.objects.aget(pk=self.user.pk)
+
+        self.assertTrue(await backend.ahas_perm(user, 'permissify.change_role', self.roles[0]))
+        self.assertTrue(await backend.ahas_perm(user, 'permissify.change_role', self.roles[0]))
+        self.assertFalse(await backend.ahas_perm(user, 'permissify.change_role'))
+
+        first, second, third = self.checks
+        self.assertEqual(first['perm'], 'permissify.change_role')
+        self.assertIs(first['obj_type'], Role)
+        self.assertFalse(first['cache_hit'])
+        self.assertEqual(first['queries'], 1)
+        self.assertTrue(first['result'])
+
+        self.assertTrue(second['cache_hit'])
+        self.assertEqual(second['queries'], 0)
+
+        self.assertIsNone(third['obj_type'])
+        self.assertFalse(third['result'])
+
+    @override_settings(DEBUG=True, PERMISSIFY_N_PLUS_ONE_THRESHOLD=3)
+    def test_middleware_aggregates_checks_per_request(self):
+        def view(request):
+            user = User.objects.get(pk=self.user.pk)
+            for role in self.roles:
+                user.has_perm('permissify.change_role', role)
+            return HttpResponse()
+
+        middleware = PermissionInstrumentationMiddleware(view)
+        self.addCleanup(permission_checked.disconnect, dispatch_uid='permissify.middleware')
+        request = RequestFactory().get('/roles/')
+
+        with self.assertLogs('permissify', level='WARNING') as logs:
+            response = middleware(request)
+
+        stats = request.permissify_stats
+        self.assertEqual(stats.checks, 3)
+        self.assertEqual(stats.queries, 3)
+        self.assertEqual(stats.misses[('permissify.change_role', 'permissify.Role')], 3)
+        self.assertIn('3 permissify.Role objects', logs.output[0])
+        self.assertIn('3 checks, 3 queries', response.headers['Server-Timing'])
+
+    def test_middleware_aggregates_async_checks(self):
+        async def check(user):
+            backend = ObjectPermissionModelBackend()
+            for role in self.roles:
+                await backend.ahas_perm(user, 'permissify.change_role', role)
+
+        def view(request):
+            async_to_sync(check)(User.objects.get(pk=self.user.pk))
+            return HttpResponse()
+
+        middleware = PermissionInstrumentationMiddleware(view)
+        self.addCleanup(permission_checked.disconnect, dispatch_uid='permissify.middleware')
+        request = RequestFactory().get('/roles/')
+        middleware(request)
+
+        stats = request.permissify_stats
+        self.assertEqual(stats.checks, 3)
+        self.assertEqual(stats.queries, 3)
+        self.assertEqual(stats.misses[('permissify.change_role', 'permissify.Role')], 3)
@@ -0,0 +1,100 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+
+from permissify.backends import ObjectPermissionModelBackend
+from permissify.models import Role
+from permissify.shortcuts import grant_perm
+from tests.models import Project, Task
+
+
+User = get_user_model()
+
+
+class ObjectWithPermTestCase(TestCase):
+    def setUp(self):
+        self.backend = ObjectPermissionModelBackend()
+        self.user1 = User.objects.create_user(username='user1', password='test', email='user1@test.test')
+        self.user2 = User.objects.create_user(username='user2', password='test', email='user2@test.test')
+        self.group = Group.objects.create(name='group')
+        self.role = Role.objects.create(name='role')
+        self.project = Project.objects.create(name='project')
+
+    def with_perm(self, perm, obj, **kwargs):
+        return self.backend.with_perm(perm, obj=obj, **kwargs).order_by('pk')
+
+    def test_user_grant(self):
+        grant_perm(self.user1, 'auth.change_group', self.group)
+
+        self.assertQuerySetEqual(self.with_perm('auth.change_group', self.group), [self.user1])
+        self.assertQuerySetEqual(self.with_perm('auth.delete_group', self.group), [])
+
+    def test_group_grant(self):
+        other_group = Group.objects.create(name='other')
+        self.user2.groups.add(other_group)
+        grant_perm(other_group, 'auth.change_group', self.group)
+
+        self.assertQuerySetEqual(self.with_perm('auth.change_group', self.group), [self.user2])
+
+    def test_role_grant(self):
+        child = Role.objects.create(name='child')
+        child.parents.add(self.role)
+        self.user1.roles.add(child)
+        grant_perm(self.role, 'auth.change_group', self.group)
+
+        self.assertQuerySetEqual(self.with_perm('auth.change_group', self.group), [self.user1])
+
+    def test_model_level_grant(self):
+        grant_perm(self.user2, 'auth.change_group')
+
+        self.assertQuerySetEqual(self.with_perm('auth.change_group', self.group), [self.user2])
+
+    def test_scoped_by_content_type(self):
+        # The role shares its primary key with the group.
+        grant_perm(self.user1, 'auth.change_group', self.group)
+        self.assertEqual(self.role.pk, self.group.pk)
+
+        self.assertQuerySetEqual(self.with_perm('auth.change_group', self.role), [])
+
+    def test_expired_grant(self):
+        grant_perm(self.user1, 'auth.change_group', self.group, expires_at=timezone.now() - timedelta(hours=1))
+        grant_perm(self.user2, 'auth.change_group', self.group, expires_at=timezone.now() + timedelta(hours=1))
+
+        self.assertQuerySetEqual(self.with_perm('auth.change_group', self.group), [self.user2])
+
+    def test_direct_grants(self):
+        self.user2.groups.add(self.group)
+        grant_perm(self.user1, 'tests.change_project', self.project)
+        grant_perm(self.group, 'tests.change_project', self.project)
+
+        self.assertQuerySetEqual(self.with_perm('tests.change_project', self.project), [self.user1, self.user2])
+
+    def test_inherited_from_parent(self):
+        task = Task.objects.create(project=self.project, name='task')
+        grant_perm(self.user1, 'tests.change_task', self.project)
+
+        self.assertQuerySetEqual(self.with_perm('tests.change_task', task), [self.user1])
+
+    def test_superusers_and_inactive(self):
+        superuser = User.objects.create_superuser(username='admin', password='test', email='admin@test.test')
+        grant_perm(self.user1, 'auth.change_group', self.group)
+        User.objects.filter(pk=self.user1.pk).update(is_active=False)
+
+        self.assertQuerySetEqual(self.with_perm('auth.change_group', self.group), [superuser])
+        self.assertQuerySetEqual(
+            self.with_perm('auth.change_group', self.group, is_active=False, include_superusers=False),
+            [self.user1],
+        )
+
+    def test_single_query(self):
+        self.user1.roles.add(self.role)
+        self.user2.groups.add(self.group)
+        grant_perm(self.role, 'auth.change_group', self.group)
+        grant_perm(self.group, 'auth.change_group', self.group)
+
+        users = self.with_perm('auth.change_group', self.group)
+        with self.assertNumQueries(1):
+            self.assertEqual(list(users), [self.user1, self.user2])
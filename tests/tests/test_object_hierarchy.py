@@ -0,0 +1,133 @@
+from asgiref.sync import async_to_sync
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+
+from permissify.backends import EffectivePermissionModelBackend, ObjectPermissionModelBackend
+from permissify.grants import get_ancestors
+from permissify.models import ObjectPermission, Role
+from permissify.shortcuts import get_objects_for_user, grant_perm, prefetch_object_perms
+from tests.models import Project, ProjectUserObjectPermission, Subtask, Task
+
+
+User = get_user_model()
+
+
+class ObjectHierarchyTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='test', password='test', email='test@test.test')
+        self.project1 = Project.objects.create(name='project1')
+        self.project2 = Project.objects.create(name='project2')
+        self.task1 = Task.objects.create(project=self.project1, name='task1')
+        self.task2 = Task.objects.create(project=self.project2, name='task2')
+        self.subtask1 = Subtask.objects.create(task=self.task1, name='subtask1')
+        self.subtask2 = Subtask.objects.create(task=self.task2, name='subtask2')
+
+    def test_ancestors(self):
+        self.assertEqual(get_ancestors(Task), ((Project, 'project'),))
+        self.assertEqual(get_ancestors(Subtask), ((Task, 'task'), (Project, 'task__project')))
+        self.assertEqual(get_ancestors(Project), ())
+
+    def test_grant_on_parent(self):
+        grant_perm(self.user, 'tests.change_task', self.project1)
+        user = User.objects.get(pk=self.user.pk)
+
+        self.assertTrue(user.has_perm('tests.change_task', self.task1))
+        self.assertFalse(user.has_perm('tests.change_task', self.task2))
+        self.assertFalse(user.has_perm('tests.delete_task', self.task1))
+        self.assertFalse(user.has_perm('tests.change_task'))
+
+    def test_grant_on_grandparent(self):
+        group = Group.objects.create(name='group')
+        self.user.groups.add(group)
+        grant_perm(group, 'tests.change_subtask', self.project1)
+
+        user = User.objects.get(pk=self.user.pk)
+
+        self.assertTrue(user.has_perm('tests.change_subtask', self.subtask1))
+        self.assertFalse(user.has_perm('tests.change_subtask', self.subtask2))
+        self.assertEqual(user.get_group_permissions(self.subtask1), {'tests.change_subtask'})
+
+    def test_orphan(self):
+        grant_perm(self.user, 'tests.change_subtask', self.project1)
+        subtask = Subtask.objects.create(name='orphan')
+
+        user = User.objects.get(pk=self.user.pk)
+        self.assertFalse(user.has_perm('tests.change_subtask', subtask))
+
+    def test_has_perm_single_query(self):
+        role = Role.objects.create(name='role')
+        self.user.roles.add(role)
+        grant_perm(role, 'tests.change_subtask', self.task1)
+
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(1):
+            self.assertTrue(user.has_perm('tests.change_subtask', self.subtask1))
+
+    def test_no_child_rows(self):
+        grant_perm(self.user, 'tests.change_task', self.project1)
+
+        self.assertEqual(ProjectUserObjectPermission.objects.count(), 1)
+        self.assertFalse(ObjectPermission.objects.exists())
+
+    def test_get_objects_for_user(self):
+        grant_perm(self.user, 'tests.change_subtask', self.project1)
+        grant_perm(self.user, 'tests.change_subtask', self.subtask2)
+
+        self.assertQuerySetEqual(
+            get_objects_for_user(self.user, 'change', Subtask.objects.order_by('pk')),
+            [self.subtask1, self.subtask2],
+        )
+        self.assertQuerySetEqual(get_objects_for_user(self.user, 'change', Task.objects.all()), [])
+
+    def test_prefetch_object_perms(self):
+        grant_perm(self.user, 'tests.change_subtask', self.project1)
+        grant_perm(self.user, 'tests.view_subtask', self.task2)
+
+        user = User.objects.get(pk=self.user.pk)
+        prefetch_object_perms(user, [self.subtask1, self.subtask2])
+
+        with self.assertNumQueries(0):
+            self.assertTrue(user.has_perm('tests.change_subtask', self.subtask1))
+            self.assertFalse(user.has_perm('tests.view_subtask', self.subtask1))
+            self.assertTrue(user.has_perm('tests.view_subtask', self.subtask2))
+            self.assertFalse(user.has_perm('tests.change_subtask', self.subtask2))
+
+    @override_settings(PERMISSIFY_EFFECTIVE_PERMISSIONS=True)
+    def test_effective_permissions(self):
+        backend = EffectivePermissionModelBackend()
+        with self.captureOnCommitCallbacks(execute=True):
+            grant_perm(self.user, 'tests.change_subtask', self.project1)
+
+        user = User.objects.get(pk=self.user.pk)
+        self.assertTrue(backend.has_perm(user, 'tests.change_subtask', self.subtask1))
+        self.assertFalse(backend.has_perm(user, 'tests.change_subtask', self.subtask2))
+        self.assertQuerySetEqual(
+            backend.get_objects_for_user(user, 'change', Subtask.objects.all()),
+            [self.subtask1],
+        )
+
+    @override_settings(
+        PERMISSIFY_CACHE='default',
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    )
+    def test_moving_object_invalidates_shared_cache(self):
+        grant_perm(self.user, 'tests.change_task', self.project1)
+        self.assertTrue(User.objects.get(pk=self.user.pk).has_perm('tests.change_task', self.task1))
+        self.assertTrue(User.objects.get(pk=self.user.pk).has_perm('tests.change_task', self.subtask1))
+
+        task = Task.objects.get(pk=self.task1.pk)
+        task.project = self.project2
+        task.save()
+
+        self.assertFalse(User.objects.get(pk=self.user.pk).has_perm('tests.change_task', task))
+        self.assertFalse(User.objects.get(pk=self.user.pk).has_perm('tests.change_task', self.subtask1))
+
+    def test_async_has_perm(self):
+        grant_perm(self.user, 'tests.change_task', self.project1)
+        user = User.objects.get(pk=self.user.pk)
+
+        ahas_perm = async_to_sync(ObjectPermissionModelBackend().ahas_perm)
+
+        self.assertTrue(ahas_perm(user, 'tests.change_task', self.task1))
+        self.assertFalse(ahas_perm(user, 'tests.change_task', self.task2))
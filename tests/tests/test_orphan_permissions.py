@@ -0,0 +1,201 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.contrib.sessions.models import Session
+from django.db import connection, transaction
+from django.db.models.deletion import Collector
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.contrib.contenttypes.models import ContentType
+
+from permissify import orphans
+from permissify.models import EffectivePermission, ObjectPermission, Role
+from permissify.shortcuts import grant_perm
+from tests.models import Project, ProjectUserObjectPermission
+
+
+User = get_user_model()
+
+
+class CleanOrphanPermissionsTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='test', password='test', email='test@test.test')
+        self.role = Role.objects.create(name='role')
+        self.groups = [Group.objects.create(name=f'group{i}') for i in range(3)]
+
+        for group in self.groups:
+            grant_perm(self.user, 'auth.change_group', group)
+            grant_perm(group, 'permissify.view_role', self.role)
+
+    def clean(self, *args):
+        out = StringIO()
+        call_command('clean_orphan_permissions', *args, stdout=out)
+        return out.getvalue()
+
+    def test_orphan_objects_and_grantees(self):
+        Group.objects.filter(pk__in=[self.groups[0].pk, self.groups[1].pk]).delete()
+        self.assertEqual(ObjectPermission.objects.count(), 6)
+
+        output = self.clean('--batch-size', '1')
+
+        self.assertIn('2 orphan object permissions (object auth.group) deleted.', output)
+        self.assertIn('2 orphan object permissions (grantee auth.group) deleted.', output)
+        self.assertIn('4 orphan permissions deleted.', output)
+        self.assertEqual(
+            set(ObjectPermission.objects.values_list('object_id', 'grantee_id')),
+            {(str(self.groups[2].pk), str(self.user.pk)), (str(self.role.pk), str(self.groups[2].pk))},
+        )
+
+    def test_dry_run(self):
+        self.groups[0].delete()
+
+        output = self.clean('--dry-run')
+
+        self.assertIn('Dry run: 2 orphan permissions found.', output)
+        self.assertEqual(ObjectPermission.objects.count(), 6)
+
+    def test_removed_model(self):
+        ctype = ContentType.objects.create(app_label='tests', model='removed')
+        ObjectPermission.objects.create(
+            grantee_content_type=ContentType.objects.get_for_model(User),
+            grantee_id=str(self.user.pk),
+            object_content_type=ctype,
+            object_id='1',
+            permission=Permission.objects.get(codename='view_group'),
+        )
+
+        output = self.clean()
+
+        self.assertIn('1 orphan object permissions (object tests.removed) deleted.', output)
+        self.assertEqual(ObjectPermission.objects.count(), 6)
+
+    def test_effective_permissions(self):
+        EffectivePermission.objects.create(
+            user=self.user,
+            permission=Permission.objects.get(codename='change_group'),
+            object_content_type=ContentType.objects.get_for_model(Group),
+            object_id=str(self.groups[0].pk),
+        )
+        kept = EffectivePermission.objects.create(
+            user=self.user, permission=Permission.objects.get(codename='change_group')
+        )
+        self.groups[0].delete()
+
+        output = self.clean()
+
+        self.assertIn('1 orphan effective permissions (object auth.group) deleted.', output)
+        self.assertEqual(list(EffectivePermission.objects.all()), [kept])
+
+    def test_no_orphans(self):
+        self.assertIn('0 orphan permissions deleted.', self.clean())
+        self.assertEqual(ObjectPermission.objects.count(), 6)
+
+
+class DeleteOrphanPermissionsTestCase(TestCase):
+    def setUp(self):
+        orphans.connect()
+        self.addCleanup(orphans.disconnect)
+
+        self.user = User.objects.create_user(username='test', password='test', email='test@test.test')
+        self.role = Role.objects.create(name='role')
+        self.groups = [Group.objects.create(name=f'group{i}') for i in range(3)]
+
+        for group in self.groups:
+            grant_perm(self.user, 'auth.change_group', group)
+            grant_perm(group, 'permissify.view_role', self.role)
+
+    def test_queryset_delete_is_batched(self):
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                Group.objects.filter(pk__in=[self.groups[0].pk, self.groups[1].pk]).delete()
+
+        self.assertEqual(ObjectPermission.objects.count(), 2)
+
+        # One statement for the grants on the groups, one for those to them.
+        deletes = [query for query in queries if query['sql'].startswith('DELETE FROM "permissify_objectpermission"')]
+        self.assertEqual(len(deletes), 2)
+
+    def test_grants_to_deleted_grantee(self):
+        user_pk = self.user.pk
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+
+        self.assertEqual(ObjectPermission.objects.count(), 3)
+        self.assertFalse(
+            ObjectPermission.objects.filter(
+                grantee_content_type=ContentType.objects.get_for_model(User), grantee_id=str(user_pk)
+            ).exists()
+        )
+
+    def test_grants_on_deleted_object(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.role.delete()
+
+        self.assertEqual(ObjectPermission.objects.count(), 3)
+
+    def test_rolled_back_delete(self):
+        pks = [str(group.pk) for group in self.groups]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.groups[0].delete()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+
+            self.groups[1].delete()
+
+        self.assertTrue(ObjectPermission.objects.filter(object_id=pks[0]).exists())
+        self.assertFalse(ObjectPermission.objects.filter(object_id=pks[1]).exists())
+
+    def test_rolled_back_savepoint_after_delete(self):
+        grants = ObjectPermission.objects.filter(object_content_type=ContentType.objects.get_for_model(Group))
+        pks = [str(group.pk) for group in self.groups]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.groups[0].delete()
+
+                try:
+                    with transaction.atomic():
+                        self.groups[1].delete()
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+
+                self.groups[2].delete()
+
+        self.assertFalse(grants.filter(object_id=pks[0]).exists())
+        self.assertTrue(grants.filter(object_id=pks[1]).exists())
+        self.assertFalse(grants.filter(object_id=pks[2]).exists())
+
+    def test_direct_grants_cascade(self):
+        project = Project.objects.create(name='project')
+        grant_perm(self.user, 'tests.change_project', project)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            project.delete()
+
+        self.assertFalse(ProjectUserObjectPermission.objects.exists())
+
+    def test_models_without_grants_are_not_tracked(self):
+        # Sessions can't hold grants: they are still fast-deleted.
+        self.assertTrue(Collector(using='default').can_fast_delete(Session))
+
+    @override_settings(PERMISSIFY_DELETE_ORPHAN_PERMISSIONS=['auth.group'])
+    def test_tracked_models_setting(self):
+        orphans.disconnect()
+        orphans.connect()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.groups[0].delete()
+            self.role.delete()
+
+        # The grants on the role are left for clean_orphan_permissions.
+        grants = ObjectPermission.objects.values_list('object_content_type', 'object_id')
+        self.assertNotIn((ContentType.objects.get_for_model(Group).pk, str(self.groups[0].pk)), grants)
+        self.assertEqual(grants.filter(object_content_type=ContentType.objects.get_for_model(Role)).count(), 2)
@@ -0,0 +1,106 @@
+import pickle
+
+from asgiref.sync import async_to_sync
+from django.test import TestCase, override_settings
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+
+from permissify.backends import ObjectPermissionModelBackend
+from permissify.models import Role
+from permissify.registry import get_registry
+from permissify.shortcuts import grant_perm
+from permissify.snapshot import PermissionSnapshot
+
+
+User = get_user_model()
+
+
+class PermissionSnapshotTestCase(TestCase):
+    def setUp(self):
+        self.view_role = get_registry().get('permissify.view_role')
+        self.change_role = get_registry().get('permissify.change_role')
+        self.snapshot = PermissionSnapshot.from_pks([self.view_role.pk, self.change_role.pk])
+
+    def test_membership(self):
+        self.assertTrue(self.snapshot.has('permissify.view_role'))
+        self.assertIn('permissify.change_role', self.snapshot)
+        self.assertNotIn('permissify.delete_role', self.snapshot)
+        self.assertNotIn('permissify.missing_perm', self.snapshot)
+        self.assertNotIn('malformed', self.snapshot)
+        self.assertNotIn(self.view_role.pk, self.snapshot)
+
+    def test_set_like_view(self):
+        self.assertEqual(len(self.snapshot), 2)
+        self.assertEqual(self.snapshot, {'permissify.view_role', 'permissify.change_role'})
+        self.assertEqual(set(self.snapshot.pks()), {self.view_role.pk, self.change_role.pk})
+        self.assertEqual(
+            self.snapshot | {'permissify.delete_role'},
+            {'permissify.view_role', 'permissify.change_role', 'permissify.delete_role'},
+        )
+        self.assertEqual(self.snapshot & {'permissify.view_role'}, {'permissify.view_role'})
+
+        delete_role = get_registry().get('permissify.delete_role')
+        union = self.snapshot | PermissionSnapshot.from_pks([delete_role.pk])
+        self.assertIsInstance(union, PermissionSnapshot)
+        self.assertEqual(len(union), 3)
+
+    def test_serialization(self):
+        self.assertEqual(PermissionSnapshot.from_bytes(self.snapshot.to_bytes()), self.snapshot)
+        self.assertEqual(pickle.loads(pickle.dumps(self.snapshot)), self.snapshot)
+
+        every_perm = PermissionSnapshot.from_pks(Permission.objects.values_list('pk', flat=True))
+        names = {f'{perm.content_type.app_label}.{perm.codename}' for perm in Permission.objects.all()}
+        self.assertLess(len(pickle.dumps(every_perm)), len(pickle.dumps(names)))
+
+
+@override_settings(PERMISSIFY_PERMISSION_SNAPSHOTS=True)
+class BackendPermissionSnapshotTestCase(TestCase):
+    def setUp(self):
+        self.backend = ObjectPermissionModelBackend()
+        self.user = User.objects.create_user(username='test', password='test', email='test@test.test')
+        self.group = Group.objects.create(name='group')
+        self.role = Role.objects.create(name='role')
+        self.user.groups.add(self.group)
+        self.user.roles.add(self.role)
+
+        grant_perm(self.user, 'permissify.add_role')
+        grant_perm(self.group, 'permissify.view_role')
+        grant_perm(self.role, 'permissify.change_role')
+
+    def test_model_level_permissions(self):
+        user = User.objects.get(pk=self.user.pk)
+
+        perms = self.backend.get_all_permissions(user)
+        self.assertIsInstance(perms, PermissionSnapshot)
+        self.assertEqual(perms, {'permissify.add_role', 'permissify.view_role', 'permissify.change_role'})
+
+        self.assertTrue(user.has_perm('permissify.change_role'))
+        self.assertFalse(user.has_perm('permissify.delete_role'))
+        self.assertEqual(
+            user.get_all_permissions(),
+            {'permissify.add_role', 'permissify.view_role', 'permissify.change_role'},
+        )
+
+    def test_object_permissions_still_apply(self):
+        role1 = Role.objects.create(name='role1')
+        grant_perm(self.user, 'permissify.delete_role', role1)
+
+        user = User.objects.get(pk=self.user.pk)
+        self.assertTrue(user.has_perm('permissify.delete_role', role1))
+        self.assertTrue(user.has_perm('permissify.view_role', role1))
+        self.assertFalse(user.has_perm('permissify.delete_role'))
+
+    def test_async(self):
+        user = User.objects.get(pk=self.user.pk)
+
+        self.assertTrue(async_to_sync(self.backend.ahas_perm)(user, 'permissify.view_role'))
+        self.assertIsInstance(user._perm_cache, PermissionSnapshot)
+
+    @override_settings(PERMISSIFY_CACHE='default')
+    def test_shared_cache(self):
+        self.backend.get_all_permissions(User.objects.get(pk=self.user.pk))
+
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(self.backend.has_perm(user, 'permissify.add_role'))
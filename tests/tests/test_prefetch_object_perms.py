@@ -0,0 +1,45 @@
+from django.test import TestCase
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+
+from permissify.models import Role
+from permissify.shortcuts import grant_perm, prefetch_object_perms
+
+
+User = get_user_model()
+
+
+class PrefetchObjectPermissionsTestCase(TestCase):
+    def test_prefetch_object_perms(self):
+        user = User.objects.create_user(username='test', password='test', email='test@test.test')
+        member_of = Group.objects.create(name='member-of')
+        role = Role.objects.create(name='role')
+
+        user.groups.add(member_of)
+        user.roles.add(role)
+
+        groups = [Group.objects.create(name=f'group{i}') for i in range(10)]
+
+        grant_perm(user, 'auth.change_group', groups[0])
+        grant_perm(member_of, 'auth.delete_group', groups[1])
+        grant_perm(role, 'auth.view_group', groups[2])
+        grant_perm(user, 'auth.add_group')
+
+        user = User.objects.get(pk=user.pk)
+        prefetch_object_perms(user, groups)
+
+        with self.assertNumQueries(0):
+            self.assertTrue(user.has_perm('auth.change_group', groups[0]))
+            self.assertTrue(user.has_perm('auth.delete_group', groups[1]))
+            self.assertTrue(user.has_perm('auth.view_group', groups[2]))
+            self.assertFalse(user.has_perm('auth.change_group', groups[1]))
+
+            for group in groups:
+                self.assertTrue(user.has_perm('auth.add_group', group))
+
+            for group in groups[3:]:
+                self.assertFalse(user.has_perm('auth.view_group', group))
+
+        self.assertEqual(user.get_group_permissions(groups[1]), {'auth.delete_group'})
+        self.assertEqual(user.get_role_permissions(groups[2]), {'auth.view_group'})
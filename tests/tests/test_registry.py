@@ -0,0 +1,62 @@
+from django.test import TestCase
+
+from django.contrib.auth.models import Group, Permission
+from django.contrib.contenttypes.models import ContentType
+
+from permissify.registry import get_registry
+
+
+class PermissionRegistryTestCase(TestCase):
+    def test_resolve_perms_without_queries(self):
+        registry = get_registry()
+        registry.clear()
+
+        with self.assertNumQueries(1):
+            registry.warm()
+
+        perm = Permission.objects.get(codename='change_group')
+
+        with self.assertNumQueries(0):
+            self.assertEqual(registry.get('auth.change_group'), perm)
+            self.assertEqual(registry.get_by_natural_key('change_group', 'auth', 'group'), perm)
+            self.assertEqual(registry.get_name(perm.pk), 'auth.change_group')
+            self.assertEqual(
+                {p.codename for p in registry.filter(app_label='auth', model='group')},
+                {'add_group', 'change_group', 'delete_group', 'view_group'},
+            )
+
+    def test_registry_is_refreshed_on_permission_changes(self):
+        registry = get_registry()
+        registry.warm()
+
+        perm = Permission.objects.create(
+            codename='archive_group',
+            name='Can archive group',
+            content_type=ContentType.objects.get_for_model(Group),
+        )
+
+        self.assertIn(perm, registry.filter(app_label='auth', model='group'))
+
+        perm.delete()
+
+        self.assertNotIn('archive_group', {p.codename for p in registry.filter(app_label='auth')})
+
+        with self.assertRaises(Permission.DoesNotExist):
+            registry.get('auth.archive_group')
+
+    def test_unknown_permissions_are_cached(self):
+        registry = get_registry()
+        registry.warm()
+
+        with self.assertNumQueries(1):
+            for i in range(3):
+                with self.assertRaises(Permission.DoesNotExist):
+                    registry.get('auth.archive_group')
+
+        perm = Permission.objects.create(
+            codename='archive_group',
+            name='Can archive group',
+            content_type=ContentType.objects.get_for_model(Group),
+        )
+
+        self.assertEqual(registry.get('auth.archive_group'), perm)
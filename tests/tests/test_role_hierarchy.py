@@ -0,0 +1,196 @@
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+
+from permissify.backends import PermissionModelBackend
+from permissify.hierarchy import rebuild_closure
+from permissify.models import EffectivePermission, Role, RoleClosure
+from permissify.shortcuts import get_objects_for_user, grant_perm
+
+
+User = get_user_model()
+
+
+class RoleHierarchyTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='test', password='test', email='test@test.test')
+        self.viewer = Role.objects.create(name='viewer')
+        self.editor = Role.objects.create(name='editor')
+        self.admin = Role.objects.create(name='admin')
+
+        self.editor.parents.add(self.viewer)
+        self.admin.parents.add(self.editor)
+
+        grant_perm(self.viewer, 'auth.view_group')
+        grant_perm(self.editor, 'auth.change_group')
+        grant_perm(self.admin, 'auth.delete_group')
+
+    def get_closure(self):
+        return set(RoleClosure.objects.values_list('ancestor__name', 'descendant__name', 'depth'))
+
+    def test_closure(self):
+        self.assertEqual(self.get_closure(), {
+            ('viewer', 'editor', 1),
+            ('editor', 'admin', 1),
+            ('viewer', 'admin', 2),
+        })
+
+    def test_inherited_perms(self):
+        self.user.roles.add(self.admin)
+        user = User.objects.get(pk=self.user.pk)
+
+        self.assertEqual(
+            user.get_role_permissions(),
+            {'auth.view_group', 'auth.change_group', 'auth.delete_group'},
+        )
+
+        self.user.roles.set([self.editor])
+        user = User.objects.get(pk=self.user.pk)
+
+        self.assertEqual(user.get_role_permissions(), {'auth.view_group', 'auth.change_group'})
+
+    def test_role_perms_single_query(self):
+        self.user.roles.add(self.admin)
+        user = User.objects.get(pk=self.user.pk)
+
+        with self.assertNumQueries(1):
+            PermissionModelBackend().get_role_permissions(user)
+
+    def test_inherited_obj_perms(self):
+        group1 = Group.objects.create(name='group1')
+        group2 = Group.objects.create(name='group2')
+        grant_perm(self.viewer, 'auth.add_group', group1)
+        self.user.roles.add(self.admin)
+
+        user = User.objects.get(pk=self.user.pk)
+
+        self.assertTrue(user.has_perm('auth.add_group', group1))
+        self.assertFalse(user.has_perm('auth.add_group', group2))
+        self.assertQuerySetEqual(get_objects_for_user(user, 'auth.add_group', Group.objects.all()), [group1])
+
+    def test_with_perm(self):
+        self.user.roles.add(self.admin)
+
+        self.assertQuerySetEqual(PermissionModelBackend().with_perm('auth.view_group'), [self.user])
+
+    def test_remove_parent(self):
+        self.user.roles.add(self.admin)
+        self.editor.parents.remove(self.viewer)
+
+        self.assertNotIn(('viewer', 'admin', 2), self.get_closure())
+
+        user = User.objects.get(pk=self.user.pk)
+        self.assertFalse(user.has_perm('auth.view_group'))
+        self.assertTrue(user.has_perm('auth.change_group'))
+
+    def test_clear_children(self):
+        self.viewer.children.clear()
+
+        self.assertEqual(self.get_closure(), {
+            ('editor', 'admin', 1),
+        })
+
+    def test_delete_intermediate_role(self):
+        self.editor.delete()
+
+        self.assertEqual(self.get_closure(), set())
+
+    def test_shortest_depth(self):
+        self.admin.parents.add(self.viewer)
+
+        self.assertIn(('viewer', 'admin', 1), self.get_closure())
+
+    def test_cycle(self):
+        # `add()` doesn't use a savepoint, so each attempt runs in its own
+        # transaction.
+        with self.assertRaises(ValidationError), transaction.atomic():
+            self.viewer.parents.add(self.admin)
+
+        with self.assertRaises(ValidationError), transaction.atomic():
+            self.admin.children.add(self.viewer)
+
+        with self.assertRaises(ValidationError), transaction.atomic():
+            self.viewer.parents.add(self.viewer)
+
+        self.assertFalse(self.viewer.parents.exists())
+
+    def test_rebuild_closure(self):
+        RoleClosure.objects.all().delete()
+
+        self.assertEqual(rebuild_closure(), (3, 0))
+        self.assertEqual(len(self.get_closure()), 3)
+        self.assertEqual(rebuild_closure(), (0, 0))
+
+    def test_role_without_closure_rows(self):
+        # Neither bulk inserts nor historical models in data migrations
+        # send post_save.
+        role = Role.objects.bulk_create([Role(name='bulk')])[0]
+        group = Group.objects.create(name='group')
+        grant_perm(role, 'auth.change_group')
+        grant_perm(role, 'auth.add_group', group)
+        self.user.roles.add(role)
+
+        user = User.objects.get(pk=self.user.pk)
+        self.assertFalse(RoleClosure.objects.filter(descendant=role).exists())
+        self.assertEqual(user.get_role_permissions(), {'auth.change_group'})
+        self.assertTrue(user.has_perm('auth.change_group'))
+        self.assertTrue(user.has_perm('auth.add_group', group))
+        self.assertQuerySetEqual(PermissionModelBackend().with_perm('auth.change_group'), [self.user])
+        self.assertQuerySetEqual(get_objects_for_user(user, 'auth.add_group', Group.objects.all()), [group])
+
+    @override_settings(PERMISSIFY_EFFECTIVE_PERMISSIONS=True)
+    def test_effective_permissions(self):
+        def get_codenames():
+            return set(
+                EffectivePermission.objects.filter(user=self.user).values_list('permission__codename', flat=True)
+            )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.roles.add(self.editor)
+        self.assertEqual(get_codenames(), {'view_group', 'change_group'})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.editor.parents.remove(self.viewer)
+        self.assertEqual(get_codenames(), {'change_group'})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.editor.parents.add(self.viewer)
+        self.assertEqual(get_codenames(), {'view_group', 'change_group'})
+
+    @override_settings(
+        PERMISSIFY_CACHE='default',
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    )
+    def test_shared_cache_invalidation(self):
+        self.user.roles.add(self.admin)
+        self.assertTrue(User.objects.get(pk=self.user.pk).has_perm('auth.view_group'))
+
+        self.editor.parents.remove(self.viewer)
+        self.assertFalse(User.objects.get(pk=self.user.pk).has_perm('auth.view_group'))
+
+        grant_perm(self.editor, 'auth.add_group')
+        self.assertTrue(User.objects.get(pk=self.user.pk).has_perm('auth.add_group'))
+
+
+class RoleHierarchyDatabaseTestCase(TestCase):
+    databases = {'default', 'other'}
+
+    def test_closure_written_to_role_database(self):
+        viewer = Role.objects.using('other').create(name='viewer')
+        editor = Role.objects.using('other').create(name='editor')
+
+        editor.parents.add(viewer)
+
+        self.assertFalse(RoleClosure.objects.exists())
+        self.assertEqual(
+            set(RoleClosure.objects.using('other').values_list('ancestor__name', 'descendant__name', 'depth')),
+            {('viewer', 'editor', 1)},
+        )
+
+        with self.assertRaises(ValidationError), transaction.atomic(using='other'):
+            viewer.parents.add(editor)
+
+        editor.delete()
+        self.assertFalse(RoleClosure.objects.using('other').exists())
@@ -0,0 +1,70 @@
+from django.test import TestCase, override_settings
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+
+from permissify.models import Role
+from permissify.shortcuts import grant_perm, revoke_perm
+
+
+User = get_user_model()
+
+
+@override_settings(PERMISSIFY_CACHE='default')
+class SharedPermissionCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='test', password='test', email='test@test.test')
+        self.group = Group.objects.create(name='group')
+
+    def test_perms_are_shared_between_user_instances(self):
+        grant_perm(self.user, 'auth.change_group')
+        grant_perm(self.user, 'auth.view_group', self.group)
+
+        user = User.objects.get(pk=self.user.pk)
+        self.assertTrue(user.has_perm('auth.change_group'))
+        self.assertTrue(user.has_perm('auth.view_group', self.group))
+
+        user = User.objects.get(pk=self.user.pk)
+
+        with self.assertNumQueries(0):
+            self.assertTrue(user.has_perm('auth.change_group'))
+            self.assertTrue(user.has_perm('auth.view_group', self.group))
+            self.assertFalse(user.has_perm('auth.delete_group', self.group))
+
+    def test_object_permission_changes_invalidate_the_cache(self):
+        role = Role.objects.create(name='role')
+        self.user.roles.add(role)
+
+        self.assertFalse(User.objects.get(pk=self.user.pk).has_perm('auth.view_group', self.group))
+
+        grant_perm(role, 'auth.view_group', self.group)
+        self.assertTrue(User.objects.get(pk=self.user.pk).has_perm('auth.view_group', self.group))
+
+        revoke_perm(role, 'auth.view_group', self.group)
+        self.assertFalse(User.objects.get(pk=self.user.pk).has_perm('auth.view_group', self.group))
+
+    def test_membership_changes_invalidate_the_cache(self):
+        member_of = Group.objects.create(name='member-of')
+        grant_perm(member_of, 'auth.change_group')
+
+        self.assertFalse(User.objects.get(pk=self.user.pk).has_perm('auth.change_group'))
+
+        member_of.user_set.add(self.user)
+        self.assertTrue(User.objects.get(pk=self.user.pk).has_perm('auth.change_group'))
+
+        member_of.user_set.clear()
+        self.assertFalse(User.objects.get(pk=self.user.pk).has_perm('auth.change_group'))
+
+        self.user.groups.add(member_of)
+        self.assertTrue(User.objects.get(pk=self.user.pk).has_perm('auth.change_group'))
+
+        revoke_perm(member_of, 'auth.change_group')
+        self.assertFalse(User.objects.get(pk=self.user.pk).has_perm('auth.change_group'))
+
+        grant_perm(member_of, 'auth.change_group')
+        self.assertTrue(User.objects.get(pk=self.user.pk).has_perm('auth.change_group'))
+
+        member_of.delete()
+        self.assertFalse(User.objects.get(pk=self.user.pk).has_perm('auth.change_group'))
@@ -0,0 +1,75 @@
+from django.test import TestCase
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.contrib.contenttypes.models import ContentType
+
+from permissify.models import Role
+from permissify.shortcuts import grant_perm
+from tests.models import Project
+
+
+User = get_user_model()
+
+
+class SingleQueryObjectPermissionsTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='test', password='test', email='test@test.test')
+        self.group = Group.objects.create(name='group')
+        self.role = Role.objects.create(name='role')
+        self.role1 = Role.objects.create(name='role1')
+        self.role2 = Role.objects.create(name='role2')
+        self.project = Project.objects.create(name='project')
+
+        self.user.groups.add(self.group)
+        self.user.roles.add(self.role)
+
+        ContentType.objects.get_for_models(Role, Project)
+
+    def test_get_all_permissions_in_one_query(self):
+        grant_perm(self.user, 'permissify.view_role')
+        grant_perm(self.group, 'permissify.change_role', self.role1)
+        grant_perm(self.role, 'permissify.delete_role', self.role1)
+        grant_perm(self.user, 'permissify.add_role', self.role2)
+
+        user = User.objects.get(pk=self.user.pk)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                user.get_all_permissions(self.role1),
+                {'permissify.view_role', 'permissify.change_role', 'permissify.delete_role'},
+            )
+
+        with self.assertNumQueries(0):
+            self.assertTrue(user.has_perm('permissify.change_role', self.role1))
+            self.assertFalse(user.has_perm('permissify.add_role', self.role1))
+
+    def test_model_level_permissions_through_group_and_role(self):
+        grant_perm(self.group, 'permissify.view_role')
+        grant_perm(self.role, 'permissify.change_role')
+
+        user = User.objects.get(pk=self.user.pk)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                user.get_all_permissions(self.role1),
+                {'permissify.view_role', 'permissify.change_role'},
+            )
+
+    def test_direct_foreign_key_table(self):
+        grant_perm(self.user, 'tests.change_project', self.project)
+        grant_perm(self.group, 'tests.view_project', self.project)
+        grant_perm(self.role, 'tests.delete_project', self.project)
+
+        user = User.objects.get(pk=self.user.pk)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                user.get_all_permissions(self.project),
+                {'tests.change_project', 'tests.view_project', 'tests.delete_project'},
+            )
+
+    def test_superuser(self):
+        user = User.objects.create_superuser(username='admin', password='admin', email='admin@test.test')
+
+        self.assertIn('permissify.change_role', user.get_all_permissions(self.role1))
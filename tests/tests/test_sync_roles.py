@@ -0,0 +1,127 @@
+import json
+import os
+import tempfile
+from importlib.util import find_spec
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from unittest import skipUnless
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+
+from permissify.models import Role
+from permissify.registry import get_registry
+
+
+User = get_user_model()
+
+
+class SyncRolesTestCase(TestCase):
+    def setUp(self):
+        self.editor = Role.objects.create(name='editor')
+        self.editor.permissions.add(
+            *Permission.objects.filter(
+                content_type__app_label='auth', codename__in=['view_group', 'delete_group']
+            )
+        )
+
+    def sync(self, spec, *args, suffix='.json'):
+        with tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False) as f:
+            f.write(spec if isinstance(spec, str) else json.dumps(spec))
+        self.addCleanup(os.unlink, f.name)
+
+        out = StringIO()
+        call_command('sync_roles', f.name, *args, stdout=out)
+        return out.getvalue()
+
+    def get_perms(self, role_name):
+        return {
+            f'{perm.content_type.app_label}.{perm.codename}'
+            for perm in Role.objects.get(name=role_name).permissions.select_related('content_type')
+        }
+
+    def test_sync_applies_the_diff(self):
+        output = self.sync({
+            'editor': ['auth.view_group', 'auth.change_group'],
+            'viewer': ['tests.*_project'],
+        })
+
+        self.assertIn('+ role viewer', output)
+        self.assertIn('+ editor: auth.change_group', output)
+        self.assertIn('- editor: auth.delete_group', output)
+        self.assertNotIn('auth.view_group', output)
+        self.assertIn('1 roles created, 5 permissions added, 1 removed.', output)
+
+        self.assertEqual(self.get_perms('editor'), {'auth.view_group', 'auth.change_group'})
+        self.assertEqual(
+            self.get_perms('viewer'),
+            {'tests.add_project', 'tests.change_project', 'tests.delete_project', 'tests.view_project'},
+        )
+
+    def test_sync_keeps_unchanged_rows(self):
+        through = Role.permissions.through
+        kept = through.objects.get(role=self.editor, permission__codename='view_group')
+
+        self.sync({'editor': ['auth.view_group', 'auth.change_group']})
+
+        self.assertTrue(through.objects.filter(pk=kept.pk).exists())
+
+    def test_sync_is_idempotent(self):
+        spec = {'editor': ['auth.view_group', 'auth.delete_group']}
+        get_registry().warm()
+
+        # The roles and their current permissions, in a transaction (two
+        # savepoint queries under the test case): nothing is written.
+        with self.assertNumQueries(4):
+            output = self.sync(spec)
+
+        self.assertIn('0 roles created, 0 permissions added, 0 removed.', output)
+
+    def test_roles_are_created_in_bulk(self):
+        with CaptureQueriesContext(connection) as queries:
+            output = self.sync({'viewer': ['auth.view_group'], 'auditor': ['auth.view_group'], 'guest': []})
+
+        self.assertIn('3 roles created, 2 permissions added, 0 removed.', output)
+        inserts = [query for query in queries if 'INTO "permissify_role" ' in query['sql']]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(self.get_perms('auditor'), {'auth.view_group'})
+
+    def test_dry_run(self):
+        output = self.sync({'editor': ['auth.change_group'], 'viewer': []}, '--dry-run')
+
+        self.assertIn('+ role viewer', output)
+        self.assertIn('+ editor: auth.change_group', output)
+        self.assertIn('Dry run: 1 roles created, 1 permissions added, 2 removed.', output)
+        self.assertFalse(Role.objects.filter(name='viewer').exists())
+        self.assertEqual(self.get_perms('editor'), {'auth.view_group', 'auth.delete_group'})
+
+    def test_unknown_permission(self):
+        with self.assertRaisesMessage(CommandError, 'Unknown permission "auth.missing" for role "editor".'):
+            self.sync({'editor': ['auth.missing']})
+
+        self.assertEqual(self.get_perms('editor'), {'auth.view_group', 'auth.delete_group'})
+
+    def test_invalid_spec(self):
+        with self.assertRaisesMessage(CommandError, 'The spec must map each role name to a list of permissions.'):
+            self.sync({'editor': 'auth.view_group'})
+
+    def test_members_permissions_refreshed(self):
+        user = User.objects.create_user(username='test', password='test', email='test@test.test')
+        user.roles.add(self.editor)
+        self.assertFalse(user.has_perm('auth.change_group'))
+
+        self.sync({'editor': ['auth.change_group']})
+
+        user = User.objects.get(pk=user.pk)
+        self.assertTrue(user.has_perm('auth.change_group'))
+        self.assertFalse(user.has_perm('auth.view_group'))
+
+    @skipUnless(find_spec('yaml'), 'PyYAML is not installed')
+    def test_yaml_spec(self):
+        self.sync('editor:\n  - auth.change_group\n', suffix='.yaml')
+
+        self.assertEqual(self.get_perms('editor'), {'auth.change_group'})
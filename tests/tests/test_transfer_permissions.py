@@ -0,0 +1,148 @@
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+
+from permissify.models import ObjectPermission, Role
+from permissify.shortcuts import grant_perm
+from tests.models import Project, ProjectGroupObjectPermission, ProjectUserObjectPermission
+
+
+User = get_user_model()
+
+
+class TransferPermissionsTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='test', password='test', email='test@test.test')
+        self.group = Group.objects.create(name='group')
+        self.role = Role.objects.create(name='role')
+        self.project = Project.objects.create(name='project')
+        self.expires_at = (timezone.now() + timedelta(days=1)).replace(microsecond=0)
+
+        grant_perm(self.user, 'permissify.change_role', self.role, expires_at=self.expires_at)
+        grant_perm(self.group, 'auth.view_group', self.group)
+        grant_perm(self.role, 'permissify.view_role', self.role)
+        grant_perm(self.user, 'tests.change_project', self.project)
+        grant_perm(self.group, 'tests.view_project', self.project)
+
+    def get_grants(self):
+        return (
+            set(ObjectPermission.objects.values_list(
+                'grantee_content_type', 'grantee_id', 'object_content_type', 'object_id', 'permission', 'expires_at'
+            )),
+            set(ProjectUserObjectPermission.objects.values_list('user', 'content_object', 'permission', 'expires_at')),
+            set(ProjectGroupObjectPermission.objects.values_list('group', 'content_object', 'permission')),
+        )
+
+    def delete_grants(self):
+        ObjectPermission.objects.all().delete()
+        ProjectUserObjectPermission.objects.all().delete()
+        ProjectGroupObjectPermission.objects.all().delete()
+
+    def export(self, *args):
+        out, err = StringIO(), StringIO()
+        call_command('export_permissions', *args, stdout=out, stderr=err)
+        self.assertIn('5 permissions exported.', err.getvalue())
+        return out.getvalue()
+
+    def import_(self, content, *args):
+        with tempfile.NamedTemporaryFile('w', suffix='.export', delete=False) as f:
+            f.write(content)
+        self.addCleanup(os.unlink, f.name)
+
+        out = StringIO()
+        call_command('import_permissions', f.name, *args, stdout=out)
+        return out.getvalue()
+
+    def test_jsonl_round_trip(self):
+        grants = self.get_grants()
+        content = self.export()
+
+        records = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(len(records), 5)
+        self.assertIn(
+            {
+                'permission': 'permissify.change_role',
+                'grantee_type': 'permissify.user',
+                'grantee_id': str(self.user.pk),
+                'object_type': 'permissify.role',
+                'object_id': str(self.role.pk),
+                'expires_at': self.expires_at.isoformat(),
+            },
+            records,
+        )
+
+        self.delete_grants()
+        output = self.import_(content)
+
+        self.assertIn('5 permissions imported, 0 skipped.', output)
+        self.assertEqual(self.get_grants(), grants)
+
+    def test_csv_round_trip(self):
+        grants = self.get_grants()
+        content = self.export('--format', 'csv')
+
+        self.assertTrue(content.startswith('permission,grantee_type,grantee_id,object_type,object_id,expires_at'))
+
+        self.delete_grants()
+        self.import_(content, '--format', 'csv')
+
+        self.assertEqual(self.get_grants(), grants)
+
+    def test_import_is_idempotent(self):
+        grants = self.get_grants()
+
+        self.import_(self.export())
+
+        self.assertEqual(self.get_grants(), grants)
+        self.assertEqual(ObjectPermission.objects.count(), 3)
+
+    def test_import_in_batches(self):
+        content = self.export()
+        self.delete_grants()
+
+        output = self.import_(content, '--batch-size', '2')
+
+        self.assertIn('2 permissions imported...', output)
+        self.assertIn('4 permissions imported...', output)
+        self.assertIn('5 permissions imported, 0 skipped.', output)
+
+    def test_import_skips_unknown_references(self):
+        records = [
+            {'permission': 'auth.missing_perm', 'grantee_type': 'auth.group', 'grantee_id': str(self.group.pk),
+             'object_type': 'auth.group', 'object_id': str(self.group.pk), 'expires_at': None},
+            {'permission': 'auth.change_group', 'grantee_type': 'missing.model', 'grantee_id': '1',
+             'object_type': 'auth.group', 'object_id': str(self.group.pk), 'expires_at': None},
+            {'permission': 'auth.change_group', 'grantee_type': 'tests.project', 'grantee_id': '1',
+             'object_type': 'auth.group', 'object_id': str(self.group.pk), 'expires_at': None},
+        ]
+
+        output = self.import_('\n'.join(map(json.dumps, records)))
+
+        self.assertIn('0 permissions imported, 3 skipped.', output)
+
+    def test_import_invalidates_cached_permissions(self):
+        content = self.export()
+        self.delete_grants()
+        self.assertFalse(self.user.has_perm('tests.change_project', self.project))
+
+        self.import_(content)
+
+        user = User.objects.get(pk=self.user.pk)
+        self.assertTrue(user.has_perm('tests.change_project', self.project))
+        self.assertTrue(user.has_perm('permissify.change_role', self.role))
+
+    def test_export_to_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'grants.jsonl')
+            self.assertEqual(self.export('--output', path), '')
+
+            with open(path) as f:
+                self.assertEqual(len(f.readlines()), 5)
@@ -0,0 +1,142 @@
+import uuid
+from datetime import timedelta
+from contextlib import ExitStack
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import isolate_apps
+from django.db.models import F
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.contrib.contenttypes.models import ContentType
+
+from permissify import backends, grants, shortcuts
+from permissify.management.commands import convert_object_permissions
+from permissify.models import AbstractBigIntegerObjectPermission, AbstractUUIDObjectPermission, ObjectPermission
+from permissify.shortcuts import get_objects_for_user, grant_perm
+from permissify.utils import cast_to_field
+from tests.models import BigIntegerObjectPermission
+
+
+User = get_user_model()
+
+
+class TypedObjectPermissionTestCase(SimpleTestCase):
+    @isolate_apps('tests')
+    def test_big_integer_object_permission(self):
+        class BigIntegerObjectPermission(AbstractBigIntegerObjectPermission):
+            class Meta(AbstractBigIntegerObjectPermission.Meta):
+                app_label = 'tests'
+
+        self.assertEqual(BigIntegerObjectPermission.to_object_id('5'), 5)
+        self.assertEqual(BigIntegerObjectPermission.to_grantee_id(7), 7)
+        self.assertEqual(len(BigIntegerObjectPermission._meta.indexes), 3)
+        self.assertEqual(BigIntegerObjectPermission._meta.indexes[2].name, 'bigintegerobjectpermission_exp')
+
+        pk = F('pk')
+        self.assertIs(cast_to_field(pk, BigIntegerObjectPermission._meta.get_field('object_id')), pk)
+
+    @isolate_apps('tests')
+    def test_uuid_object_permission(self):
+        class UUIDObjectPermission(AbstractUUIDObjectPermission):
+            class Meta(AbstractUUIDObjectPermission.Meta):
+                app_label = 'tests'
+
+        value = uuid.uuid4()
+        self.assertEqual(UUIDObjectPermission.to_object_id(str(value)), value)
+
+    def test_string_object_permission(self):
+        self.assertEqual(ObjectPermission.to_object_id(5), '5')
+
+        pk = F('pk')
+        self.assertIsNot(cast_to_field(pk, ObjectPermission._meta.get_field('object_id')), pk)
+
+
+class ConvertObjectPermissionsTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='test', password='test', email='test@test.test')
+        self.group = Group.objects.create(name='group')
+        self.groups = [Group.objects.create(name=f'group{i}') for i in range(3)]
+        self.user.groups.add(self.group)
+
+        grant_perm(self.user, 'auth.change_group', self.groups[0])
+        grant_perm(self.group, 'auth.change_group', self.groups[1])
+        self.expires_at = (timezone.now() + timedelta(days=1)).replace(microsecond=0)
+        grant_perm(self.user, 'auth.view_group', self.groups[2], expires_at=self.expires_at)
+        grant_perm(self.user, 'auth.delete_group', self.groups[2], expires_at=timezone.now() - timedelta(days=1))
+
+    def swap(self):
+        """
+        Point every module reading the object permission model at import
+        time to BigIntegerObjectPermission, for the duration of the test.
+        """
+        stack = ExitStack()
+        self.addCleanup(stack.close)
+        stack.enter_context(override_settings(PERMISSIFY_OBJECT_PERMISSION_MODEL='tests.BigIntegerObjectPermission'))
+
+        for module in (backends, grants, shortcuts, convert_object_permissions):
+            stack.enter_context(mock.patch.object(module, 'ObjectPermission', BigIntegerObjectPermission))
+
+    def test_convert_and_check(self):
+        self.swap()
+
+        out = StringIO()
+        call_command('convert_object_permissions', '--batch-size', '1', stdout=out)
+
+        self.assertIn('4 object permissions copied, 0 skipped.', out.getvalue())
+        self.assertEqual(
+            set(BigIntegerObjectPermission.objects.values_list('grantee_id', 'object_id')),
+            {(self.user.pk, self.groups[0].pk), (self.group.pk, self.groups[1].pk), (self.user.pk, self.groups[2].pk)},
+        )
+        self.assertEqual(
+            BigIntegerObjectPermission.objects.get(permission__codename='view_group').expires_at, self.expires_at
+        )
+
+        # The string-typed table is not read anymore, and swapped out of the ORM.
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM %s' % connection.ops.quote_name(ObjectPermission._meta.db_table))
+
+        user = User.objects.get(pk=self.user.pk)
+        self.assertTrue(user.has_perm('auth.change_group', self.groups[0]))
+        self.assertTrue(user.has_perm('auth.change_group', self.groups[1]))
+        self.assertFalse(user.has_perm('auth.change_group', self.groups[2]))
+        self.assertTrue(user.has_perm('auth.view_group', self.groups[2]))
+        self.assertFalse(user.has_perm('auth.delete_group', self.groups[2]))
+        self.assertQuerySetEqual(
+            get_objects_for_user(user, 'auth.change_group', Group.objects.order_by('pk')),
+            self.groups[:2],
+        )
+
+    def test_convert_table_without_expiry(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TABLE legacy_objectpermission AS SELECT grantee_content_type_id, grantee_id, '
+                'object_content_type_id, object_id, permission_id FROM %s'
+                % connection.ops.quote_name(ObjectPermission._meta.db_table)
+            )
+        self.swap()
+
+        out = StringIO()
+        call_command('convert_object_permissions', '--source-table', 'legacy_objectpermission', stdout=out)
+
+        self.assertIn('4 object permissions copied, 0 skipped.', out.getvalue())
+        self.assertFalse(BigIntegerObjectPermission.objects.exclude(expires_at=None).exists())
+
+    def test_convert_skips_invalid_ids(self):
+        ObjectPermission.objects.create(
+            grantee_content_type=ContentType.objects.get_for_model(User),
+            grantee_id='not-a-number',
+            object_content_type=ContentType.objects.get_for_model(Group),
+            object_id=str(self.groups[2].pk),
+            permission=Permission.objects.get(codename='change_group'),
+        )
+        self.swap()
+
+        out = StringIO()
+        call_command('convert_object_permissions', stdout=out)
+
+        self.assertIn('4 object permissions copied, 1 skipped.', out.getvalue())
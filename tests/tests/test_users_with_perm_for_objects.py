@@ -0,0 +1,150 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+
+from permissify.backends import ObjectPermissionModelBackend
+from permissify.models import Role
+from permissify.shortcuts import grant_perm, users_with_perm_for_objects
+from tests.models import Project, Subtask, Task
+
+
+User = get_user_model()
+
+
+class UsersWithPermForObjectsTestCase(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(username='user1', password='test', email='user1@test.test')
+        self.user2 = User.objects.create_user(username='user2', password='test', email='user2@test.test')
+        self.user3 = User.objects.create_user(username='user3', password='test', email='user3@test.test')
+        self.group = Group.objects.create(name='group')
+        self.role = Role.objects.create(name='role')
+        self.objects = [Group.objects.create(name=f'object{i}') for i in range(4)]
+
+    def test_user_group_and_role_grants(self):
+        child = Role.objects.create(name='child')
+        child.parents.add(self.role)
+        self.user2.groups.add(self.group)
+        self.user3.roles.add(child)
+        grant_perm(self.user1, 'auth.change_group', self.objects[0])
+        grant_perm(self.group, 'auth.change_group', self.objects[1])
+        grant_perm(self.role, 'auth.change_group', self.objects[1])
+        grant_perm(self.user1, 'auth.delete_group', self.objects[2])
+
+        self.assertEqual(
+            users_with_perm_for_objects('auth.change_group', Group.objects.filter(name__startswith='object')),
+            {
+                self.objects[0].pk: {self.user1.pk},
+                self.objects[1].pk: {self.user2.pk, self.user3.pk},
+                self.objects[2].pk: set(),
+                self.objects[3].pk: set(),
+            },
+        )
+
+    def test_model_level_grants_and_superusers(self):
+        superuser = User.objects.create_superuser(username='admin', password='test', email='admin@test.test')
+        grant_perm(self.user1, 'auth.change_group')
+        grant_perm(self.user2, 'auth.change_group', self.objects[0])
+
+        users = users_with_perm_for_objects('change', Group.objects.filter(pk__in=[self.objects[0].pk]))
+        self.assertEqual(users, {self.objects[0].pk: {superuser.pk, self.user1.pk, self.user2.pk}})
+
+        users = users_with_perm_for_objects(
+            'change', Group.objects.filter(pk=self.objects[0].pk), include_superusers=False
+        )
+        self.assertEqual(users, {self.objects[0].pk: {self.user1.pk, self.user2.pk}})
+
+    def test_inactive_users(self):
+        self.user2.groups.add(self.group)
+        grant_perm(self.user1, 'auth.change_group', self.objects[0])
+        grant_perm(self.group, 'auth.change_group', self.objects[0])
+        User.objects.filter(pk__in=[self.user1.pk, self.user2.pk]).update(is_active=False)
+        queryset = Group.objects.filter(pk=self.objects[0].pk)
+
+        self.assertEqual(users_with_perm_for_objects('auth.change_group', queryset), {self.objects[0].pk: set()})
+        self.assertEqual(
+            users_with_perm_for_objects('auth.change_group', queryset, is_active=False),
+            {self.objects[0].pk: {self.user1.pk, self.user2.pk}},
+        )
+
+    def test_expired_grants(self):
+        grant_perm(self.user1, 'auth.change_group', self.objects[0], expires_at=timezone.now() - timedelta(hours=1))
+        grant_perm(self.user2, 'auth.change_group', self.objects[0], expires_at=timezone.now() + timedelta(hours=1))
+
+        self.assertEqual(
+            users_with_perm_for_objects('auth.change_group', Group.objects.filter(pk=self.objects[0].pk)),
+            {self.objects[0].pk: {self.user2.pk}},
+        )
+
+    def test_direct_grants_and_ancestors(self):
+        project = Project.objects.create(name='project')
+        task = Task.objects.create(project=project, name='task')
+        subtasks = [
+            Subtask.objects.create(task=task, name='subtask1'),
+            Subtask.objects.create(task=None, name='subtask2'),
+        ]
+        self.user2.groups.add(self.group)
+        grant_perm(self.user1, 'tests.change_subtask', project)
+        grant_perm(self.group, 'tests.change_subtask', task)
+        grant_perm(self.user3, 'tests.change_subtask', subtasks[1])
+
+        self.assertEqual(
+            users_with_perm_for_objects('change', Subtask.objects.all()),
+            {subtasks[0].pk: {self.user1.pk, self.user2.pk}, subtasks[1].pk: {self.user3.pk}},
+        )
+
+    def test_matches_with_perm(self):
+        self.user2.groups.add(self.group)
+        self.user3.roles.add(self.role)
+        grant_perm(self.user1, 'auth.view_group', self.objects[0])
+        grant_perm(self.group, 'auth.view_group', self.objects[1])
+        grant_perm(self.role, 'auth.view_group', self.objects[2])
+        backend = ObjectPermissionModelBackend()
+
+        users = backend.users_with_perm_for_objects('auth.view_group', Group.objects.all())
+        for obj in Group.objects.all():
+            self.assertEqual(
+                users[obj.pk],
+                set(backend.with_perm('auth.view_group', obj=obj).values_list('pk', flat=True)),
+            )
+
+    def test_query_count_per_batch(self):
+        self.user2.groups.add(self.group)
+        self.user3.roles.add(self.role)
+        for obj in self.objects:
+            grant_perm(self.user1, 'auth.change_group', obj)
+            grant_perm(self.group, 'auth.change_group', obj)
+            grant_perm(self.role, 'auth.change_group', obj)
+        backend = ObjectPermissionModelBackend()
+        queryset = Group.objects.filter(name__startswith='object')
+
+        # The model-level holders and the objects, then the grants, the users,
+        # the group members and the direct and inherited role members of
+        # each batch.
+        with self.assertNumQueries(7):
+            users = backend.users_with_perm_for_objects('auth.change_group', queryset)
+
+        self.assertEqual(users, {obj.pk: {self.user1.pk, self.user2.pk, self.user3.pk} for obj in self.objects})
+
+        with self.assertNumQueries(12):
+            backend.users_with_perm_for_objects('auth.change_group', queryset, batch_size=2)
+
+    def test_unknown_permission(self):
+        self.assertEqual(
+            users_with_perm_for_objects('auth.missing_perm', Group.objects.filter(pk=self.objects[0].pk)),
+            {self.objects[0].pk: set()},
+        )
+
+    def test_unknown_permission_superusers(self):
+        superuser = User.objects.create_superuser(username='admin', password='test', email='admin@test.test')
+        queryset = Group.objects.filter(pk=self.objects[0].pk)
+
+        self.assertEqual(
+            users_with_perm_for_objects('auth.missing_perm', queryset), {self.objects[0].pk: {superuser.pk}}
+        )
+        self.assertEqual(
+            users_with_perm_for_objects('auth.missing_perm', queryset, include_superusers=False),
+            {self.objects[0].pk: set()},
+        )
@@ -18,12 +18,21 @@ from django.contrib import admin
 from django.urls import path, include
 
 from rest_framework.routers import DefaultRouter
-from .views import MockViewSet, MockViewAnonReadOnlySet
+from .views import (
+    MockMemoizedRoleDetailViewSet,
+    MockRoleDetailViewSet,
+    MockRoleViewSet,
+    MockViewSet,
+    MockViewAnonReadOnlySet,
+)
 
 router = DefaultRouter()
 
 router.register(r'mock-view', MockViewSet, basename='mock-view')
 router.register(r'mock-view-anon-read-only', MockViewAnonReadOnlySet, basename='mock-view-anon-read-only')
+router.register(r'mock-roles', MockRoleViewSet, basename='mock-roles')
+router.register(r'mock-role-details', MockRoleDetailViewSet, basename='mock-role-details')
+router.register(r'mock-memoized-role-details', MockMemoizedRoleDetailViewSet, basename='mock-memoized-role-details')
 
 urlpatterns = [
     # path('admin/', admin.site.urls),
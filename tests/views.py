@@ -1,11 +1,14 @@
 from django.contrib.auth import get_user_model
 
 from rest_framework import viewsets
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 from rest_framework import status
 
+from permissify.drf.filters import ObjectPermissionsFilter
 from permissify.drf.permissions import PermissifyObjectPermissions, PermissifyObjectPermissionsOrAnonReadOnly
-from tests.serializers import UserSerializer
+from permissify.models import Role
+from tests.serializers import RoleSerializer, UserSerializer
 
 
 User = get_user_model()
@@ -30,3 +33,28 @@ class MockViewAnonReadOnlySet(viewsets.ModelViewSet):
 
     def create(self, request, *args, **kwargs):
         return Response({'detail': 'success'}, status=status.HTTP_201_CREATED)
+
+
+class RolePagination(PageNumberPagination):
+    page_size = 2
+
+
+class MockRoleViewSet(viewsets.ReadOnlyModelViewSet):
+    filter_backends = [ObjectPermissionsFilter]
+    pagination_class = RolePagination
+    queryset = Role.objects.order_by('pk')
+    serializer_class = RoleSerializer
+
+
+class MemoizedPermissifyObjectPermissions(PermissifyObjectPermissions):
+    memoize_permissions = True
+
+
+class MockRoleDetailViewSet(viewsets.ModelViewSet):
+    permission_classes = [PermissifyObjectPermissions]
+    queryset = Role.objects.all()
+    serializer_class = RoleSerializer
+
+
+class MockMemoizedRoleDetailViewSet(MockRoleDetailViewSet):
+    permission_classes = [MemoizedPermissifyObjectPermissions]